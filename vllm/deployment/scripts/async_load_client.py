@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Async streaming client shared by the load-testing scripts
+Usage: imported by trace_replay.py and the other benchmark scripts
+
+Sends OpenAI-compatible completion/chat requests with stream=true and records
+per-request timing: time to first token (TTFT), inter-token latencies (ITL),
+end-to-end latency and output tokens. summarize() turns a list of those
+results into throughput, latency percentiles and goodput against an SLO.
+Requires aiohttp (pip install aiohttp).
+"""
+import json
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+def make_headers(api_key=None):
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+def make_session(api_key=None, timeout=600):
+    """aiohttp session without a connection cap, for open-loop load"""
+    if aiohttp is None:
+        raise RuntimeError("aiohttp not installed (pip install aiohttp)")
+    connector = aiohttp.TCPConnector(limit=0, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector, headers=make_headers(api_key),
+                                 timeout=aiohttp.ClientTimeout(total=timeout))
+
+def chunk_text(chunk):
+    """Generated text carried by one streamed chunk (completions or chat)"""
+    text = ""
+    for choice in chunk.get("choices", []):
+        if "text" in choice:
+            text += choice["text"] or ""
+        delta = choice.get("delta") or {}
+        text += delta.get("content") or ""
+        for call in delta.get("tool_calls") or []:
+            text += (call.get("function") or {}).get("arguments") or ""
+    return text
+
+async def stream_request(session, base_url, endpoint, payload):
+    """Send one streaming request and time it.
+
+    Returns a dict with start, ttft, itls, latency, output_tokens,
+    prompt_tokens, status and error (None on success). Times are seconds;
+    start is time.perf_counter() at send.
+    """
+    payload = dict(payload, stream=True)
+    payload.setdefault("stream_options", {"include_usage": True})
+    result = {"start": time.perf_counter(), "ttft": None, "itls": [], "latency": None,
+              "output_tokens": 0, "prompt_tokens": None, "status": None, "error": None}
+    last = None
+    chunks = 0
+    try:
+        async with session.post(f"{base_url}{endpoint}", json=payload) as response:
+            result["status"] = response.status
+            if response.status != 200:
+                result["error"] = (await response.text())[:200]
+                return result
+            async for raw in response.content:
+                line = raw.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get("usage")
+                if usage:
+                    result["output_tokens"] = usage.get("completion_tokens", 0)
+                    result["prompt_tokens"] = usage.get("prompt_tokens")
+                if not chunk_text(chunk):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    result["ttft"] = now - result["start"]
+                else:
+                    result["itls"].append(now - last)
+                last = now
+                chunks += 1
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result["latency"] = time.perf_counter() - result["start"]
+    if not result["output_tokens"]:
+        result["output_tokens"] = chunks
+    return result
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def meets_slo(result, slo_ttft=None, slo_itl=None):
+    """A request counts toward goodput if it succeeded within both SLOs.
+
+    slo_itl is applied to the request's own p99 inter-token latency.
+    """
+    if result["error"] or result["ttft"] is None:
+        return False
+    if slo_ttft is not None and result["ttft"] > slo_ttft:
+        return False
+    if slo_itl is not None and result["itls"] and percentile(result["itls"], 99) > slo_itl:
+        return False
+    return True
+
+def summarize(results, duration, slo_ttft=None, slo_itl=None):
+    ok = [r for r in results if not r["error"] and r["latency"] is not None]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    itls = [itl for r in ok for itl in r["itls"]]
+    latencies = [r["latency"] for r in ok]
+    output_tokens = sum(r["output_tokens"] for r in ok)
+    good = [r for r in ok if meets_slo(r, slo_ttft, slo_itl)]
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "duration": duration,
+        "request_throughput": len(ok) / duration if duration else 0.0,
+        "output_token_throughput": output_tokens / duration if duration else 0.0,
+        "goodput": len(good) / duration if duration else 0.0,
+        "slo_attainment": len(good) / len(results) if results else 0.0,
+        "ttft": {p: percentile(ttfts, p) for p in (50, 90, 99)},
+        "itl": {p: percentile(itls, p) for p in (50, 90, 99)},
+        "latency": {p: percentile(latencies, p) for p in (50, 90, 99)},
+    }
+
+def store_metrics(results, summary):
+    """Per-request samples plus run-level figures, in bench_store.py's format"""
+    ok = [r for r in results if not r["error"] and r["latency"] is not None]
+    return {
+        "ttft_s": [r["ttft"] for r in ok if r["ttft"] is not None],
+        "itl_median_s": [percentile(r["itls"], 50) for r in ok if r["itls"]],
+        "latency_s": [r["latency"] for r in ok],
+        "request_throughput": summary["request_throughput"],
+        "output_token_throughput": summary["output_token_throughput"],
+        "goodput": summary["goodput"],
+    }
+
+def print_summary(summary, title="Load Test Summary"):
+    print(f"\n=== {title} ===")
+    print(f"Requests: {summary['succeeded']}/{summary['requests']} succeeded "
+          f"in {summary['duration']:.1f}s")
+    print(f"Throughput: {summary['request_throughput']:.2f} req/s, "
+          f"{summary['output_token_throughput']:.1f} output tokens/s")
+    print(f"Goodput: {summary['goodput']:.2f} req/s within SLO "
+          f"({summary['slo_attainment']:.1%} of requests)")
+    for name, label in (("ttft", "TTFT"), ("itl", "ITL"), ("latency", "E2E latency")):
+        values = summary[name]
+        print(f"{label} p50/p90/p99: {values[50] * 1000:.1f}/{values[90] * 1000:.1f}/"
+              f"{values[99] * 1000:.1f} ms")
+    if summary["failed"]:
+        print(f"❌ {summary['failed']} requests failed")
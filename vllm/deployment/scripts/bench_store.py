@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Benchmark Result Store and Regression Check
+Usage: python bench_store.py record <results.json> --profile <name> --workload <name> [--db bench.db]
+       python bench_store.py list [--profile <name>] [--workload <name>]
+       python bench_store.py compare --baseline <selector> --candidate <selector> [--profile ...] [--workload ...]
+
+Stores benchmark runs in a local SQLite database together with an environment
+fingerprint (every installed package version from env_fingerprint.py, Python,
+GPU model). A results
+file is JSON mapping metric name to a number or a list of samples, e.g.
+{"ttft_s": [0.12, 0.15, ...], "output_token_throughput": 812.4}.
+
+compare pools all runs matching each selector and tests every shared metric
+with a Mann-Whitney U test; a metric regresses when it is worse by more than
+--threshold and the difference is significant at --alpha. Run-level metrics
+(one value per run, e.g. throughput) are pooled across the selected runs;
+with too few runs to test, they regress when the median is worse by more than
+--run-threshold. The exit code is 1 if anything regressed, so the command can
+gate a vLLM upgrade.
+
+Selectors: run:<id>, latest, previous, or <package>=<version> (e.g. vllm=0.10.0).
+"""
+import argparse
+import json
+import math
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+DEFAULT_DB = "bench_results.db"
+
+# Metrics whose names contain one of these are better when higher
+HIGHER_IS_BETTER = ('throughput', 'goodput', 'tps', 'tflops', 'bandwidth', 'attainment',
+                    'acceptance', 'speedup', 'req_per_s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    label TEXT,
+    profile TEXT,
+    workload TEXT,
+    gpu_model TEXT,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_run_metric ON samples(run_id, metric);
+"""
+
+def gpu_model():
+    try:
+        result = subprocess.run(['nvidia-smi', '--query-gpu=name', '--format=csv,noheader'],
+                                capture_output=True, text=True, timeout=10)
+        names = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
+        if result.returncode == 0 and names:
+            return f"{len(names)}x {names[0]}"
+    except Exception:
+        pass
+    return "cpu"
+
+def environment_fingerprint():
+    from env_fingerprint import get_fingerprint
+    return {
+        'packages': get_fingerprint()[0]['packages'],
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'gpu_model': gpu_model(),
+    }
+
+def connect(db_path=DEFAULT_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def save_run(db_path, metrics, profile=None, workload=None, label=None, fingerprint=None):
+    """Store one run; metrics maps name -> number or list of numbers. Returns run id."""
+    fingerprint = fingerprint or environment_fingerprint()
+    conn = connect(db_path)
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (created_at, label, profile, workload, gpu_model, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (time.time(), label, profile, workload, fingerprint.get('gpu_model'),
+             json.dumps(fingerprint, sort_keys=True)))
+        run_id = cursor.lastrowid
+        rows = []
+        for metric, values in metrics.items():
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            rows.extend((run_id, metric, float(v)) for v in values if v is not None)
+        conn.executemany("INSERT INTO samples (run_id, metric, value) VALUES (?, ?, ?)", rows)
+    conn.close()
+    return run_id
+
+def list_runs(conn, profile=None, workload=None):
+    query = "SELECT id, created_at, label, profile, workload, gpu_model, fingerprint FROM runs"
+    clauses, params = [], []
+    if profile:
+        clauses.append("profile = ?")
+        params.append(profile)
+    if workload:
+        clauses.append("workload = ?")
+        params.append(workload)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    runs = []
+    for row in conn.execute(query + " ORDER BY id", params):
+        run = dict(zip(('id', 'created_at', 'label', 'profile', 'workload', 'gpu_model'), row[:6]))
+        run['fingerprint'] = json.loads(row[6])
+        runs.append(run)
+    return runs
+
+def select_runs(runs, selector):
+    """Runs matching run:<id>, latest, previous or <package>=<version>"""
+    if selector == 'latest':
+        return runs[-1:]
+    if selector == 'previous':
+        return runs[-2:-1]
+    if selector.startswith('run:'):
+        if not selector[4:].isdigit():
+            raise ValueError(f"'{selector}' needs a numeric run id")
+        run_id = int(selector[4:])
+        return [r for r in runs if r['id'] == run_id]
+    if '=' in selector:
+        pkg, version = selector.split('=', 1)
+        pkg = pkg.lower().replace('_', '-')  # env_fingerprint's package name form
+        return [r for r in runs if r['fingerprint']['packages'].get(pkg) == version]
+    raise ValueError(f"unknown selector '{selector}'")
+
+def load_samples(conn, run_ids):
+    samples = {}
+    marks = ",".join("?" * len(run_ids))
+    for metric, value in conn.execute(
+            f"SELECT metric, value FROM samples WHERE run_id IN ({marks})", run_ids):
+        samples.setdefault(metric, []).append(value)
+    return samples
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected)"""
+    n1, n2 = len(a), len(b)
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        tie_term += tied**3 - tied
+        i = j + 1
+    rank_sum_a = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+def higher_is_better(metric):
+    return any(key in metric.lower() for key in HIGHER_IS_BETTER)
+
+def median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+def compare_samples(baseline, candidate, alpha=0.05, threshold=0.05, min_samples=3,
+                    run_counts=(1, 1), run_threshold=0.10):
+    """Compare metric -> samples dicts; returns a list of per-metric verdicts.
+
+    run_counts is the number of runs pooled on each side: a metric with no
+    more samples than runs is a run-level value, and when there are too few
+    of those for the test it is judged on its median against run_threshold.
+    """
+    verdicts = []
+    for metric in sorted(set(baseline) & set(candidate)):
+        a, b = baseline[metric], candidate[metric]
+        base, cand = median(a), median(b)
+        change = (cand - base) / abs(base) if base else 0.0
+        worse = -change if higher_is_better(metric) else change
+        enough = len(a) >= min_samples and len(b) >= min_samples
+        run_level = len(a) <= run_counts[0] and len(b) <= run_counts[1]
+        p_value = mann_whitney_p(a, b) if enough else None
+        if not enough and run_level:
+            if worse > run_threshold:
+                status = 'regression'
+            elif -worse > run_threshold:
+                status = 'improvement'
+            else:
+                status = 'unchanged'
+        elif not enough:
+            status = 'insufficient'
+        elif worse > threshold and p_value < alpha:
+            status = 'regression'
+        elif -worse > threshold and p_value < alpha:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        verdicts.append({'metric': metric, 'baseline': base, 'candidate': cand, 'change': change,
+                         'p_value': p_value, 'n': (len(a), len(b)), 'status': status})
+    return verdicts
+
+def print_verdicts(verdicts):
+    icons = {'regression': '❌', 'improvement': '✓', 'unchanged': '○', 'insufficient': '⚠'}
+    print(f"{'metric':<32} {'baseline':>12} {'candidate':>12} {'change':>8} {'p':>8}  status")
+    for v in verdicts:
+        p = f"{v['p_value']:.4f}" if v['p_value'] is not None else "-"  # "-": median vs --run-threshold
+        print(f"{v['metric']:<32} {v['baseline']:>12.4g} {v['candidate']:>12.4g} "
+              f"{v['change']:>+8.1%} {p:>8}  {icons[v['status']]} {v['status']} (n={v['n'][0]}/{v['n'][1]})")
+
+def describe_run(run):
+    packages = run['fingerprint']['packages']
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created_at']))
+    return (f"run:{run['id']} {when} profile={run['profile']} workload={run['workload']} "
+            f"vllm={packages.get('vllm')} torch={packages.get('torch')} gpu={run['gpu_model']}"
+            + (f" [{run['label']}]" if run['label'] else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description='Store benchmark results and detect regressions')
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite database path')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='Store a results JSON file as a run')
+    rec.add_argument('results')
+    rec.add_argument('--profile')
+    rec.add_argument('--workload')
+    rec.add_argument('--label')
+
+    lst = sub.add_parser('list', help='List stored runs')
+    lst.add_argument('--profile')
+    lst.add_argument('--workload')
+
+    cmp_ = sub.add_parser('compare', help='Compare two sets of runs')
+    cmp_.add_argument('--baseline', default='previous')
+    cmp_.add_argument('--candidate', default='latest')
+    cmp_.add_argument('--profile')
+    cmp_.add_argument('--workload')
+    cmp_.add_argument('--alpha', type=float, default=0.05, help='Significance level')
+    cmp_.add_argument('--threshold', type=float, default=0.05,
+                      help='Minimum relative change that counts (0.05 = 5%%)')
+    cmp_.add_argument('--run-threshold', type=float, default=0.10,
+                      help='Relative change that fails a run-level metric with too few runs to test')
+    cmp_.add_argument('--strict', action='store_true',
+                      help='Also fail when a per-request metric has too few samples to test')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        with open(args.results) as f:
+            metrics = json.load(f)
+        run_id = save_run(args.db, metrics, args.profile, args.workload, args.label)
+        print(f"✓ Stored run:{run_id} ({len(metrics)} metrics) in {args.db}")
+        return
+
+    conn = connect(args.db)
+    runs = list_runs(conn, args.profile, args.workload)
+
+    if args.command == 'list':
+        if not runs:
+            print("○ No runs stored")
+        for run in runs:
+            print(describe_run(run))
+        return
+
+    # Exit 2 for usage errors: 1 means a regression was detected
+    try:
+        baseline_runs = select_runs(runs, args.baseline)
+        candidate_runs = select_runs(runs, args.candidate)
+    except ValueError as e:
+        print(f"❌ Invalid selector: {e} (use run:<id>, latest, previous or <package>=<version>)")
+        sys.exit(2)
+    if not baseline_runs or not candidate_runs:
+        print(f"❌ No runs match baseline '{args.baseline}' and/or candidate '{args.candidate}'")
+        sys.exit(2)
+
+    print("=== Baseline ===")
+    for run in baseline_runs:
+        print(f"  {describe_run(run)}")
+    print("=== Candidate ===")
+    for run in candidate_runs:
+        print(f"  {describe_run(run)}")
+    if {r['gpu_model'] for r in baseline_runs} != {r['gpu_model'] for r in candidate_runs}:
+        print("⚠ Baseline and candidate ran on different GPUs")
+
+    verdicts = compare_samples(load_samples(conn, [r['id'] for r in baseline_runs]),
+                               load_samples(conn, [r['id'] for r in candidate_runs]),
+                               args.alpha, args.threshold,
+                               run_counts=(len(baseline_runs), len(candidate_runs)),
+                               run_threshold=args.run_threshold)
+    print()
+    print_verdicts(verdicts)
+
+    failed = [v for v in verdicts if v['status'] == 'regression'
+              or (args.strict and v['status'] == 'insufficient')]
+    if failed:
+        print(f"\n❌ {len(failed)} metric(s) regressed")
+        sys.exit(1)
+    print("\n✓ No significant regressions")
+
+if __name__ == "__main__":
+    main()
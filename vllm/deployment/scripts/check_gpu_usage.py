@@ -8,6 +8,8 @@ Usage: python check_gpu_usage.py
 import subprocess
 import getpass
 
+from gpu_lease import active_leases, describe
+
 def check_gpu_usage():
     username = getpass.getuser()
     print(f"=== GPU Usage on Shared Server (Current user: {username}) ===")
@@ -84,5 +86,17 @@ def check_gpu_usage():
     except Exception as e:
         print(f"❌ Error checking GPU availability: {e}")
 
+    # Show reservations made through gpu_lease.py / deployment_script.py
+    print("\n=== GPU Leases ===")
+    try:
+        leases = active_leases()
+        if not leases:
+            print("✓ No active GPU leases")
+        for lease in leases:
+            ownership = "👤 YOURS" if lease['owner'] == username else f"👥 {lease['owner']}"
+            print(f"{ownership} {describe(lease)}")
+    except Exception as e:
+        print(f"❌ Error reading GPU leases: {e}")
+
 if __name__ == "__main__":
     check_gpu_usage()
\ No newline at end of file
@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
 """
 Check for package conflicts affecting vLLM
-Usage: python check_package_conflicts.py
+Usage: python check_package_conflicts.py [--import-check]
+
+Versions come from the cached environment fingerprint (env_fingerprint.py).
+--import-check additionally imports each package in a fresh interpreter to
+catch installs that are present but broken.
 """
 import sys
 import subprocess
 
+from env_fingerprint import get_fingerprint
+
+PACKAGES = ['vllm', 'transformers', 'torch', 'accelerate', 'tokenizers']
+
 def check_package_versions():
-    packages = ['vllm', 'transformers', 'torch', 'accelerate', 'tokenizers']
+    fingerprint, from_cache = get_fingerprint()
     
-    print("=== Package Versions ===")
-    for pkg in packages:
+    print(f"=== Package Versions ({'cached' if from_cache else 'fresh scan'}) ===")
+    for pkg in PACKAGES:
+        version = fingerprint['packages'].get(pkg)
+        print(f"{pkg}: {version if version else '❌ Not installed'}")
+
+def check_package_imports():
+    print("\n=== Package Imports ===")
+    for pkg in PACKAGES:
         try:
             result = subprocess.run([sys.executable, '-c', f'import {pkg}; print({pkg}.__version__)'], 
                                   capture_output=True, text=True)
@@ -31,4 +45,6 @@ def check_transformers_config():
 
 if __name__ == "__main__":
     check_package_versions()
+    if '--import-check' in sys.argv:
+        check_package_imports()
     check_transformers_config()
\ No newline at end of file
@@ -41,4 +41,9 @@ if __name__ == "__main__":
         sys.exit(1)
     
     model_path = sys.argv[1]
-    check_model_files(model_path)
\ No newline at end of file
+    check_model_files(model_path)
+    
+    # Shard completeness, plus corruption if `model_index.py build` has been run
+    from model_index import preflight
+    if not preflight(model_path):
+        sys.exit(1)
\ No newline at end of file
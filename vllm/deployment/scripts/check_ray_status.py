@@ -1,24 +1,194 @@
 #!/usr/bin/env python3
 """
 Check Ray Status for vLLM
-Usage: python check_ray_status.py
+Usage: python check_ray_status.py [--address auto] [--config <config.yaml> --profile <name>]
+       python check_ray_status.py --local-test [--local-gpus 8] [--local-gpu-type A100]
+
+Reports per-node GPUs, GPU types, CPUs, object store memory and free resources,
+and checks whether a profile's tensor_parallel_size x pipeline_parallel_size can
+be placed with every tensor-parallel group confined to a single node.
+
+--local-test starts a throwaway local Ray head with synthetic GPU resources so
+the report and placement check can be exercised on a machine without GPUs.
 """
-def check_ray():
+import argparse
+import sys
+
+ACCELERATOR_PREFIX = "accelerator_type:"
+
+def summarize_node(node, available=None):
+    """Build a report dict for one entry of ray.nodes(); free_* are None if available is unknown"""
+    resources = node.get('Resources', {})
+    known = available is not None
+    available = available or {}
+    gpu_types = [key[len(ACCELERATOR_PREFIX):] for key in resources
+                 if key.startswith(ACCELERATOR_PREFIX)]
+    return {
+        'node_id': node.get('NodeID', 'unknown'),
+        'address': node.get('NodeManagerAddress', 'unknown'),
+        'alive': node.get('Alive', False),
+        'gpus': resources.get('GPU', 0),
+        'free_gpus': available.get('GPU', 0) if known else None,
+        'gpu_types': gpu_types,
+        'cpus': resources.get('CPU', 0),
+        'free_cpus': available.get('CPU', 0) if known else None,
+        'object_store_gb': resources.get('object_store_memory', 0) / 1024**3,
+        'free_object_store_gb': available.get('object_store_memory', 0) / 1024**3 if known else None,
+        'custom': {k: v for k, v in resources.items()
+                   if k not in ('GPU', 'CPU', 'memory', 'object_store_memory')
+                   and not k.startswith('node:') and not k.startswith(ACCELERATOR_PREFIX)},
+    }
+
+def check_placement(node_reports, tensor_parallel_size, pipeline_parallel_size=1,
+                    use_free=True):
+    """Check whether TP x PP workers fit with each TP group on a single node.
+
+    Every pipeline stage needs one tensor-parallel group of tensor_parallel_size
+    GPUs on the same node; stages may be spread across nodes. Returns
+    (feasible, placement) where placement lists (address, stages) per node.
+    """
+    key = 'free_gpus' if use_free else 'gpus'
+    remaining = pipeline_parallel_size
+    placement = []
+    # Fill the largest nodes first so stages stay on as few nodes as possible
+    for report in sorted(node_reports, key=lambda r: r[key], reverse=True):
+        if not report['alive'] or remaining == 0:
+            continue
+        stages = min(int(report[key] // tensor_parallel_size), remaining)
+        if stages > 0:
+            placement.append((report['address'], stages))
+            remaining -= stages
+    return remaining == 0, placement
+
+def get_available_per_node():
+    """Free resources keyed by node ID, or None if this Ray cannot report them"""
+    try:
+        from ray._private.state import available_resources_per_node
+        return available_resources_per_node()
+    except Exception as e:
+        print(f"⚠ Cannot read free resources per node ({e}); free GPUs are unknown")
+        return None
+
+def format_free(free, fmt="{:.0f}"):
+    return "?" if free is None else fmt.format(free)
+
+def print_node_reports(node_reports):
+    print(f"\n=== Ray Nodes ({len(node_reports)}) ===")
+    for report in node_reports:
+        status = "✓" if report['alive'] else "❌ DEAD"
+        gpu_types = ", ".join(report['gpu_types']) or "unknown type"
+        print(f"{status} {report['address']} ({report['node_id'][:12]})")
+        print(f"   GPUs: {format_free(report['free_gpus'])}/{report['gpus']:.0f} free ({gpu_types})")
+        print(f"   CPUs: {format_free(report['free_cpus'])}/{report['cpus']:.0f} free")
+        print(f"   Object store: {format_free(report['free_object_store_gb'], '{:.1f}')}/"
+              f"{report['object_store_gb']:.1f}GB free")
+        if report['custom']:
+            print(f"   Custom resources: {report['custom']}")
+
+def print_placement(node_reports, tensor_parallel_size, pipeline_parallel_size):
+    total = tensor_parallel_size * pipeline_parallel_size
+    print(f"\n=== Placement Check (TP={tensor_parallel_size} x PP={pipeline_parallel_size}"
+          f" = {total} GPUs) ===")
+    if any(r['free_gpus'] is None for r in node_reports):
+        feasible, placement = check_placement(node_reports, tensor_parallel_size,
+                                              pipeline_parallel_size, use_free=False)
+        if feasible:
+            print("⚠ Placement fits the cluster's total GPUs; free GPUs are unknown, so it may "
+                  "still have to wait for busy GPUs")
+            for address, stages in placement:
+                print(f"   {address}: {stages} stage(s) x {tensor_parallel_size} GPUs")
+        else:
+            print("❌ Placement infeasible on this cluster")
+        return feasible
+    feasible, placement = check_placement(node_reports, tensor_parallel_size,
+                                          pipeline_parallel_size)
+    if feasible:
+        print("✓ Placement feasible with current free GPUs")
+        for address, stages in placement:
+            print(f"   {address}: {stages} stage(s) x {tensor_parallel_size} GPUs")
+        return True
+
+    feasible_idle, _ = check_placement(node_reports, tensor_parallel_size,
+                                       pipeline_parallel_size, use_free=False)
+    if feasible_idle:
+        print("⚠ Not enough free GPUs now, but feasible once busy GPUs are released")
+    else:
+        largest = max((r['gpus'] for r in node_reports if r['alive']), default=0)
+        print("❌ Placement infeasible on this cluster")
+        if largest < tensor_parallel_size:
+            print(f"   Largest node has {largest:.0f} GPUs < tensor_parallel_size "
+                  f"{tensor_parallel_size}; lower TP and raise pipeline_parallel_size")
+    return False
+
+def load_parallel_sizes(config_file, profile):
+    import yaml
+    with open(config_file, 'r') as f:
+        configs = yaml.safe_load(f)
+    gpu = configs[profile]['gpu']
+    return gpu['tensor_parallel_size'], gpu.get('pipeline_parallel_size', 1)
+
+def check_ray(address='auto', tensor_parallel_size=None, pipeline_parallel_size=1,
+              local_test=False, local_gpus=8, local_gpu_type="A100"):
     try:
         import ray
         print(f"✓ Ray version: {ray.__version__}")
-        
-        # Check if Ray is running
-        try:
-            ray.init(address='auto', ignore_reinit_error=True)
-            print("✓ Ray cluster connected")
-            print(f"Ray nodes: {len(ray.nodes())}")
-            ray.shutdown()
-        except:
-            print("❌ No existing Ray cluster")
-            
     except ImportError:
         print("❌ Ray not installed")
+        return False
+
+    try:
+        if local_test:
+            ray.init(num_cpus=4, num_gpus=local_gpus,
+                     resources={f"{ACCELERATOR_PREFIX}{local_gpu_type}": 1},
+                     include_dashboard=False, ignore_reinit_error=True)
+            print(f"✓ Started local Ray head with {local_gpus} synthetic GPUs")
+        else:
+            ray.init(address=address, ignore_reinit_error=True)
+            print("✓ Ray cluster connected")
+    except Exception as e:
+        print(f"❌ No existing Ray cluster: {e}")
+        return False
+
+    try:
+        nodes = ray.nodes()
+        print(f"Ray nodes: {len(nodes)}")
+        available = get_available_per_node()
+        node_reports = [summarize_node(node, None if available is None
+                                       else available.get(node.get('NodeID'), {}))
+                        for node in nodes]
+        print_node_reports(node_reports)
+
+        ok = True
+        if tensor_parallel_size:
+            ok = print_placement(node_reports, tensor_parallel_size, pipeline_parallel_size)
+        return ok
+    finally:
+        ray.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description='Report Ray cluster resources for vLLM')
+    parser.add_argument('--address', default='auto', help='Ray cluster address')
+    parser.add_argument('--config', help='YAML config to read parallel sizes from')
+    parser.add_argument('--profile', help='Configuration profile to check')
+    parser.add_argument('--tensor-parallel-size', type=int, help='Override TP size')
+    parser.add_argument('--pipeline-parallel-size', type=int, help='Override PP size')
+    parser.add_argument('--local-test', action='store_true',
+                        help='Start a local Ray head with synthetic GPU resources')
+    parser.add_argument('--local-gpus', type=int, default=8)
+    parser.add_argument('--local-gpu-type', default='A100')
+    args = parser.parse_args()
+
+    tp, pp = None, 1
+    if args.config and args.profile:
+        tp, pp = load_parallel_sizes(args.config, args.profile)
+    if args.tensor_parallel_size:
+        tp = args.tensor_parallel_size
+    if args.pipeline_parallel_size:
+        pp = args.pipeline_parallel_size
+
+    ok = check_ray(args.address, tp, pp, args.local_test, args.local_gpus,
+                   args.local_gpu_type)
+    sys.exit(0 if ok else 1)
 
 if __name__ == "__main__":
-    check_ray()
\ No newline at end of file
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Persistent torch.compile / Triton Cache Manager
+Usage: python compile_cache.py list
+       python compile_cache.py evict [--budget-gb 50]
+       python compile_cache.py remove <entry>
+
+Profiles with enforce_eager: false spend much of every cold start in
+torch.compile, Triton autotuning and CUDA graph capture. deployment_script.py
+gives each model/profile its own cache directory under COMPILE_CACHE_ROOT
+(default ~/.cache/vllm-deploy/compile) and points the server at it through
+VLLM_CACHE_ROOT, TORCHINDUCTOR_CACHE_DIR and TRITON_CACHE_DIR, so restarts
+reuse the compiled Inductor and Triton artifacts. CUDA graphs are not
+persisted: every server process captures them again, so that part of the
+startup time remains.
+
+An entry is keyed by the vLLM and torch versions, the GPU model and every
+setting that changes the compiled graphs (dtype, parallelism, max_model_len,
+block_size, speculative and LoRA settings). Upgrading vLLM or changing a knob
+therefore starts a fresh entry instead of loading incompatible artifacts; the
+old entry ages out. Entries are evicted least recently used first once the
+cache exceeds its disk budget. A running deployment holds a shared flock on
+its entry's lock file, and eviction skips entries that are locked.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+
+CACHE_ROOT = os.environ.get('COMPILE_CACHE_ROOT',
+                            os.path.join(os.path.expanduser("~"), ".cache", "vllm-deploy", "compile"))
+DEFAULT_BUDGET_GB = 50
+META_FILE = 'entry.json'
+LOCK_FILE = 'in_use.lock'
+
+# Server environment variable -> subdirectory of the entry
+CACHE_ENV = {
+    'VLLM_CACHE_ROOT': 'vllm',
+    'TORCHINDUCTOR_CACHE_DIR': 'inductor',
+    'TRITON_CACHE_DIR': 'triton',
+}
+
+def gpu_name(visible_devices=None):
+    """Name of the first GPU the server will use (compiled kernels are per architecture)"""
+    first = str(visible_devices or '0').split(',')[0].strip()
+    if not first.isdigit():
+        first = '0'
+    try:
+        result = subprocess.run(['nvidia-smi', f'--id={first}', '--query-gpu=name',
+                                 '--format=csv,noheader'],
+                                capture_output=True, text=True, timeout=10)
+        if result.returncode == 0 and result.stdout.strip():
+            return result.stdout.strip().splitlines()[0]
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return 'unknown'
+
+def cache_key_fields(config):
+    """Everything that invalidates compiled graphs for this deployment"""
+    from env_fingerprint import package_version
+    from deployment_script import build_speculative_config
+
+    lora = config.get('lora') or {}
+    return {
+        'model': config['model']['path'],
+        'vllm': package_version('vllm'),
+        'torch': package_version('torch'),
+        'gpu': gpu_name(config['gpu'].get('visible_devices')),
+        'dtype': config['model']['dtype'],
+        'tensor_parallel_size': config['gpu']['tensor_parallel_size'],
+        'pipeline_parallel_size': config['gpu'].get('pipeline_parallel_size', 1),
+        'max_model_len': config['performance']['max_model_len'],
+        'block_size': config['performance']['block_size'],
+        'speculative': build_speculative_config(config),
+        'lora': {k: lora.get(k) for k in ('max_loras', 'max_lora_rank')} if lora else None,
+    }
+
+def entry_name(profile, fields):
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:12]
+    model = re.sub(r'[^A-Za-z0-9._-]+', '_', os.path.basename(fields['model'].rstrip('/')))
+    return f"{model}-{profile}-{digest}"
+
+def dir_size(path):
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += dir_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue  # removed while scanning
+    return total
+
+def read_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_meta(path, meta):
+    tmp = os.path.join(path, f"{META_FILE}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+def list_entries(root=CACHE_ROOT):
+    """[{name, path, size, last_used, meta}], least recently used first"""
+    if not os.path.isdir(root):
+        return []
+    entries = []
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        meta = read_meta(entry.path)
+        entries.append({
+            'name': entry.name,
+            'path': entry.path,
+            'size': dir_size(entry.path),
+            'last_used': meta.get('last_used') or entry.stat().st_mtime,
+            'meta': meta,
+        })
+    return sorted(entries, key=lambda e: e['last_used'])
+
+def lock_entry(path):
+    """Open the entry's lock file and hold a shared flock; returns the fd, None if it vanished"""
+    lock_path = os.path.join(path, LOCK_FILE)
+    fd = os.open(lock_path, os.O_RDONLY | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+            return fd
+    except FileNotFoundError:
+        pass
+    os.close(fd)  # evicted while we waited for the lock
+    return None
+
+def unlock_entry(fd):
+    os.close(fd)
+
+def remove_entry(path):
+    """Remove an entry unless a deployment holds its lock. Returns True if removed."""
+    try:
+        fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDONLY)
+    except FileNotFoundError:
+        fd = None  # never launched with locking, or half-created
+    try:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+    except BlockingIOError:
+        return False
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+def evict(budget_bytes, keep=None, root=CACHE_ROOT):
+    """Remove least recently used entries until the cache fits the budget, skipping entries in use.
+
+    Returns (removed entries, entries skipped because they are in use).
+    """
+    entries = list_entries(root)
+    total = sum(e['size'] for e in entries)
+    removed, in_use = [], []
+    for entry in entries:
+        if total <= budget_bytes:
+            break
+        if entry['name'] == keep:
+            continue
+        if not remove_entry(entry['path']):
+            in_use.append(entry)
+            continue
+        total -= entry['size']
+        removed.append(entry)
+    return removed, in_use
+
+def prepare(config, profile, budget_gb=DEFAULT_BUDGET_GB, root=CACHE_ROOT):
+    """Create or reuse the profile's cache entry and evict old ones.
+
+    Returns {'path', 'name', 'hit', 'size', 'env', 'evicted', 'in_use', 'lock'};
+    the caller puts env into the server's environment and keeps the entry
+    locked against eviction until it calls unlock_entry(lock).
+    """
+    fields = cache_key_fields(config)
+    name = entry_name(profile, fields)
+    path = os.path.join(root, name)
+    lock = None
+    while lock is None:
+        os.makedirs(path, exist_ok=True)
+        lock = lock_entry(path)
+    meta = read_meta(path)
+    size = dir_size(path)
+    # A directory that holds only its metadata is a previous launch that never compiled
+    hit = bool(meta) and size > os.path.getsize(os.path.join(path, META_FILE))
+
+    env = {var: os.path.join(path, sub) for var, sub in CACHE_ENV.items()}
+    for directory in env.values():
+        os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    write_meta(path, dict(meta, key=fields, profile=profile,
+                          created=meta.get('created', now), last_used=now,
+                          launches=meta.get('launches', 0) + 1))
+
+    evicted, in_use = evict(int(budget_gb * 1024**3), keep=name, root=root)
+    return {'path': path, 'name': name, 'hit': hit, 'size': size, 'env': env,
+            'evicted': evicted, 'in_use': in_use, 'lock': lock}
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+def print_entries(entries):
+    if not entries:
+        print("✓ Compile cache is empty")
+        return
+    for entry in reversed(entries):
+        key = entry['meta'].get('key', {})
+        used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))
+        print(f"{entry['name']}: {format_size(entry['size'])}, last used {used}, "
+              f"{entry['meta'].get('launches', 0)} launches "
+              f"(vllm {key.get('vllm')}, torch {key.get('torch')}, {key.get('gpu')})")
+    print(f"Total: {format_size(sum(e['size'] for e in entries))}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the persistent torch.compile / Triton cache')
+    parser.add_argument('--root', default=CACHE_ROOT)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='Show cache entries, most recently used first')
+    ev = sub.add_parser('evict', help='Evict least recently used entries over the budget')
+    ev.add_argument('--budget-gb', type=float, default=DEFAULT_BUDGET_GB)
+    rm = sub.add_parser('remove', help='Remove one entry')
+    rm.add_argument('entry')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print_entries(list_entries(args.root))
+    elif args.command == 'evict':
+        removed, in_use = evict(int(args.budget_gb * 1024**3), root=args.root)
+        for entry in removed:
+            print(f"🗑 Evicted {entry['name']} ({format_size(entry['size'])})")
+        for entry in in_use:
+            print(f"⚠ Kept {entry['name']} ({format_size(entry['size'])}): in use by a running deployment")
+        print(f"✓ Evicted {len(removed)} entries")
+    elif args.command == 'remove':
+        path = os.path.join(args.root, os.path.basename(args.entry))
+        if not os.path.isdir(path):
+            print(f"❌ No cache entry {args.entry}")
+            raise SystemExit(1)
+        if not remove_entry(path):
+            print(f"❌ {args.entry} is in use by a running deployment")
+            raise SystemExit(1)
+        print(f"✓ Removed {args.entry}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Client-Side Completion Request Coalescing
+Usage: python completion_batcher.py [--url http://localhost:6789] [--api-key KEY] [--model ID]
+                                    [--requests 200] [--window-ms 5] [--max-batch 32]
+
+Library mode for services that send many small single-prompt /v1/completions
+calls. Requests with identical model and sampling parameters that arrive
+within --window-ms of each other (or until --max-batch prompts are queued)
+are sent as one multi-prompt completions request, and each caller's future
+receives its own choice. Batch size and the queueing delay added by the
+window are tracked in batcher.metrics().
+
+    batcher = CompletionBatcher("http://localhost:6789", api_key, window_ms=5)
+    choice = await batcher.complete("The capital of France is", model=model_id, max_tokens=10)
+    print(choice["text"])
+    await batcher.close()
+
+SyncCompletionBatcher wraps the same logic for threaded, non-async callers.
+Running this file fires --requests concurrent single-prompt calls through a
+batcher and prints the batching metrics.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from async_load_client import aiohttp, make_session, percentile
+
+class CompletionBatcher:
+    """Coalesce compatible completion requests into multi-prompt calls"""
+
+    def __init__(self, base_url, api_key=None, window_ms=5, max_batch_size=32, timeout=600):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._session = None
+        self._groups = {}      # key -> list of (prompt, future, enqueued_at)
+        self._timers = {}      # key -> asyncio.TimerHandle for the window flush
+        self._inflight = set()
+        self._batch_sizes = []
+        self._queue_delays = []
+        self._errors = 0
+
+    @staticmethod
+    def batch_key(params):
+        """Requests batch together only if every non-prompt field matches"""
+        return json.dumps(params, sort_keys=True)
+
+    async def complete(self, prompt, **params):
+        """Queue one prompt; resolves to its choice dict (a list of choices if n > 1)"""
+        if params.get("stream"):
+            raise ValueError("Streaming requests cannot be coalesced")
+        if not isinstance(prompt, str):
+            raise ValueError("Only single string prompts can be coalesced")
+        if self._session is None:
+            self._session = make_session(self.api_key, self.timeout)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = self.batch_key(params)
+        group = self._groups.setdefault(key, [])
+        group.append((prompt, future, time.perf_counter()))
+
+        if len(group) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._groups.pop(key, [])
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(json.loads(key), batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, params, batch):
+        sent_at = time.perf_counter()
+        self._batch_sizes.append(len(batch))
+        self._queue_delays.extend(sent_at - enqueued for _, _, enqueued in batch)
+        payload = dict(params, prompt=[prompt for prompt, _, _ in batch])
+        n = params.get("n", 1)
+        try:
+            async with self._session.post(f"{self.base_url}/v1/completions", json=payload) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}: {(await response.text())[:200]}")
+                body = await response.json()
+        except Exception as e:
+            self._errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Choices for prompt i carry indices i*n .. i*n + n - 1
+        by_prompt = [[] for _ in batch]
+        for choice in body.get("choices") or []:
+            if 0 <= choice.get("index", -1) < len(batch) * n:
+                by_prompt[choice["index"] // n].append(choice)
+        incomplete = sum(len(choices) != n for choices in by_prompt)
+        if incomplete:
+            self._errors += 1
+        for (_, future, _), choices in zip(batch, by_prompt):
+            if future.done():
+                continue
+            if len(choices) != n:
+                future.set_exception(RuntimeError(f"Server returned {len(choices)} of {n} choices for this "
+                                                  f"prompt ({incomplete} of {len(batch)} prompts in the batch)"))
+            else:
+                future.set_result(choices[0] if n == 1 else choices)
+
+    def metrics(self):
+        batches = len(self._batch_sizes)
+        requests = sum(self._batch_sizes)
+        return {
+            "batches": batches,
+            "requests": requests,
+            "failed_batches": self._errors,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "max_batch_size": max(self._batch_sizes, default=0),
+            "queue_delay_ms": {p: percentile(self._queue_delays, p) * 1000 for p in (50, 90, 99)},
+        }
+
+    async def close(self):
+        for key in list(self._groups):
+            self._flush(key)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class SyncCompletionBatcher:
+    """Thread-safe blocking facade running a CompletionBatcher on a background loop"""
+
+    def __init__(self, *args, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.batcher = CompletionBatcher(*args, **kwargs)
+
+    def complete(self, prompt, timeout=None, **params):
+        future = asyncio.run_coroutine_threadsafe(self.batcher.complete(prompt, **params), self._loop)
+        return future.result(timeout)
+
+    def metrics(self):
+        return self.batcher.metrics()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.batcher.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+def print_metrics(metrics):
+    print("\n=== Coalescing Metrics ===")
+    print(f"Requests: {metrics['requests']} in {metrics['batches']} batches "
+          f"({metrics['failed_batches']} failed)")
+    print(f"Batch size mean/max: {metrics['mean_batch_size']:.1f}/{metrics['max_batch_size']}")
+    delay = metrics["queue_delay_ms"]
+    print(f"Added queueing delay p50/p90/p99: {delay[50]:.2f}/{delay[90]:.2f}/{delay[99]:.2f} ms")
+
+async def demo(args):
+    batcher = CompletionBatcher(args.url, args.api_key, args.window_ms, args.max_batch)
+    prompts = [f"The capital of country number {i} is" for i in range(args.requests)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(batcher.complete(p, model=args.model, max_tokens=args.max_tokens)
+                                     for p in prompts), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await batcher.close()
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    print(f"✓ {len(results) - len(failures)}/{len(results)} completions in {elapsed:.2f}s")
+    if failures:
+        print(f"❌ First error: {failures[0]}")
+    else:
+        print(f"Sample: '{results[0]['text'].strip()}'")
+    print_metrics(batcher.metrics())
+
+def main():
+    parser = argparse.ArgumentParser(description="Coalesce single-prompt completions into batches")
+    parser.add_argument("--url", default="http://localhost:6789")
+    parser.add_argument("--api-key", default="some-key-there")
+    parser.add_argument("--model", required=True, help="Model ID (see get_model_name.py)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=10)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+    asyncio.run(demo(args))
+
+if __name__ == "__main__":
+    main()
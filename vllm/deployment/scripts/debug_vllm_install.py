@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 """
 Debug vLLM Installation Issues
-Usage: python debug_vllm_install.py
+Usage: python debug_vllm_install.py [--refresh]
+
+Package versions and the vllm CLI probe come from the cached environment
+fingerprint (env_fingerprint.py), so reruns are fast until something in the
+environment is installed, upgraded or removed. --refresh forces a rescan.
 """
+import os
+import shutil
 import sys
 import subprocess
 import importlib.util
 
+from env_fingerprint import cached_value, get_fingerprint
+
 def check_vllm_package():
     print("=== vLLM Package Debug ===")
     
@@ -31,46 +39,59 @@ def check_vllm_package():
 def check_vllm_cli():
     print("\n=== vLLM CLI Debug ===")
     
-    # Check if vllm command exists
-    try:
-        result = subprocess.run(['which', 'vllm'], capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"✓ vLLM CLI found at: {result.stdout.strip()}")
-        else:
-            print("❌ vLLM CLI not in PATH")
-    except:
-        print("❌ Cannot check vLLM CLI location")
+    # Check if vllm command exists (looked up on every run: PATH is not part of the cache)
+    cli_path = shutil.which('vllm')
+    if cli_path:
+        print(f"✓ vLLM CLI found at: {cli_path}")
+    else:
+        print("❌ vLLM CLI not in PATH")
+        return
+    
+    # Try running vllm command with error details (cached while the environment and binary are unchanged)
+    def run_cli():
+        try:
+            result = subprocess.run([cli_path, '--version'], capture_output=True, text=True, timeout=30)
+            if result.returncode == 0:
+                return {'ok': True, 'stdout': result.stdout}, True
+            # A failing CLI is what this script is run to debug; re-check it every time
+            return {'ok': False, 'stdout': result.stdout, 'stderr': result.stderr}, False
+        except subprocess.TimeoutExpired:
+            return {'ok': False, 'error': "vLLM CLI command timed out"}, False
+        except Exception as e:
+            return {'ok': False, 'error': f"vLLM CLI error: {e}"}, False
     
-    # Try running vllm command with error details
     try:
-        result = subprocess.run(['vllm', '--version'], capture_output=True, text=True, timeout=30)
-        if result.returncode == 0:
-            print(f"✓ vLLM CLI working: {result.stdout}")
-        else:
-            print(f"❌ vLLM CLI error (stderr): {result.stderr}")
-            print(f"❌ vLLM CLI error (stdout): {result.stdout}")
-    except subprocess.TimeoutExpired:
-        print("❌ vLLM CLI command timed out")
-    except Exception as e:
-        print(f"❌ vLLM CLI error: {e}")
+        cli_key = f"{cli_path}:{os.stat(cli_path).st_mtime_ns}"
+    except OSError:
+        cli_key = None
+    cli = cached_value('vllm_cli_version', run_cli, key=cli_key) if cli_key else run_cli()[0]
+    if cli['ok']:
+        print(f"✓ vLLM CLI working: {cli['stdout']}")
+    elif 'error' in cli:
+        print(f"❌ {cli['error']}")
+    else:
+        print(f"❌ vLLM CLI error (stderr): {cli['stderr']}")
+        print(f"❌ vLLM CLI error (stdout): {cli['stdout']}")
 
 def check_python_path():
     print(f"\n=== Python Environment ===")
     print(f"Python executable: {sys.executable}")
     print(f"Python version: {sys.version}")
     
-    # Check pip list for vllm
+    # Check installed distributions for vllm
     try:
-        result = subprocess.run([sys.executable, '-m', 'pip', 'list'], capture_output=True, text=True)
-        vllm_lines = [line for line in result.stdout.split('\n') if 'vllm' in line.lower()]
-        if vllm_lines:
-            print("✓ vLLM in pip list:")
-            for line in vllm_lines:
-                print(f"  {line}")
+        fingerprint, from_cache = get_fingerprint('--refresh' in sys.argv)
+        vllm_pkgs = {name: version for name, version in fingerprint['packages'].items()
+                     if 'vllm' in name}
+        source = "cached fingerprint" if from_cache else "fresh scan"
+        if vllm_pkgs:
+            print(f"✓ vLLM packages installed ({source}):")
+            for name, version in vllm_pkgs.items():
+                print(f"  {name} {version}")
         else:
-            print("❌ vLLM not found in pip list")
+            print(f"❌ vLLM not found in installed packages ({source})")
     except Exception as e:
-        print(f"❌ Cannot check pip list: {e}")
+        print(f"❌ Cannot check installed packages: {e}")
 
 if __name__ == "__main__":
     check_python_path()
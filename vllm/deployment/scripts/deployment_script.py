@@ -11,7 +11,9 @@ Examples:
 
 import yaml
 import argparse
+import json
 import os
+import shlex
 import subprocess
 import sys
 
@@ -49,9 +51,95 @@ def validate_config(config):
         print(f"❌ Model path does not exist: {model_path}")
         return False
     
+    if not validate_lora_config(config):
+        return False
+    
     print("✓ Configuration validated")
     return True
 
+def check_model_integrity(config):
+    """Catch truncated or corrupted model files before a slow, confusing load failure"""
+    from model_index import preflight
+    
+    model_path = config['model']['path']
+    if not os.path.isdir(model_path):
+        return True  # single-file or hub models are left to vLLM
+    return preflight(model_path)
+
+LORA_RANKS = (8, 16, 32, 64, 128, 256)
+
+def validate_lora_config(config):
+    """Check adapter paths exist and their rank fits max_lora_rank"""
+    lora = config.get('lora')
+    if not lora:
+        return True
+    
+    max_rank = lora.get('max_lora_rank', 16)
+    if max_rank not in LORA_RANKS:
+        print(f"❌ lora.max_lora_rank must be one of {LORA_RANKS}, got {max_rank}")
+        return False
+    
+    for name, path in lora.get('adapters', {}).items():
+        if not os.path.exists(path):
+            print(f"❌ LoRA adapter '{name}' path does not exist: {path}")
+            return False
+        adapter_config = os.path.join(path, 'adapter_config.json')
+        if os.path.exists(adapter_config):
+            with open(adapter_config) as f:
+                rank = json.load(f).get('r', 0)
+            if rank > max_rank:
+                print(f"❌ LoRA adapter '{name}' has rank {rank} > max_lora_rank {max_rank}")
+                return False
+    return True
+
+def build_speculative_config(config):
+    """Build the --speculative-config dict from the optional 'speculative' section.
+
+    method "ngram" drafts from n-grams already in the prompt (no extra model);
+    method "draft_model" runs a small draft model alongside the target.
+    """
+    spec = config.get('speculative')
+    if not spec or not spec.get('enabled', True):
+        return None
+    
+    method = spec.get('method', 'ngram')
+    spec_config = {'num_speculative_tokens': spec.get('num_speculative_tokens', 5)}
+    if method == 'ngram':
+        spec_config['method'] = 'ngram'
+        spec_config['prompt_lookup_max'] = spec.get('prompt_lookup_max', 4)
+        spec_config['prompt_lookup_min'] = spec.get('prompt_lookup_min', 1)
+    elif method == 'draft_model':
+        if not spec.get('draft_model'):
+            raise ValueError("speculative.method 'draft_model' requires speculative.draft_model")
+        spec_config['model'] = spec['draft_model']
+        if 'draft_tensor_parallel_size' in spec:
+            spec_config['draft_tensor_parallel_size'] = spec['draft_tensor_parallel_size']
+    else:
+        raise ValueError(f"Unknown speculative.method: {method}")
+    
+    if 'disable_by_batch_size' in spec:
+        spec_config['disable_by_batch_size'] = spec['disable_by_batch_size']
+    return spec_config
+
+def build_lora_args(config):
+    """Serve arguments for the optional 'lora' section (multi-adapter serving)"""
+    lora = config.get('lora')
+    if not lora:
+        return []
+    
+    args = [
+        "--enable-lora",
+        f"--max-loras={lora.get('max_loras', 4)}",
+        f"--max-lora-rank={lora.get('max_lora_rank', 16)}",
+    ]
+    if 'max_cpu_loras' in lora:
+        args.append(f"--max-cpu-loras={lora['max_cpu_loras']}")
+    adapters = lora.get('adapters', {})
+    if adapters:
+        args.append("--lora-modules")
+        args.extend(f"{name}={path}" for name, path in adapters.items())
+    return args
+
 def build_vllm_command(config):
     """Build vLLM serve command from configuration"""
     cmd = ["vllm", "serve", config['model']['path']]
@@ -77,6 +165,9 @@ def build_vllm_command(config):
         f"--gpu-memory-utilization={config['gpu']['gpu_memory_utilization']}",
     ])
     
+    if config['gpu'].get('pipeline_parallel_size', 1) > 1:
+        cmd.append(f"--pipeline-parallel-size={config['gpu']['pipeline_parallel_size']}")
+    
     # Performance settings
     cmd.extend([
         f"--max-model-len={config['performance']['max_model_len']}",
@@ -100,13 +191,135 @@ def build_vllm_command(config):
     if config['features'].get('enforce_eager', False):
         cmd.append("--enforce-eager")
     
+    # LoRA adapters
+    cmd.extend(build_lora_args(config))
+    
+    # Speculative decoding
+    spec_config = build_speculative_config(config)
+    if spec_config:
+        cmd.append(f"--speculative-config={json.dumps(spec_config)}")
+    
     return cmd
 
+def select_visible_devices(config, topo_file=None):
+    """Pick visible_devices from the interconnect topology when set to 'auto'.
+
+    Returns a command prefix pinning the server to the GPUs' NUMA node
+    (empty if pinning is disabled or not possible).
+    """
+    from gpu_topology import (parse_topology, read_topology, find_busy_gpus,
+                              select_gpus, describe_selection, numa_pin_prefix)
+    from gpu_lease import held_gpus
+    
+    tp = config['gpu']['tensor_parallel_size']
+    pp = config['gpu'].get('pipeline_parallel_size', 1)
+    count = tp * pp
+    try:
+        if topo_file:
+            with open(topo_file) as f:
+                topology = parse_topology(f.read())
+            busy = []
+        else:
+            topology = parse_topology(read_topology())
+            busy = find_busy_gpus()
+            busy.extend(held_gpus(config['gpu']['gpu_memory_utilization']))
+    except Exception as e:
+        print(f"❌ Cannot read GPU topology: {e}")
+        return None
+    
+    gpus = select_gpus(topology, count, busy)
+    if gpus is None:
+        print(f"❌ Not enough idle GPUs: {count} required (tensor_parallel_size={tp} x "
+              f"pipeline_parallel_size={pp}, busy: {busy})")
+        return None
+    
+    describe_selection(topology, gpus)
+    config['gpu']['visible_devices'] = ",".join(str(g) for g in gpus)
+    
+    if not config['gpu'].get('numa_pin', True):
+        return []
+    prefix = numa_pin_prefix(topology, gpus)
+    if prefix:
+        print(f"✓ Pinning launch to NUMA node: {' '.join(prefix)}")
+    return prefix
+
+def acquire_gpu_lease(config, profile, wait=False, timeout=None):
+    """Reserve the profile's GPUs so concurrent deployments cannot collide.
+    
+    The lease records this script's PID, not the vllm child's: it is held
+    while this script waits on the server, and counts as stale once this
+    script exits (even if a detached vllm process is still running).
+    """
+    from gpu_lease import LEASE_DIR, acquire, describe, parse_gpus
+    
+    try:
+        gpus = parse_gpus(config['gpu'].get('visible_devices', ''))
+    except ValueError as e:
+        print(f"❌ Cannot lease gpu.visible_devices: {e}")
+        return None
+    if not gpus:
+        print("⚠ No visible_devices set - skipping GPU lease")
+        return {}
+    
+    try:
+        lease = acquire(gpus, config['gpu']['gpu_memory_utilization'], hours=0,
+                        label=f"{profile} :{config['deployment']['port']}", wait=wait, timeout=timeout)
+    except OSError as e:
+        print(f"❌ Cannot use the GPU lease directory {LEASE_DIR}: {e}")
+        print("   Fix its permissions, set GPU_LEASE_DIR, or deploy with --no-lease")
+        return None
+    if lease:
+        print(f"✓ Leased {describe(lease)}")
+    else:
+        print("❌ GPUs are leased by another deployment (use --lease-wait to queue)")
+    return lease
+
 def set_environment(config):
     """Set environment variables"""
     if 'visible_devices' in config['gpu']:
         os.environ['CUDA_VISIBLE_DEVICES'] = config['gpu']['visible_devices']
         print(f"✓ Set CUDA_VISIBLE_DEVICES={config['gpu']['visible_devices']}")
+    
+    if config.get('lora', {}).get('runtime_updates', False):
+        # Lets lora_router.py load adapters on demand via /v1/load_lora_adapter
+        os.environ['VLLM_ALLOW_RUNTIME_LORA_UPDATING'] = 'True'
+        print("✓ Enabled runtime LoRA adapter loading")
+
+def setup_compile_cache(config, profile, budget_gb=None):
+    """Point the server at a persistent torch.compile / Triton cache for this profile"""
+    from compile_cache import DEFAULT_BUDGET_GB, format_size, prepare
+    
+    features = config['features']
+    if features.get('enforce_eager', False) or not features.get('compile_cache', True):
+        return None
+    
+    budget_gb = budget_gb or features.get('compile_cache_budget_gb', DEFAULT_BUDGET_GB)
+    try:
+        cache = prepare(config, profile, budget_gb)
+    except OSError as e:
+        print(f"⚠ Compile cache unavailable, compiling from scratch: {e}")
+        return None
+    
+    os.environ.update(cache['env'])
+    if cache['hit']:
+        print(f"✓ Compile cache hit: {cache['name']} ({format_size(cache['size'])})")
+    else:
+        print(f"⚠ Compile cache miss: {cache['name']} - first start will compile kernels")
+    for entry in cache['evicted']:
+        print(f"🗑 Evicted compile cache {entry['name']} ({format_size(entry['size'])}, over {budget_gb}GB budget)")
+    if cache['in_use']:
+        print(f"⚠ Compile cache is over its {budget_gb}GB budget; {len(cache['in_use'])} "
+              "entries are in use by running deployments")
+    return cache
+
+def report_compile_cache(cache):
+    """Report the entry's growth and release its lock so it can be evicted again"""
+    from compile_cache import dir_size, format_size, unlock_entry
+    
+    unlock_entry(cache['lock'])
+    size = dir_size(cache['path'])
+    print(f"✓ Compile cache {cache['name']}: {format_size(size)} "
+          f"(+{format_size(max(0, size - cache['size']))} this run)")
 
 def print_deployment_info(config, cmd):
     """Print deployment information"""
@@ -117,10 +330,19 @@ def print_deployment_info(config, cmd):
     print(f"Host: {config['deployment']['host']}:{config['deployment']['port']}")
     print(f"GPUs: {config['gpu']['visible_devices']}")
     print(f"Tensor Parallel: {config['gpu']['tensor_parallel_size']}")
+    print(f"Pipeline Parallel: {config['gpu'].get('pipeline_parallel_size', 1)}")
     print(f"Max Context: {config['performance']['max_model_len']}")
     print(f"Tool Parser: {config['features'].get('tool_call_parser', 'None')}")
+    if config.get('lora'):
+        lora = config['lora']
+        print(f"LoRA adapters: {len(lora.get('adapters', {}))} "
+              f"(max {lora.get('max_loras', 4)} loaded, rank <= {lora.get('max_lora_rank', 16)})")
+    spec_config = build_speculative_config(config)
+    if spec_config:
+        print(f"Speculative: {spec_config.get('method', 'draft model')} "
+              f"({spec_config['num_speculative_tokens']} tokens)")
     print("\nCommand:")
-    print(" ".join(cmd))
+    print(shlex.join(cmd))
     print("="*60)
 
 def main():
@@ -128,6 +350,18 @@ def main():
     parser.add_argument('--config', required=True, help='Path to YAML config file')
     parser.add_argument('--profile', required=True, help='Configuration profile to use')
     parser.add_argument('--dry-run', action='store_true', help='Show command without executing')
+    parser.add_argument('--auto-gpus', action='store_true',
+                        help='Pick visible_devices from nvidia-smi topology (same as visible_devices: auto)')
+    parser.add_argument('--topo-file', help='Captured `nvidia-smi topo -m` output to select GPUs from')
+    parser.add_argument('--no-lease', action='store_true', help='Skip the shared GPU lease check')
+    parser.add_argument('--lease-wait', action='store_true', help='Queue until leased GPUs are free')
+    parser.add_argument('--lease-timeout', type=float, help='Give up waiting after this many seconds')
+    parser.add_argument('--skip-integrity-check', action='store_true',
+                        help='Do not verify model files against the model_index.py index')
+    parser.add_argument('--no-compile-cache', action='store_true',
+                        help='Do not reuse compiled graphs from previous starts')
+    parser.add_argument('--compile-cache-budget', type=float,
+                        help='Disk budget in GB for all compile cache entries')
     
     args = parser.parse_args()
     
@@ -140,20 +374,50 @@ def main():
     if not validate_config(config):
         sys.exit(1)
     
+    # Verify model files (re-hashes only files changed since the index was built)
+    if not args.skip_integrity_check and not check_model_integrity(config):
+        print("❌ Model files failed the integrity check (use --skip-integrity-check to override)")
+        sys.exit(1)
+    
+    try:
+        build_speculative_config(config)
+    except ValueError as e:
+        print(f"❌ Invalid speculative settings: {e}")
+        sys.exit(1)
+    
+    # Select GPUs by interconnect topology
+    numa_prefix = []
+    if args.auto_gpus or config['gpu'].get('visible_devices') == 'auto':
+        numa_prefix = select_visible_devices(config, args.topo_file)
+        if numa_prefix is None:
+            sys.exit(1)
+    
     # Set environment
     set_environment(config)
     
     # Build command
-    cmd = build_vllm_command(config)
+    cmd = numa_prefix + build_vllm_command(config)
     
     # Print info
     print_deployment_info(config, cmd)
     
     if args.dry_run:
         print("\n🔍 DRY RUN - Command would be executed:")
-        print(" ".join(cmd))
+        print(shlex.join(cmd))
         return
     
+    # Reserve GPUs; the lease lives as long as this process and is released on exit
+    lease = None
+    if not args.no_lease:
+        lease = acquire_gpu_lease(config, args.profile, args.lease_wait, args.lease_timeout)
+        if lease is None:
+            sys.exit(1)
+    
+    # Reuse torch.compile / Triton artifacts from earlier starts (CUDA graphs are recaptured)
+    compile_cache = None
+    if not args.no_compile_cache:
+        compile_cache = setup_compile_cache(config, args.profile, args.compile_cache_budget)
+    
     # Execute command
     try:
         print("\n🚀 Starting vLLM server...")
@@ -163,6 +427,16 @@ def main():
     except subprocess.CalledProcessError as e:
         print(f"\n❌ Deployment failed with exit code {e.returncode}")
         sys.exit(1)
+    finally:
+        if compile_cache:
+            report_compile_cache(compile_cache)
+        if lease:
+            from gpu_lease import release
+            try:
+                release(lease['id'])
+                print("✓ GPU lease released")
+            except OSError as e:
+                print(f"⚠ Could not release GPU lease {lease['id']}: {e} (it goes stale on exit)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Cached Python Environment Fingerprint
+Usage: python env_fingerprint.py [--refresh] [--diff] [--compare other.json] [--export out.json]
+
+Builds a fingerprint of the current interpreter's environment (every installed
+distribution and its version from importlib.metadata, Python version) and
+caches it on disk. The cache is keyed by the interpreter and the modification
+times of its site-packages directories, which change whenever pip installs,
+upgrades or removes a package, so repeated diagnostics reuse it in
+milliseconds and rebuild it only after the environment changes. The vllm CLI
+location depends on PATH, not on the interpreter, so it is looked up fresh on
+every run and never cached.
+
+--diff shows what changed since the fingerprint that was cached before the
+last rebuild; --compare diffs against an exported fingerprint file (e.g. from
+another machine or a known-good environment).
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import shutil
+import site
+import sys
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vllm-deploy")
+
+def environment_key():
+    """Cheap cache key: interpreter plus mtimes of its site-packages directories.
+
+    Installing or removing a distribution adds or removes a *.dist-info entry,
+    which bumps its site-packages directory mtime. Other sys.path entries (the
+    script directory, the working directory) are left out so running from a
+    different place does not force a rescan.
+    """
+    parts = [sys.executable, platform.python_version()]
+    for path in site.getsitepackages() + [site.getusersitepackages()]:
+        try:
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+        except OSError:
+            continue
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+def cache_path():
+    name = hashlib.sha256(sys.executable.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"env_{name}.json")
+
+def build_fingerprint():
+    from importlib import metadata
+    packages = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            packages[name.lower().replace("_", "-")] = dist.version
+    return {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "executable": sys.executable,
+        "platform": platform.platform(),
+        "packages": dict(sorted(packages.items())),
+        "extras": {},
+    }
+
+def load_cache():
+    try:
+        with open(cache_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_save_failed = False
+
+def save_cache(cache):
+    """Write the cache; on a read-only or full disk warn once and carry on uncached"""
+    global _save_failed
+    tmp = f"{cache_path()}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp, cache_path())
+        return True
+    except OSError as e:
+        if not _save_failed:
+            print(f"⚠ Cannot write the fingerprint cache in {CACHE_DIR} ({e}); continuing without it")
+        _save_failed = True
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        return False
+
+def with_cli(fingerprint):
+    """The fingerprint plus the vllm CLI currently on PATH (not part of the cache)"""
+    return dict(fingerprint, vllm_cli=shutil.which("vllm"))
+
+def get_fingerprint(refresh=False):
+    """Return (fingerprint, from_cache). Rebuilds only if the environment changed."""
+    key = environment_key()
+    cache = load_cache()
+    current = cache.get("current")
+    if current and cache.get("key") == key and not refresh:
+        return with_cli(current), True
+
+    fingerprint = build_fingerprint()
+    if current:
+        # Keep the replaced fingerprint so --diff can show what changed
+        cache["previous"] = current
+    cache.update({"key": key, "current": fingerprint})
+    save_cache(cache)
+    return with_cli(fingerprint), False
+
+def cached_value(name, compute, key=None):
+    """Memoize compute() in the fingerprint until the environment or key changes.
+
+    compute returns (value, ok); failures are not cached so transient errors
+    such as timeouts are retried next time. key identifies state outside the
+    environment the value depends on (e.g. a binary's path and mtime).
+    """
+    fingerprint, _ = get_fingerprint()
+    entry = fingerprint["extras"].get(name)
+    if isinstance(entry, dict) and "value" in entry and entry.get("key") == key:
+        return entry["value"]
+    value, ok = compute()
+    cache = load_cache()
+    if ok and cache.get("current"):
+        cache["current"]["extras"][name] = {"key": key, "value": value}
+        save_cache(cache)
+    return value
+
+def package_version(name):
+    fingerprint, _ = get_fingerprint()
+    return fingerprint["packages"].get(name.lower().replace("_", "-"))
+
+def diff_fingerprints(old, new):
+    """Returns {'added': {...}, 'removed': {...}, 'changed': {name: (old, new)}, 'other': {...}}"""
+    old_pkgs, new_pkgs = old.get("packages", {}), new.get("packages", {})
+    diff = {
+        "added": {n: v for n, v in new_pkgs.items() if n not in old_pkgs},
+        "removed": {n: v for n, v in old_pkgs.items() if n not in new_pkgs},
+        "changed": {n: (old_pkgs[n], v) for n, v in new_pkgs.items()
+                    if n in old_pkgs and old_pkgs[n] != v},
+        "other": {},
+    }
+    for field in ("python", "executable", "vllm_cli"):
+        # vllm_cli is only in exported fingerprints, not in cached ones
+        if field in old and field in new and old[field] != new[field]:
+            diff["other"][field] = (old.get(field), new.get(field))
+    return diff
+
+def print_diff(diff):
+    if not any(diff.values()):
+        print("✓ No differences")
+        return
+    for name, version in diff["added"].items():
+        print(f"  + {name} {version}")
+    for name, version in diff["removed"].items():
+        print(f"  - {name} {version}")
+    for name, (old, new) in diff["changed"].items():
+        print(f"  ~ {name} {old} -> {new}")
+    for field, (old, new) in diff["other"].items():
+        print(f"  ~ {field}: {old} -> {new}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached environment fingerprint")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild even if cached")
+    parser.add_argument("--diff", action="store_true", help="Show changes since the previous fingerprint")
+    parser.add_argument("--compare", help="Diff against an exported fingerprint JSON file")
+    parser.add_argument("--export", help="Write the fingerprint to this file")
+    parser.add_argument("--packages", nargs="*", default=["vllm", "torch", "transformers",
+                                                          "accelerate", "tokenizers", "ray"],
+                        help="Packages to print (default: vLLM stack)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fingerprint, from_cache = get_fingerprint(args.refresh)
+    elapsed = (time.perf_counter() - start) * 1000
+    source = "cache" if from_cache else "fresh scan"
+    print(f"=== Environment Fingerprint ({source}, {elapsed:.0f}ms) ===")
+    print(f"Python {fingerprint['python']} at {fingerprint['executable']}")
+    print(f"Installed distributions: {len(fingerprint['packages'])}")
+    print(f"vllm CLI: {fingerprint['vllm_cli'] or '❌ not in PATH'}")
+    for pkg in args.packages:
+        print(f"{pkg}: {fingerprint['packages'].get(pkg, '❌ not installed')}")
+
+    if args.diff:
+        previous = load_cache().get("previous")
+        print("\n=== Changes Since Previous Fingerprint ===")
+        if previous:
+            print_diff(diff_fingerprints(previous, fingerprint))
+        else:
+            print("○ No previous fingerprint cached")
+    if args.compare:
+        with open(args.compare) as f:
+            other = json.load(f)
+        print(f"\n=== Changes From {args.compare} ===")
+        print_diff(diff_fingerprints(other, fingerprint))
+    if args.export:
+        with open(args.export, "w") as f:
+            json.dump(fingerprint, f, indent=1)
+        print(f"\n✓ Exported fingerprint to {args.export}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Goodput Rate Finder: Highest Request Rate Within a Latency SLO
+Usage: python goodput_finder.py --config <config.yaml> --profiles production interactive_speculative
+                                [--slo-ttft 0.5] [--slo-itl 0.05]
+       python goodput_finder.py --url http://localhost:6789 [--api-key KEY] [--slo-ttft 0.5] [--slo-itl 0.05]
+
+Sends Poisson arrivals at increasing rates against a running server and
+finds the highest rate at which p99 TTFT and p99 inter-token latency both
+stay within the SLO. The rate doubles until a trial fails, then bisects
+between the last passing and first failing rate.
+
+Each trial bootstraps 95% confidence intervals for both p99s. A rate passes
+only if the upper bounds are within the SLO and fails once a lower bound
+exceeds it; an inconclusive trial is repeated with more requests and then
+counted as a failure, so the reported rate is conservative. The result is
+an interval: the highest rate that passed and the lowest that failed.
+
+With --config, every listed profile is tested on localhost at its own port
+(the servers must already be running) and the profiles are compared.
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from async_load_client import aiohttp, percentile, summarize
+from trace_replay import replay
+
+DEFAULT_PROMPTS = [
+    "Explain the difference between TCP and UDP.",
+    "Write a haiku about GPUs.",
+    "Summarize the plot of Hamlet in one paragraph.",
+    "List five uses of Python decorators with examples.",
+    "What causes the seasons on Earth?",
+]
+BOOTSTRAP_SAMPLES = 200
+MAX_FAILED_FRACTION = 0.01
+
+def poisson_offsets(rate, count, rng):
+    offsets, t = [], 0.0
+    for _ in range(count):
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+def make_entries(offsets, model, max_tokens, prompts):
+    return [{"timestamp": t, "endpoint": "/v1/completions", "output_tokens": max_tokens,
+             "body": {"model": model, "prompt": prompts[i % len(prompts)], "temperature": 0}}
+            for i, t in enumerate(offsets)]
+
+def p99s(results):
+    ttfts = [r["ttft"] for r in results]
+    itls = [itl for r in results for itl in r["itls"]]
+    return percentile(ttfts, 99), percentile(itls, 99)
+
+def resampled_p99(np, values, counts):
+    """p99 of each resample, given as rows of per-value repeat counts
+
+    Same interpolation as percentile() applied to the expanded resample, but
+    the values are sorted once instead of once per resample.
+    """
+    order = np.argsort(values)
+    values = values[order]
+    stats = []
+    for row in counts:
+        cumulative = np.cumsum(row[order])
+        if cumulative[-1] == 0:
+            stats.append(0.0)  # percentile() of an empty list
+            continue
+        rank = (cumulative[-1] - 1) * 0.99
+        low = np.floor(rank)
+        # Position k of the expanded resample is the first value whose cumulative count exceeds k
+        low_idx, high_idx = np.searchsorted(cumulative, [low, min(low + 1, cumulative[-1] - 1)], side='right')
+        stats.append(values[low_idx] + (values[high_idx] - values[low_idx]) * (rank - low))
+    return np.array(stats)
+
+def bootstrap_p99(results, rng, samples=BOOTSTRAP_SAMPLES):
+    """95% intervals for p99 TTFT and p99 ITL, resampling whole requests"""
+    import numpy as np
+
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    n = len(results)
+    # counts[s, i]: how often request i is drawn in resample s
+    picks = np_rng.integers(n, size=(samples, n))
+    counts = np.zeros((samples, n), dtype=np.int64)
+    np.add.at(counts, (np.arange(samples)[:, None], picks), 1)
+
+    ttft_stats = np.percentile(np.array([r["ttft"] for r in results])[picks], 99, axis=1)
+    itls = np.array([itl for r in results for itl in r["itls"]], dtype=float)
+    owner = np.repeat(np.arange(n), [len(r["itls"]) for r in results])
+    itl_stats = resampled_p99(np, itls, (row[owner] for row in counts)) if len(itls) else np.zeros(samples)
+    return ((float(np.percentile(ttft_stats, 2.5)), float(np.percentile(ttft_stats, 97.5))),
+            (float(np.percentile(itl_stats, 2.5)), float(np.percentile(itl_stats, 97.5))))
+
+def judge(trial, slo_ttft, slo_itl):
+    """'pass', 'fail' or 'inconclusive' for one trial"""
+    if trial["failed_fraction"] > MAX_FAILED_FRACTION or trial["ttft_ci"] is None:
+        return "fail"
+    (ttft_low, ttft_high), (itl_low, itl_high) = trial["ttft_ci"], trial["itl_ci"]
+    if ttft_low > slo_ttft or itl_low > slo_itl:
+        return "fail"
+    if ttft_high <= slo_ttft and itl_high <= slo_itl:
+        return "pass"
+    return "inconclusive"
+
+def run_trial(args, rate, requests, seed):
+    rng = random.Random(seed)
+    entries = make_entries(poisson_offsets(rate, requests, rng), args.model, args.max_tokens,
+                           DEFAULT_PROMPTS)
+    results, lags, duration = asyncio.run(replay(entries, [e["timestamp"] for e in entries],
+                                                 args.url, args.api_key))
+    ok = [r for r in results if not r["error"] and r["ttft"] is not None]
+    summary = summarize(results, duration, args.slo_ttft, args.slo_itl)
+    trial = {
+        "rate": rate,
+        "requests": len(results),
+        "failed_fraction": 1 - len(ok) / len(results),
+        "ttft_p99": summary["ttft"][99],
+        "itl_p99": summary["itl"][99],
+        "goodput": summary["goodput"],
+        "ttft_ci": None,
+        "itl_ci": None,
+    }
+    if ok:
+        trial["ttft_ci"], trial["itl_ci"] = bootstrap_p99(ok, rng, args.bootstrap_samples)
+    trial["verdict"] = judge(trial, args.slo_ttft, args.slo_itl)
+    return trial
+
+def test_rate(args, rate, trial_no):
+    """Run a rate, repeating an inconclusive trial once with twice the requests"""
+    requests = max(args.min_requests, int(rate * args.trial_seconds))
+    trial = run_trial(args, rate, requests, args.seed + trial_no)
+    print_trial(trial)
+    if trial["verdict"] == "inconclusive":
+        trial = run_trial(args, rate, requests * 2, args.seed + trial_no + 1000)
+        print_trial(trial)
+        if trial["verdict"] == "inconclusive":
+            trial["verdict"] = "fail"  # not demonstrably within the SLO
+    return trial
+
+def find_max_rate(args):
+    """Returns (highest passing trial or None, lowest failing trial or None, all trials)"""
+    trials = []
+    best, worst = None, None
+    rate = args.start_rate
+    # Expand until the SLO breaks
+    while rate <= args.max_rate:
+        trial = test_rate(args, rate, len(trials))
+        trials.append(trial)
+        if trial["verdict"] != "pass":
+            worst = trial
+            break
+        best = trial
+        rate *= 2
+    # Bisect between the last pass and the first failure
+    while best and worst and (worst["rate"] - best["rate"]) / worst["rate"] > args.tolerance:
+        trial = test_rate(args, (best["rate"] + worst["rate"]) / 2, len(trials))
+        trials.append(trial)
+        if trial["verdict"] == "pass":
+            best = trial
+        else:
+            worst = trial
+    return best, worst, trials
+
+def print_trial(trial):
+    icon = {"pass": "✓", "fail": "❌", "inconclusive": "?"}[trial["verdict"]]
+    line = f"{icon} {trial['rate']:7.2f} req/s ({trial['requests']} requests): "
+    if trial["ttft_ci"]:
+        line += (f"p99 TTFT {trial['ttft_p99'] * 1000:.0f}ms "
+                 f"[{trial['ttft_ci'][0] * 1000:.0f}-{trial['ttft_ci'][1] * 1000:.0f}], "
+                 f"p99 ITL {trial['itl_p99'] * 1000:.1f}ms "
+                 f"[{trial['itl_ci'][0] * 1000:.1f}-{trial['itl_ci'][1] * 1000:.1f}]")
+    if trial["failed_fraction"]:
+        line += f"  {trial['failed_fraction']:.1%} failed"
+    print(line)
+
+def describe_result(best, worst, max_rate):
+    if best is None:
+        return "SLO not met even at the starting rate"
+    upper = f"{worst['rate']:.2f}" if worst else f">{max_rate:.2f} (search limit)"
+    return f"{best['rate']:.2f} req/s (fails at {upper}), goodput {best['goodput']:.2f} req/s"
+
+def resolve_model(args):
+    import requests
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    response = requests.get(f"{args.url}/v1/models", headers=headers, timeout=10)
+    response.raise_for_status()
+    return response.json()["data"][0]["id"]
+
+def run_target(args, name):
+    target = name if name == args.url else f"{name}: {args.url}"
+    print(f"\n=== {target} (SLO p99 TTFT {args.slo_ttft * 1000:.0f}ms, "
+          f"p99 ITL {args.slo_itl * 1000:.0f}ms) ===")
+    try:
+        args.model = args.model_override or resolve_model(args)
+    except Exception as e:
+        print(f"❌ Cannot reach {args.url}: {e}")
+        return None
+    best, worst, _ = find_max_rate(args)
+    print(f"Max SLO-compliant rate: {describe_result(best, worst, args.max_rate)}")
+    return best, worst
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the highest request rate that meets a latency SLO')
+    parser.add_argument('--url', help='Server URL (single target)')
+    parser.add_argument('--api-key')
+    parser.add_argument('--config', help='YAML config with the profiles to compare')
+    parser.add_argument('--profiles', nargs='+', help='Profiles to test on localhost at their ports')
+    parser.add_argument('--model', dest='model_override', help='Model ID (default: first from /v1/models)')
+    parser.add_argument('--slo-ttft', type=float, default=0.5, help='p99 TTFT limit in seconds')
+    parser.add_argument('--slo-itl', type=float, default=0.05, help='p99 inter-token latency limit in seconds')
+    parser.add_argument('--max-tokens', type=int, default=128)
+    parser.add_argument('--start-rate', type=float, default=0.5)
+    parser.add_argument('--max-rate', type=float, default=256)
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Stop bisecting when the pass/fail gap is below this fraction')
+    parser.add_argument('--trial-seconds', type=float, default=60, help='Arrival window per trial')
+    parser.add_argument('--min-requests', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bootstrap-samples', type=int, default=BOOTSTRAP_SAMPLES,
+                        help='Resamples per confidence interval')
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    targets = []
+    if args.config and args.profiles:
+        from deployment_script import load_config
+        for profile in args.profiles:
+            config = load_config(args.config, profile)
+            if not config:
+                sys.exit(1)
+            targets.append((profile, f"http://localhost:{config['deployment']['port']}",
+                            args.api_key or config['deployment'].get('api_key')))
+    elif args.url:
+        targets.append((args.url, args.url, args.api_key))
+    else:
+        parser.error("give --url, or --config with --profiles")
+
+    results = {}
+    try:
+        for name, url, api_key in targets:
+            args.url, args.api_key = url, api_key
+            results[name] = run_target(args, name)
+    except KeyboardInterrupt:
+        print("\n⏹️  Search stopped by user")
+
+    if len(targets) > 1:
+        print("\n=== Goodput by Profile ===")
+        for name, result in sorted(results.items(),
+                                   key=lambda item: -(item[1][0]["rate"] if item[1] and item[1][0] else 0)):
+            print(f"{name:<28} " + (describe_result(*result, args.max_rate) if result else "unreachable"))
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,44 @@
 # =============================================================================
 """
 GPU Health Check Script
-Usage: python gpu_health_check.py
+Usage: python gpu_health_check.py [--benchmark] [--cpu [--cpu-devices N]]
 Checks: GPU availability, memory, basic CUDA operations
+
+--benchmark measures device memory bandwidth, fp16/bf16 matmul TFLOPS,
+host-to-device copy bandwidth and pairwise peer-to-peer bandwidth, then flags
+GPUs that fall behind their peers or the expected figures for their model.
+--cpu runs the same harness on CPU tensors (as N simulated devices) so the
+benchmark and outlier logic can be checked on a machine without GPUs.
 """
-import torch
+import argparse
+import itertools
+import statistics
 import subprocess
+import sys
+import time
+
+import torch
+
+# Achievable (not datasheet peak) figures per GPU model, used as a floor.
+# Bandwidths in GB/s, matmul in TFLOPS. Longest matching name wins.
+EXPECTED_PERFORMANCE = {
+    'H100': {'mem_bw': 2800, 'fp16_tflops': 600, 'bf16_tflops': 600, 'h2d_bw': 40},
+    'A100': {'mem_bw': 1500, 'fp16_tflops': 230, 'bf16_tflops': 230, 'h2d_bw': 20},
+    'L40S': {'mem_bw': 750, 'fp16_tflops': 180, 'bf16_tflops': 180, 'h2d_bw': 20},
+    'A10': {'mem_bw': 500, 'fp16_tflops': 100, 'bf16_tflops': 100, 'h2d_bw': 20},
+    'L4': {'mem_bw': 250, 'fp16_tflops': 90, 'bf16_tflops': 90, 'h2d_bw': 20},
+    'V100': {'mem_bw': 800, 'fp16_tflops': 90, 'h2d_bw': 10},
+}
+EXPECTED_FRACTION = 0.7   # flag if below 70% of the expected figure
+PEER_TOLERANCE = 0.15     # flag if more than 15% below the peer median
+
+METRICS = ['mem_bw', 'fp16_tflops', 'bf16_tflops', 'h2d_bw']
+METRIC_LABELS = {
+    'mem_bw': 'Memory BW (GB/s)',
+    'fp16_tflops': 'FP16 matmul (TFLOPS)',
+    'bf16_tflops': 'BF16 matmul (TFLOPS)',
+    'h2d_bw': 'Host->Device (GB/s)',
+}
 
 def gpu_health_check():
     print("=== GPU Health Check ===")
@@ -52,5 +85,186 @@ def gpu_health_check():
     except Exception as e:
         print(f"❌ nvidia-smi error: {e}")
 
+# =============================================================================
+# Benchmark mode
+# =============================================================================
+
+def synchronize(device):
+    if str(device).startswith('cuda'):
+        torch.cuda.synchronize(device)
+
+def time_op(fn, device, iters=10, warmup=3):
+    """Median seconds per call of fn() on device"""
+    for _ in range(warmup):
+        fn()
+    synchronize(device)
+    samples = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        fn()
+        synchronize(device)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def bench_memory_bandwidth(device, size_mb=256, iters=10):
+    """Device-to-device copy bandwidth in GB/s (read + write)"""
+    numel = size_mb * 1024**2 // 4
+    src = torch.empty(numel, dtype=torch.float32, device=device)
+    dst = torch.empty_like(src)
+    seconds = time_op(lambda: dst.copy_(src), device, iters)
+    return 2 * src.numel() * src.element_size() / seconds / 1e9
+
+def bench_matmul(device, dtype, n=4096, iters=10):
+    """Dense matmul throughput in TFLOPS"""
+    a = torch.randn(n, n, device=device).to(dtype)
+    b = torch.randn(n, n, device=device).to(dtype)
+    seconds = time_op(lambda: torch.matmul(a, b), device, iters)
+    return 2 * n**3 / seconds / 1e12
+
+def bench_host_to_device(device, size_mb=256, iters=10):
+    """Pinned host memory to device copy bandwidth in GB/s"""
+    numel = size_mb * 1024**2 // 4
+    pinned = str(device).startswith('cuda')
+    host = torch.empty(numel, dtype=torch.float32, pin_memory=pinned)
+    dst = torch.empty(numel, dtype=torch.float32, device=device)
+    seconds = time_op(lambda: dst.copy_(host, non_blocking=pinned), device, iters)
+    return host.numel() * host.element_size() / seconds / 1e9
+
+def bench_peer_to_peer(src_device, dst_device, size_mb=256, iters=10):
+    """Copy bandwidth from one device to another in GB/s"""
+    numel = size_mb * 1024**2 // 4
+    src = torch.empty(numel, dtype=torch.float32, device=src_device)
+    dst = torch.empty(numel, dtype=torch.float32, device=dst_device)
+
+    def copy():
+        dst.copy_(src)
+        synchronize(src_device)
+
+    seconds = time_op(copy, dst_device, iters)
+    return src.numel() * src.element_size() / seconds / 1e9
+
+def run_device_benchmarks(device, size_mb=256, matmul_n=4096, iters=10):
+    """All single-device metrics; a metric is None if unsupported on device"""
+    results = {}
+    benches = {
+        'mem_bw': lambda: bench_memory_bandwidth(device, size_mb, iters),
+        'fp16_tflops': lambda: bench_matmul(device, torch.float16, matmul_n, iters),
+        'bf16_tflops': lambda: bench_matmul(device, torch.bfloat16, matmul_n, iters),
+        'h2d_bw': lambda: bench_host_to_device(device, size_mb, iters),
+    }
+    for name, bench in benches.items():
+        try:
+            results[name] = bench()
+        except Exception as e:
+            print(f"   {device} {name}: ✗ {e}")
+            results[name] = None
+    return results
+
+def expected_for(gpu_name):
+    """Expected figures for the longest model key found in gpu_name"""
+    for key in sorted(EXPECTED_PERFORMANCE, key=len, reverse=True):
+        if key in gpu_name:
+            return EXPECTED_PERFORMANCE[key]
+    return {}
+
+def find_outliers(results, names, peer_tolerance=PEER_TOLERANCE,
+                  expected_fraction=EXPECTED_FRACTION):
+    """Flag devices below their peers' median or their model's expected value.
+
+    results: {device_index: {metric: value}}; names: {device_index: gpu_name}.
+    Returns {device_index: [reason, ...]} for flagged devices only.
+    """
+    flags = {}
+    for metric in METRICS:
+        values = {i: r.get(metric) for i, r in results.items() if r.get(metric)}
+        if not values:
+            continue
+        median = statistics.median(values.values())
+        for i, value in values.items():
+            if len(values) > 1 and value < median * (1 - peer_tolerance):
+                flags.setdefault(i, []).append(
+                    f"{METRIC_LABELS[metric]} {value:.1f} is {100 * (1 - value / median):.0f}% "
+                    f"below peer median {median:.1f}")
+            expected = expected_for(names.get(i, '')).get(metric)
+            if expected and value < expected * expected_fraction:
+                flags.setdefault(i, []).append(
+                    f"{METRIC_LABELS[metric]} {value:.1f} < {expected_fraction:.0%} of "
+                    f"expected {expected} for {names[i]}")
+    return flags
+
+def find_p2p_outliers(p2p, peer_tolerance=PEER_TOLERANCE):
+    """Flag device pairs whose copy bandwidth is well below the pair median"""
+    values = {pair: bw for pair, bw in p2p.items() if bw}
+    if len(values) < 2:
+        return []
+    median = statistics.median(values.values())
+    return [(pair, bw, median) for pair, bw in values.items()
+            if bw < median * (1 - peer_tolerance)]
+
+def gpu_benchmark(use_cpu=False, cpu_devices=2, size_mb=256, matmul_n=4096, iters=10):
+    print("=== GPU Benchmark ===")
+    if use_cpu or not torch.cuda.is_available():
+        if not use_cpu:
+            print("⚠ CUDA not available - running harness on CPU tensors")
+        devices = ['cpu'] * cpu_devices
+        names = {i: 'CPU' for i in range(cpu_devices)}
+        # Keep CPU runs short; the numbers only exercise the code paths
+        size_mb, matmul_n, iters = min(size_mb, 32), min(matmul_n, 512), min(iters, 3)
+    else:
+        devices = [f'cuda:{i}' for i in range(torch.cuda.device_count())]
+        names = {i: torch.cuda.get_device_name(i) for i in range(len(devices))}
+
+    results = {}
+    for i, device in enumerate(devices):
+        print(f"\nDevice {i} ({names[i]}):")
+        results[i] = run_device_benchmarks(device, size_mb, matmul_n, iters)
+        for metric in METRICS:
+            value = results[i][metric]
+            shown = f"{value:.1f}" if value is not None else "n/a"
+            print(f"   {METRIC_LABELS[metric]}: {shown}")
+
+    p2p = {}
+    if len(devices) > 1:
+        print("\n=== Peer-to-Peer Copy (GB/s) ===")
+        for a, b in itertools.permutations(range(len(devices)), 2):
+            try:
+                p2p[(a, b)] = bench_peer_to_peer(devices[a], devices[b], size_mb, iters)
+                print(f"   {a} -> {b}: {p2p[(a, b)]:.1f}")
+            except Exception as e:
+                print(f"   {a} -> {b}: ✗ {e}")
+                p2p[(a, b)] = None
+
+    print("\n=== Benchmark Verdict ===")
+    flags = find_outliers(results, names)
+    p2p_flags = find_p2p_outliers(p2p)
+    for i in range(len(devices)):
+        if i in flags:
+            print(f"Device {i}: ⚠ DEGRADED")
+            for reason in flags[i]:
+                print(f"   - {reason}")
+        else:
+            print(f"Device {i}: ✓ OK")
+    for (a, b), bw, median in p2p_flags:
+        print(f"⚠ Slow link {a} -> {b}: {bw:.1f} GB/s vs median {median:.1f} GB/s")
+
+    return not flags and not p2p_flags
+
+def main():
+    parser = argparse.ArgumentParser(description='GPU health check and micro-benchmarks')
+    parser.add_argument('--benchmark', action='store_true', help='Run bandwidth/TFLOPS benchmarks')
+    parser.add_argument('--cpu', action='store_true', help='Run the benchmark harness on CPU tensors')
+    parser.add_argument('--cpu-devices', type=int, default=2, help='Simulated devices in --cpu mode')
+    parser.add_argument('--size-mb', type=int, default=256, help='Copy buffer size')
+    parser.add_argument('--matmul-n', type=int, default=4096, help='Square matmul dimension')
+    parser.add_argument('--iters', type=int, default=10, help='Timed iterations per benchmark')
+    args = parser.parse_args()
+
+    if not args.cpu:
+        gpu_health_check()
+    if args.benchmark or args.cpu:
+        print()
+        ok = gpu_benchmark(args.cpu, args.cpu_devices, args.size_mb, args.matmul_n, args.iters)
+        sys.exit(0 if ok else 1)
+
 if __name__ == "__main__":
-    gpu_health_check()
\ No newline at end of file
+    main()
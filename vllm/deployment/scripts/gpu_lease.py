@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+GPU Lease Manager for Shared Servers
+Usage: python gpu_lease.py status
+       python gpu_lease.py acquire --gpus 2,3 [--memory 0.9] [--hours 24] [--wait]
+       python gpu_lease.py release <lease_id>
+       python gpu_lease.py cleanup
+
+Reserves GPUs before a deployment so two people cannot start servers on the
+same devices at once. Leases live as JSON files under a shared directory
+(GPU_LEASE_DIR, default /tmp/gpu-leases) and record owner, PID, host, GPUs,
+the fraction of each GPU's memory claimed (gpu_memory_utilization) and an
+expiry. All checks and writes happen under one flock, so reservations are
+atomic. A GPU can be shared only while the claimed fractions add up to at
+most 1.0. Leases whose process has died or that have expired are released
+automatically. Waiting deployments take a ticket and are served first come,
+first served.
+
+deployment_script.py takes a lease before launching and check_gpu_usage.py
+lists active leases.
+"""
+import argparse
+import contextlib
+import fcntl
+import getpass
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+LEASE_DIR = os.environ.get('GPU_LEASE_DIR', '/tmp/gpu-leases')
+POLL_INTERVAL = 2.0
+
+def ensure_dirs(lease_dir=LEASE_DIR):
+    for path in (lease_dir, os.path.join(lease_dir, 'leases'), os.path.join(lease_dir, 'queue')):
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            try:
+                os.chmod(path, 0o1777)  # shared by all users, like /tmp
+            except PermissionError:
+                pass
+
+@contextlib.contextmanager
+def locked(lease_dir=LEASE_DIR):
+    """Exclusive lock over the whole lease directory"""
+    ensure_dirs(lease_dir)
+    lock_path = os.path.join(lease_dir, '.lock')
+    # flock works on a read-only descriptor, so other users only need read access
+    fd = os.open(lock_path, os.O_RDONLY | os.O_CREAT, 0o666)
+    try:
+        os.fchmod(fd, 0o666)  # creation mode is filtered by the umask
+    except PermissionError:
+        pass  # created by another user
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+def is_stale(record, now=None):
+    """Expired, or held by a process on this host that no longer exists"""
+    now = now or time.time()
+    if record.get('expires') and record['expires'] < now:
+        return True
+    return record.get('host') == socket.gethostname() and not pid_alive(record['pid'])
+
+def read_records(directory):
+    records = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                records.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # half-written or removed concurrently
+    return records
+
+def live_records(directory):
+    """Records that are not stale; stale ones another user owns cannot be unlinked"""
+    return [r for r in read_records(directory) if not is_stale(r)]
+
+def write_record(directory, record):
+    path = os.path.join(directory, f"{record['id']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(record, f, indent=1)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+def remove_record(directory, record_id):
+    """Returns False if the record belongs to another user (the directory is sticky)"""
+    try:
+        os.remove(os.path.join(directory, f"{record_id}.json"))
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        return False
+    return True
+
+def reap(lease_dir=LEASE_DIR):
+    """Remove stale leases and queue tickets; caller holds the lock. Returns removed leases.
+
+    Stale records owned by other users stay on disk; readers skip them via live_records.
+    """
+    removed = []
+    for kind in ('leases', 'queue'):
+        directory = os.path.join(lease_dir, kind)
+        for record in read_records(directory):
+            if is_stale(record) and remove_record(directory, record['id']):
+                if kind == 'leases':
+                    removed.append(record)
+    return removed
+
+def active_leases(lease_dir=LEASE_DIR):
+    with locked(lease_dir):
+        reap(lease_dir)
+        return live_records(os.path.join(lease_dir, 'leases'))
+
+def claimed_fraction(leases):
+    """{gpu: summed memory fraction} over the given leases"""
+    claimed = {}
+    for lease in leases:
+        for gpu in lease['gpus']:
+            claimed[gpu] = claimed.get(gpu, 0.0) + lease['memory_fraction']
+    return claimed
+
+def conflicts(leases, gpus, memory_fraction):
+    """GPUs among `gpus` that cannot take another memory_fraction claim"""
+    claimed = claimed_fraction(leases)
+    return [g for g in gpus if claimed.get(g, 0.0) + memory_fraction > 1.0 + 1e-9]
+
+def held_gpus(memory_fraction=1.0, lease_dir=LEASE_DIR):
+    """GPUs that cannot currently fit a claim of memory_fraction (for GPU selection)"""
+    leases = active_leases(lease_dir)
+    claimed = claimed_fraction(leases)
+    return sorted(g for g, c in claimed.items() if c + memory_fraction > 1.0 + 1e-9)
+
+def new_record(gpus, memory_fraction, hours, label):
+    now = time.time()
+    return {
+        'id': f"{int(now)}-{uuid.uuid4().hex[:8]}",
+        'owner': getpass.getuser(),
+        'pid': os.getpid(),
+        'host': socket.gethostname(),
+        'gpus': sorted(gpus),
+        'memory_fraction': memory_fraction,
+        'created': now,
+        'expires': now + hours * 3600 if hours else None,
+        'label': label,
+    }
+
+def try_acquire(gpus, memory_fraction=1.0, hours=24, label=None, ticket_id=None,
+                lease_dir=LEASE_DIR):
+    """One atomic attempt. Returns (lease or None, conflicting leases)."""
+    with locked(lease_dir):
+        reap(lease_dir)
+        leases = live_records(os.path.join(lease_dir, 'leases'))
+        blocking = [l for l in leases if set(l['gpus']) & set(gpus)]
+        if conflicts(leases, gpus, memory_fraction):
+            return None, blocking
+
+        # First come, first served: an older waiter wanting any of these GPUs goes first
+        queue = live_records(os.path.join(lease_dir, 'queue'))
+        if ticket_id:
+            mine = next((t for t in queue if t['id'] == ticket_id), None)
+            ahead = [t for t in queue if mine and t['created'] < mine['created']
+                     and set(t['gpus']) & set(gpus)]
+        else:
+            ahead = [t for t in queue if set(t['gpus']) & set(gpus)]
+        if ahead:
+            return None, blocking
+
+        lease = new_record(gpus, memory_fraction, hours, label)
+        write_record(os.path.join(lease_dir, 'leases'), lease)
+        if ticket_id:
+            remove_record(os.path.join(lease_dir, 'queue'), ticket_id)
+        return lease, []
+
+def acquire(gpus, memory_fraction=1.0, hours=24, label=None, wait=False, timeout=None,
+            lease_dir=LEASE_DIR):
+    """Reserve GPUs, optionally queueing until they are free. Returns the lease or None."""
+    lease, blocking = try_acquire(gpus, memory_fraction, hours, label, lease_dir=lease_dir)
+    if lease or not wait:
+        if blocking:
+            print_blocking(blocking)
+        return lease
+
+    ticket = new_record(gpus, memory_fraction, None, label)
+    with locked(lease_dir):
+        write_record(os.path.join(lease_dir, 'queue'), ticket)
+    print(f"⏳ Waiting for GPUs {','.join(map(str, gpus))} (queue ticket {ticket['id']})")
+    print_blocking(blocking)
+    deadline = time.time() + timeout if timeout else None
+    try:
+        while deadline is None or time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            lease, _ = try_acquire(gpus, memory_fraction, hours, label, ticket['id'], lease_dir)
+            if lease:
+                return lease
+        print("❌ Timed out waiting for GPUs")
+        return None
+    finally:
+        with locked(lease_dir):
+            remove_record(os.path.join(lease_dir, 'queue'), ticket['id'])
+
+def release(lease_id, lease_dir=LEASE_DIR):
+    """Returns False if the lease belongs to another user"""
+    with locked(lease_dir):
+        return remove_record(os.path.join(lease_dir, 'leases'), lease_id)
+
+def describe(lease):
+    expires = (time.strftime('%m-%d %H:%M', time.localtime(lease['expires']))
+               if lease.get('expires') else 'never')
+    label = f" [{lease['label']}]" if lease.get('label') else ""
+    return (f"GPUs {','.join(map(str, lease['gpus']))}: {lease['owner']}@{lease['host']} "
+            f"PID {lease['pid']}, {lease['memory_fraction']:.0%} memory, "
+            f"expires {expires} ({lease['id']}){label}")
+
+def print_blocking(blocking):
+    for lease in blocking:
+        print(f"   held by {describe(lease)}")
+
+def print_status(lease_dir=LEASE_DIR):
+    with locked(lease_dir):
+        reaped = reap(lease_dir)
+        leases = live_records(os.path.join(lease_dir, 'leases'))
+        queue = live_records(os.path.join(lease_dir, 'queue'))
+    for lease in reaped:
+        print(f"♻ Released stale lease {lease['id']} ({lease['owner']}, PID {lease['pid']})")
+    if not leases:
+        print("✓ No active GPU leases")
+    for lease in leases:
+        print(describe(lease))
+    for ticket in sorted(queue, key=lambda t: t['created']):
+        waited = time.time() - ticket['created']
+        print(f"⏳ {ticket['owner']} waiting {waited:.0f}s for GPUs {','.join(map(str, ticket['gpus']))}")
+
+def gpu_uuids():
+    """{uuid: index} for every GPU nvidia-smi reports (empty if unavailable)"""
+    try:
+        result = subprocess.run(['nvidia-smi', '--query-gpu=index,uuid', '--format=csv,noheader'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return {}
+    uuids = {}
+    for line in result.stdout.splitlines() if result.returncode == 0 else []:
+        index, _, uuid = (part.strip() for part in line.partition(','))
+        if index.isdigit() and uuid:
+            uuids[uuid] = int(index)
+    return uuids
+
+def parse_gpus(text):
+    """GPU indices from a CUDA_VISIBLE_DEVICES-style list.
+
+    GPU UUIDs (or unique UUID prefixes, as CUDA accepts) are mapped to indices
+    through nvidia-smi. Raises ValueError for anything that cannot be mapped.
+    """
+    ids = [g.strip() for g in str(text).split(',') if g.strip()]
+    uuids = None
+    gpus = []
+    for gpu in ids:
+        if gpu.isdigit():
+            gpus.append(int(gpu))
+            continue
+        if uuids is None:
+            uuids = gpu_uuids()
+        matches = [index for uuid, index in uuids.items() if uuid.startswith(gpu)]
+        if len(matches) != 1:
+            reason = "matches several GPUs" if matches else "is not a GPU index or a known GPU UUID"
+            raise ValueError(f"'{gpu}' {reason}")
+        gpus.append(matches[0])
+    return gpus
+
+def main():
+    parser = argparse.ArgumentParser(description='Reserve GPUs on a shared server')
+    parser.add_argument('--lease-dir', default=LEASE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='Show active leases and waiting deployments')
+    acq = sub.add_parser('acquire', help='Reserve GPUs and hold them until Ctrl+C')
+    acq.add_argument('--gpus', required=True, help='Comma-separated GPU indices')
+    acq.add_argument('--memory', type=float, default=1.0, help='Fraction of GPU memory claimed')
+    acq.add_argument('--hours', type=float, default=24, help='Lease expiry (0 = never)')
+    acq.add_argument('--label', help='Free-form note, e.g. the profile name')
+    acq.add_argument('--wait', action='store_true', help='Queue until the GPUs are free')
+    rel = sub.add_parser('release', help='Release a lease by id')
+    rel.add_argument('lease_id')
+    sub.add_parser('cleanup', help='Release leases of dead processes and expired leases')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print_status(args.lease_dir)
+    elif args.command == 'acquire':
+        try:
+            gpus = parse_gpus(args.gpus)
+        except ValueError as e:
+            print(f"❌ Invalid --gpus: {e}")
+            sys.exit(1)
+        lease = acquire(gpus, args.memory, args.hours, args.label, args.wait,
+                        lease_dir=args.lease_dir)
+        if not lease:
+            print("❌ GPUs are leased by someone else")
+            sys.exit(1)
+        print(f"✓ Acquired {describe(lease)}")
+        print("Holding lease until Ctrl+C...")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            release(lease['id'], args.lease_dir)
+            print("\n✓ Lease released")
+    elif args.command == 'release':
+        if not release(args.lease_id, args.lease_dir):
+            print(f"❌ Lease {args.lease_id} belongs to another user")
+            sys.exit(1)
+        print(f"✓ Released {args.lease_id}")
+    elif args.command == 'cleanup':
+        with locked(args.lease_dir):
+            removed = reap(args.lease_dir)
+        print(f"✓ Released {len(removed)} stale lease(s)")
+
+if __name__ == "__main__":
+    main()
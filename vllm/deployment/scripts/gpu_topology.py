@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Interconnect-Aware GPU Selection
+Usage: python gpu_topology.py <num_gpus> [--topo-file topo.txt] [--exclude 0,1] [--include-busy]
+
+Parses `nvidia-smi topo -m`, scores candidate GPU sets by link type (NVLink >
+same PCIe switch > host bridge > same NUMA node > cross-socket) and NUMA
+affinity, skips busy GPUs, and prints the best CUDA_VISIBLE_DEVICES for a
+tensor-parallel group. Pass --topo-file with captured `nvidia-smi topo -m`
+output to run the parser and selection without GPUs.
+"""
+import argparse
+import itertools
+import re
+import shutil
+import subprocess
+import sys
+
+# Higher is better. NV<n> links score NVLINK_BASE + n (bonded link count).
+LINK_SCORES = {
+    'X': 0,
+    'PIX': 50,   # single PCIe switch
+    'PXB': 40,   # multiple PCIe switches
+    'PHB': 30,   # PCIe host bridge
+    'NODE': 20,  # across host bridges within a NUMA node
+    'SOC': 10,   # older name for SYS
+    'SYS': 10,   # across the SMP interconnect between sockets
+}
+NVLINK_BASE = 100
+NUMA_BONUS = 5
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+def link_score(link):
+    if link.startswith('NV'):
+        try:
+            return NVLINK_BASE + int(link[2:])
+        except ValueError:
+            return NVLINK_BASE
+    return LINK_SCORES.get(link, 0)
+
+def parse_topology(text):
+    """Parse `nvidia-smi topo -m` output.
+
+    Returns {'links': {(i, j): 'NV12', ...}, 'numa': {i: node or None},
+    'cpu_affinity': {i: '0-31,64-95'}} keyed by integer GPU index.
+    """
+    lines = [ANSI_ESCAPE.sub('', line).rstrip() for line in text.splitlines()]
+    header = None
+    for idx, line in enumerate(lines):
+        if re.match(r'^\s+GPU\d+', line):
+            header = idx
+            break
+    if header is None:
+        raise ValueError("No GPU header row found in topology output")
+
+    columns = re.split(r'\t+|\s{2,}', lines[header].strip())
+    gpu_columns = [c for c in columns if re.fullmatch(r'GPU\d+', c)]
+    other_columns = [c for c in columns if c not in gpu_columns]
+
+    links, numa, cpu_affinity = {}, {}, {}
+    for line in lines[header + 1:]:
+        match = re.match(r'^(GPU\d+)\s+(.*)$', line)
+        if not match:
+            continue
+        gpu = int(match.group(1)[3:])
+        # Cells are tab separated; fall back to whitespace for pasted output
+        cells = [c.strip() for c in match.group(2).split('\t')] if '\t' in line \
+            else match.group(2).split()
+        cells = [c for c in cells if c != '']
+
+        for col, cell in zip(gpu_columns, cells):
+            links[(gpu, int(col[3:]))] = cell
+
+        extras = dict(zip(other_columns, cells[len(gpu_columns):]))
+        for col, value in extras.items():
+            if col.startswith('CPU Affinity'):
+                cpu_affinity[gpu] = value
+            elif col.startswith('NUMA Affinity'):
+                numa[gpu] = int(value) if value.isdigit() else None
+        numa.setdefault(gpu, None)
+
+    return {'links': links, 'numa': numa, 'cpu_affinity': cpu_affinity}
+
+def score_gpu_set(topology, gpus):
+    """Score a GPU set: worst pairwise link dominates, then total, then NUMA.
+
+    All-reduce speed is bounded by the slowest link in the ring, so the
+    minimum pair score is weighted ahead of the sum.
+    """
+    if len(gpus) == 1:
+        return (0, 0, NUMA_BONUS)
+    pair_scores = [link_score(topology['links'].get((a, b), 'SYS'))
+                   for a, b in itertools.combinations(gpus, 2)]
+    numa_nodes = {topology['numa'].get(g) for g in gpus}
+    numa_bonus = NUMA_BONUS if len(numa_nodes) == 1 and None not in numa_nodes else 0
+    return (min(pair_scores), sum(pair_scores), numa_bonus)
+
+def select_gpus(topology, count, busy=()):
+    """Return the best-connected set of `count` idle GPUs, or None"""
+    candidates = [g for g in sorted(topology['numa']) if g not in set(busy)]
+    if len(candidates) < count:
+        return None
+    best = max(itertools.combinations(candidates, count),
+               key=lambda gpus: (score_gpu_set(topology, gpus), [-g for g in gpus]))
+    return list(best)
+
+def numa_node_for(topology, gpus):
+    """Common NUMA node of `gpus`, or None if they span nodes or it is unknown"""
+    nodes = {topology['numa'].get(g) for g in gpus}
+    if len(nodes) == 1:
+        return nodes.pop()
+    return None
+
+def numa_pin_prefix(topology, gpus):
+    """numactl prefix binding CPU and memory to the GPUs' NUMA node, if possible"""
+    node = numa_node_for(topology, gpus)
+    if node is None or not shutil.which('numactl'):
+        return []
+    return ['numactl', f'--cpunodebind={node}', f'--membind={node}']
+
+def read_topology():
+    result = subprocess.run(['nvidia-smi', 'topo', '-m'], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"nvidia-smi topo -m failed: {result.stderr.strip()}")
+    return result.stdout
+
+def find_busy_gpus(max_util=10, min_free_gb=8):
+    """Indices of GPUs that check_gpu_usage.py would not report as available"""
+    result = subprocess.run(['nvidia-smi', '--query-gpu=index,memory.used,memory.total,utilization.gpu',
+                             '--format=csv,noheader,nounits'], capture_output=True, text=True)
+    busy = []
+    for line in result.stdout.strip().split('\n'):
+        parts = line.split(', ')
+        if len(parts) >= 4:
+            gpu_id, mem_used, mem_total, utilization = parts
+            mem_free_gb = (int(mem_total) - int(mem_used)) / 1024
+            if int(utilization) >= max_util or mem_free_gb <= min_free_gb:
+                busy.append(int(gpu_id))
+    return busy
+
+def describe_selection(topology, gpus):
+    print(f"✓ Selected GPUs: {','.join(str(g) for g in gpus)}")
+    for a, b in itertools.combinations(gpus, 2):
+        print(f"   GPU{a} <-> GPU{b}: {topology['links'].get((a, b), '?')}")
+    node = numa_node_for(topology, gpus)
+    print(f"   NUMA node: {node if node is not None else 'mixed/unknown'}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick the best-connected GPUs for tensor parallelism')
+    parser.add_argument('count', type=int, help='Number of GPUs (tensor_parallel_size)')
+    parser.add_argument('--topo-file', help='Captured `nvidia-smi topo -m` output')
+    parser.add_argument('--exclude', default='', help='Comma-separated GPUs to treat as busy')
+    parser.add_argument('--include-busy', action='store_true',
+                        help='Do not query nvidia-smi for busy GPUs')
+    args = parser.parse_args()
+
+    if args.topo_file:
+        with open(args.topo_file) as f:
+            text = f.read()
+    else:
+        text = read_topology()
+    topology = parse_topology(text)
+
+    busy = [int(g) for g in args.exclude.split(',') if g.strip()]
+    if not args.include_busy and not args.topo_file:
+        busy.extend(find_busy_gpus())
+    if busy:
+        print(f"Excluding busy GPUs: {sorted(set(busy))}")
+
+    gpus = select_gpus(topology, args.count, busy)
+    if gpus is None:
+        print(f"❌ Not enough idle GPUs for a group of {args.count}")
+        sys.exit(1)
+    describe_selection(topology, gpus)
+    print(f"CUDA_VISIBLE_DEVICES={','.join(str(g) for g in gpus)}")
+
+if __name__ == "__main__":
+    main()
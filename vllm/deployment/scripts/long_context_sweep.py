@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Long-Context Stress Sweep
+Usage: python long_context_sweep.py --config <config.yaml> --profile <name> [--url http://localhost:6789]
+                                    [--concurrency 1 4 16] [--log-file server.log] [--json report.json]
+
+Sweeps prompt lengths up to the profile's max_model_len at several
+concurrency levels against a running server. For every step it records TTFT
+(at concurrency 1 this is the prefill time) against the actual prompt token
+count, polls /metrics for KV cache usage, swapped requests and preemptions,
+and optionally scans the server log for preemption warnings. The report
+gives prefill cost per 1k tokens and the first length/concurrency at which
+the server started preempting or swapping.
+
+Every prompt starts with a unique nonce so prefix caching cannot hide the
+prefill cost. Prompts are tokenized through /tokenize and trimmed so that
+prompt plus output always fits in max_model_len.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+from async_load_client import aiohttp, make_session, percentile, stream_request
+from server_metrics import first_metric, parse_prometheus
+
+FILLER = ("The quick brown fox jumps over the lazy dog while the committee reviews "
+          "quarterly numbers, weather reports and assorted technical documentation. ")
+OUTPUT_TOKENS = 16
+
+def sweep_lengths(max_model_len, output_tokens=OUTPUT_TOKENS, start=256):
+    """Doubling prompt lengths, ending just below the context limit"""
+    limit = max_model_len - output_tokens - 8
+    lengths = []
+    length = start
+    while length < limit:
+        lengths.append(length)
+        length *= 2
+    lengths.append(limit)
+    return lengths
+
+async def count_tokens(session, base_url, model, prompt):
+    """Prompt token count from /tokenize, special tokens included; None if unavailable"""
+    try:
+        async with session.post(f"{base_url}/tokenize",
+                                json={"model": model, "prompt": prompt}) as response:
+            if response.status == 200:
+                return (await response.json())["count"]
+    except Exception:
+        pass
+    return None
+
+async def calibrate(session, base_url, model):
+    """Tokens per FILLER repetition, via /tokenize (falls back to an estimate)"""
+    count = await count_tokens(session, base_url, model, FILLER * 20)
+    return count / 20 if count else len(FILLER.split()) * 1.3
+
+def make_prompt(target_tokens, tokens_per_filler):
+    repeats = max(1, int(target_tokens / tokens_per_filler))
+    return f"[{uuid.uuid4().hex}] " + FILLER * repeats + "\nSummarize the text above."
+
+async def fit_prompt(session, base_url, model, target_tokens, tokens_per_filler, budget):
+    """make_prompt, tokenized and shortened by whole fillers until it is at most budget tokens.
+
+    The nonce, the closing instruction and special tokens are not part of the
+    calibration, so a prompt built for the target can overshoot it slightly.
+    """
+    prompt = make_prompt(target_tokens, tokens_per_filler)
+    for _ in range(5):
+        count = await count_tokens(session, base_url, model, prompt)
+        if count is None or count <= budget:
+            break
+        target_tokens -= count - budget + tokens_per_filler
+        prompt = make_prompt(target_tokens, tokens_per_filler)
+    return prompt
+
+async def poll_metrics(session, base_url, samples, stop, interval=0.5):
+    """Scrape /metrics until stop is set, plus one final scrape after it"""
+    while True:
+        done = stop.is_set()
+        try:
+            async with session.get(f"{base_url}/metrics") as response:
+                samples.append(parse_prometheus(await response.text()))
+        except Exception:
+            pass
+        if done:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+def preemption_count(metrics):
+    return first_metric(metrics, "vllm:num_preemptions_total", "vllm:num_preemptions")
+
+def kv_usage(metrics):
+    return first_metric(metrics, "vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc")
+
+async def run_step(session, base_url, model, prompt_tokens, concurrency, tokens_per_filler, rounds,
+                   max_model_len):
+    samples, stop = [], asyncio.Event()
+    poller = asyncio.create_task(poll_metrics(session, base_url, samples, stop))
+    await asyncio.sleep(0.1)  # baseline scrape
+    results = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        prompts = await asyncio.gather(*(fit_prompt(session, base_url, model, prompt_tokens, tokens_per_filler,
+                                                    max_model_len - OUTPUT_TOKENS)
+                                         for _ in range(concurrency)))
+        payloads = [{"model": model, "prompt": prompt, "max_tokens": OUTPUT_TOKENS,
+                     "ignore_eos": True, "temperature": 0}
+                    for prompt in prompts]
+        results.extend(await asyncio.gather(*(stream_request(session, base_url, "/v1/completions", p)
+                                              for p in payloads)))
+    duration = time.perf_counter() - start
+    stop.set()
+    await poller
+
+    ok = [r for r in results if not r["error"]]
+    step = {
+        "target_tokens": prompt_tokens,
+        "concurrency": concurrency,
+        "prompt_tokens": percentile([r["prompt_tokens"] for r in ok if r["prompt_tokens"]], 50) or None,
+        "ttft_p50": percentile([r["ttft"] for r in ok if r["ttft"] is not None], 50),
+        "ttft_p99": percentile([r["ttft"] for r in ok if r["ttft"] is not None], 99),
+        "failed": len(results) - len(ok),
+        "error": next((r["error"] for r in results if r["error"]), None),
+        "duration": duration,
+        "preemptions": 0.0,
+        "peak_kv_usage": None,
+        "peak_swapped": 0.0,
+    }
+    if len(samples) >= 2:
+        step["preemptions"] = preemption_count(samples[-1]) - preemption_count(samples[0])
+        step["peak_kv_usage"] = max(kv_usage(s) for s in samples)
+        step["peak_swapped"] = max(first_metric(s, "vllm:num_requests_swapped") for s in samples)
+    return step
+
+def scan_log(log_file, offset):
+    """Preemption warnings appended to the server log since offset"""
+    from vllm_log_analyzer import LogStats, read_lines
+    stats = LogStats()
+    new_offset = read_lines(log_file, offset, stats)
+    return sum(stats.preemptions.values()), max(stats.series["swapped"], default=0), new_offset
+
+def prefill_fit(steps):
+    """Least-squares TTFT = a + b * tokens over concurrency-1 steps; returns (a, b) or None"""
+    points = [(s["prompt_tokens"], s["ttft_p50"]) for s in steps
+              if s["concurrency"] == 1 and s["prompt_tokens"] and not s["failed"]]
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    return mean_y - slope * mean_x, slope
+
+def under_pressure(step):
+    return step["preemptions"] > 0 or step["peak_swapped"] > 0
+
+async def sweep(args, max_model_len):
+    async with make_session(args.api_key) as session:
+        model = args.model
+        if not model:
+            async with session.get(f"{args.url}/v1/models") as response:
+                model = (await response.json())["data"][0]["id"]
+        tokens_per_filler = await calibrate(session, args.url, model)
+        lengths = args.lengths or sweep_lengths(max_model_len)
+        log_offset = 0
+        if args.log_file:
+            log_offset = os.path.getsize(args.log_file)
+
+        steps = []
+        for concurrency in args.concurrency:
+            for length in lengths:
+                step = await run_step(session, args.url, model, length, concurrency,
+                                      tokens_per_filler, args.rounds, max_model_len)
+                if args.log_file:
+                    log_preemptions, log_swapped, log_offset = scan_log(args.log_file, log_offset)
+                    step["preemptions"] = max(step["preemptions"], log_preemptions)
+                    step["peak_swapped"] = max(step["peak_swapped"], log_swapped)
+                steps.append(step)
+                print_step(step)
+                if step["failed"] == concurrency * args.rounds:
+                    break  # longer prompts will fail too
+    return steps
+
+def print_step(step):
+    kv = f"{step['peak_kv_usage'] * 100:.0f}%" if step["peak_kv_usage"] is not None else "n/a"
+    flag = "⚠ PREEMPTING" if under_pressure(step) else "✓"
+    tokens = f"{step['prompt_tokens']:.0f}" if step["prompt_tokens"] else f"~{step['target_tokens']}"
+    print(f"{flag} c={step['concurrency']:<3} prompt={tokens:>6} tokens  "
+          f"TTFT p50/p99 {step['ttft_p50'] * 1000:7.0f}/{step['ttft_p99'] * 1000:7.0f}ms  "
+          f"KV peak {kv:>4}  preempted {step['preemptions']:.0f}  swapped {step['peak_swapped']:.0f}"
+          + (f"  ❌ {step['failed']} failed" if step["failed"] else ""))
+
+def print_report(profile, max_model_len, steps):
+    print(f"\n=== Long-Context Report: {profile} (max_model_len={max_model_len}) ===")
+    fit = prefill_fit(steps)
+    if fit:
+        intercept, slope = fit
+        print(f"Prefill: ~{slope * 1000 * 1000:.1f}ms per 1k prompt tokens "
+              f"(+{intercept * 1000:.0f}ms fixed)")
+    onset = next((s for s in steps if under_pressure(s)), None)
+    if onset:
+        print(f"⚠ Preemption/swapping starts at concurrency {onset['concurrency']} with "
+              f"~{onset['prompt_tokens'] or onset['target_tokens']:.0f}-token prompts")
+        print("   Raise gpu_memory_utilization, lower max_model_len or cap concurrency below this point")
+    else:
+        print("✓ No preemption or swapping observed in the sweep")
+    failed = [s for s in steps if s["failed"]]
+    if failed:
+        print(f"❌ First failure: c={failed[0]['concurrency']} ~{failed[0]['target_tokens']} tokens: "
+              f"{failed[0]['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep prompt length and concurrency to the context limit")
+    parser.add_argument("--config", help="YAML config (for max_model_len, port and api key)")
+    parser.add_argument("--profile", help="Profile name in --config")
+    parser.add_argument("--url", help="Server URL (default: localhost on the profile's port)")
+    parser.add_argument("--api-key")
+    parser.add_argument("--model", help="Model ID (default: first from /v1/models)")
+    parser.add_argument("--max-model-len", type=int, help="Override the profile's max_model_len")
+    parser.add_argument("--lengths", type=int, nargs="+", help="Explicit prompt lengths in tokens")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=2, help="Batches per step")
+    parser.add_argument("--log-file", help="Server log to scan for preemption warnings")
+    parser.add_argument("--json", help="Write all steps to this JSON file")
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    profile = args.profile or "server"
+    max_model_len = args.max_model_len
+    if args.config and args.profile:
+        from deployment_script import load_config
+        config = load_config(args.config, args.profile)
+        if not config:
+            sys.exit(1)
+        max_model_len = max_model_len or config["performance"]["max_model_len"]
+        args.url = args.url or f"http://localhost:{config['deployment']['port']}"
+        args.api_key = args.api_key or config["deployment"].get("api_key")
+    if not max_model_len or not args.url:
+        parser.error("give --config/--profile, or --url with --max-model-len")
+
+    try:
+        steps = asyncio.run(sweep(args, max_model_len))
+    except KeyboardInterrupt:
+        print("\n⏹️  Sweep stopped by user")
+        return
+
+    print_report(profile, max_model_len, steps)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"profile": profile, "max_model_len": max_model_len, "steps": steps}, f, indent=1)
+        print(f"✓ Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
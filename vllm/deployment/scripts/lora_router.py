@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Adapter-Aware Router for Multi-LoRA Replicas
+Usage: python lora_router.py --replicas http://gpu1:6793 http://gpu2:6793 [--listen-port 8100]
+                             [--config cfg.yaml --profile multi_lora] [--api-key KEY]
+
+Sits in front of several vLLM replicas serving the same base model with LoRA
+enabled. The "model" field of each request names an adapter (or the base
+model). The router tracks which adapters each replica has recently served -
+an LRU of the replica's max_loras GPU slots - and sends the request to the
+least-busy replica that already holds the adapter, so adapters are not
+thrashed in and out of GPU memory. When no replica holds it, the least-busy
+replica takes it (and, if it does not have the adapter registered and the
+profile lists its path, the router loads it with /v1/load_lora_adapter).
+
+GET /router/stats shows per-replica load, resident adapters and hit rate.
+
+The router forwards requests with the replicas' API key, so when one is
+configured clients must present the same key (Authorization: Bearer KEY)
+on /v1 and /router routes. It listens on 127.0.0.1 unless --listen-host
+says otherwise.
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import sys
+import time
+from collections import OrderedDict
+
+from async_load_client import aiohttp, make_headers
+
+class Replica:
+    def __init__(self, url, max_loras=4):
+        self.url = url.rstrip('/')
+        self.max_loras = max_loras
+        self.resident = OrderedDict()   # adapter -> last use, most recent last
+        self.registered = set()         # adapters the server knows (from /v1/models)
+        self.base_model = None
+        self.inflight = 0
+        self.healthy = True
+
+    def holds(self, adapter):
+        return adapter in self.resident
+
+    def touch(self, adapter):
+        """Record use of an adapter, evicting the least recently used slot"""
+        self.resident[adapter] = time.time()
+        self.resident.move_to_end(adapter)
+        while len(self.resident) > self.max_loras:
+            self.resident.popitem(last=False)
+
+class AdapterRouter:
+    """Replica choice for a given adapter; no I/O so it can be driven directly"""
+
+    def __init__(self, replicas, spill_threshold=32):
+        self.replicas = replicas
+        # Leave a replica holding the adapter once it has this many requests
+        # in flight more than the least-busy replica
+        self.spill_threshold = spill_threshold
+        self.hits = 0
+        self.misses = 0
+
+    def choose(self, adapter):
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        least_busy = min(healthy, key=lambda r: r.inflight)
+        if adapter is None:
+            return least_busy
+
+        holders = [r for r in healthy if r.holds(adapter)]
+        if holders:
+            best = min(holders, key=lambda r: r.inflight)
+            if best.inflight - least_busy.inflight < self.spill_threshold:
+                self.hits += 1
+                best.touch(adapter)
+                return best
+
+        # Prefer replicas that at least have it registered (CPU cache, no runtime load)
+        registered = [r for r in healthy if adapter in r.registered]
+        choice = min(registered or healthy, key=lambda r: r.inflight)
+        self.misses += 1
+        choice.touch(adapter)
+        return choice
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hit_rate': self.hits / total if total else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'replicas': [{'url': r.url, 'healthy': r.healthy, 'inflight': r.inflight,
+                          'resident': list(r.resident), 'registered': sorted(r.registered)}
+                         for r in self.replicas],
+        }
+
+async def refresh_replica(session, replica):
+    """Learn the base model and registered adapters from /v1/models"""
+    try:
+        async with session.get(f"{replica.url}/v1/models") as response:
+            models = (await response.json())['data']
+    except Exception:
+        replica.healthy = False
+        return
+    if not replica.healthy:
+        # Back from a failure, possibly a restart: nothing is resident any more
+        replica.resident.clear()
+    replica.healthy = True
+    # Rebuilt every time: a restarted replica has lost its runtime-loaded adapters.
+    # LoRA modules are listed with the base model as their parent.
+    replica.registered = {model['id'] for model in models if model.get('parent')}
+    replica.base_model = next((model['id'] for model in models if not model.get('parent')),
+                              replica.base_model)
+
+async def ensure_loaded(session, replica, adapter, adapter_paths):
+    """Register an adapter at runtime if the replica does not know it yet"""
+    if adapter in replica.registered or adapter not in adapter_paths:
+        return
+    payload = {'lora_name': adapter, 'lora_path': adapter_paths[adapter]}
+    async with session.post(f"{replica.url}/v1/load_lora_adapter", json=payload) as response:
+        if response.status == 200:
+            replica.registered.add(adapter)
+            print(f"✓ Loaded adapter '{adapter}' on {replica.url}")
+        else:
+            print(f"⚠ Could not load '{adapter}' on {replica.url}: {(await response.text())[:200]}")
+
+async def serve(args, replicas, adapter_paths):
+    from aiohttp import web
+
+    router = AdapterRouter(replicas, args.spill_threshold)
+    session = aiohttp.ClientSession(headers=make_headers(args.api_key),
+                                    connector=aiohttp.TCPConnector(limit=0),
+                                    timeout=aiohttp.ClientTimeout(total=None))
+    for replica in replicas:
+        await refresh_replica(session, replica)
+        status = "✓" if replica.healthy else "❌"
+        print(f"{status} {replica.url}: base={replica.base_model}, "
+              f"{len(replica.registered)} adapters registered")
+
+    async def health_loop():
+        while True:
+            await asyncio.sleep(args.health_interval)
+            for replica in replicas:
+                await refresh_replica(session, replica)
+
+    @web.middleware
+    async def auth(request, handler):
+        # Without this the router is an open, authenticated proxy to the replicas
+        if args.api_key and request.path.startswith(('/v1', '/router')):
+            if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {args.api_key}"):
+                return web.json_response({'error': 'invalid API key'}, status=401)
+        return await handler(request)
+
+    async def handle(request):
+        raw = await request.read()
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return web.json_response({'error': 'invalid JSON'}, status=400)
+        model = body.get('model')
+        adapter = model if model and all(model != r.base_model for r in replicas) else None
+
+        replica = router.choose(adapter)
+        if replica is None:
+            return web.json_response({'error': 'no healthy replicas'}, status=503)
+        # Count the request before any await so concurrent picks see this replica as busy
+        replica.inflight += 1
+        try:
+            if adapter:
+                await ensure_loaded(session, replica, adapter, adapter_paths)
+            async with session.post(f"{replica.url}{request.path_qs}", data=raw,
+                                    headers={'Content-Type': 'application/json'}) as upstream:
+                response = web.StreamResponse(status=upstream.status)
+                response.content_type = upstream.content_type
+                response.headers['X-Routed-To'] = replica.url
+                await response.prepare(request)
+                async for data in upstream.content.iter_any():
+                    await response.write(data)
+                await response.write_eof()
+                return response
+        except aiohttp.ClientError as e:
+            replica.healthy = False
+            return web.json_response({'error': f'replica {replica.url} failed: {e}'}, status=502)
+        finally:
+            replica.inflight -= 1
+
+    async def models(request):
+        # Union of every replica's models so clients can discover all adapters
+        seen = {}
+        for replica in replicas:
+            if replica.base_model:
+                seen.setdefault(replica.base_model, {'id': replica.base_model, 'object': 'model'})
+            for adapter in replica.registered | set(adapter_paths):
+                seen.setdefault(adapter, {'id': adapter, 'object': 'model', 'parent': replica.base_model})
+        return web.json_response({'object': 'list', 'data': list(seen.values())})
+
+    async def stats(request):
+        return web.json_response(router.stats())
+
+    async def health(request):
+        healthy = any(r.healthy for r in replicas)
+        return web.Response(status=200 if healthy else 503)
+
+    app = web.Application(client_max_size=64 * 1024**2, middlewares=[auth])
+    app.router.add_get('/health', health)
+    app.router.add_get('/v1/models', models)
+    app.router.add_get('/router/stats', stats)
+    app.router.add_post('/v1/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.listen_host, args.listen_port).start()
+    print(f"✓ LoRA router on {args.listen_host}:{args.listen_port} -> {len(replicas)} replicas")
+    monitor = asyncio.create_task(health_loop())
+    try:
+        await asyncio.Event().wait()
+    finally:
+        monitor.cancel()
+        await runner.cleanup()
+        await session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Route LoRA adapter requests to replicas holding them')
+    parser.add_argument('--replicas', nargs='+', required=True, help='Replica base URLs')
+    parser.add_argument('--config', help='YAML config with a lora section (adapter paths, max_loras)')
+    parser.add_argument('--profile', help='Profile name in --config')
+    parser.add_argument('--max-loras', type=int, help='GPU adapter slots per replica')
+    parser.add_argument('--api-key', help='API key sent to the replicas and required from clients')
+    parser.add_argument('--listen-host', default='127.0.0.1',
+                        help='Address to listen on (0.0.0.0 to accept remote clients)')
+    parser.add_argument('--listen-port', type=int, default=8100)
+    parser.add_argument('--spill-threshold', type=int, default=32,
+                        help='Extra in-flight requests tolerated to keep adapter locality')
+    parser.add_argument('--health-interval', type=float, default=30)
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    adapter_paths, max_loras = {}, 4
+    if args.config and args.profile:
+        from deployment_script import load_config
+        config = load_config(args.config, args.profile)
+        if not config or not config.get('lora'):
+            print(f"❌ Profile '{args.profile}' has no lora section")
+            sys.exit(1)
+        adapter_paths = config['lora'].get('adapters', {})
+        max_loras = config['lora'].get('max_loras', max_loras)
+        args.api_key = args.api_key or config['deployment'].get('api_key')
+    max_loras = args.max_loras or max_loras
+
+    replicas = [Replica(url, max_loras) for url in args.replicas]
+    try:
+        asyncio.run(serve(args, replicas, adapter_paths))
+    except KeyboardInterrupt:
+        print("\n⏹️  Router stopped")
+
+if __name__ == "__main__":
+    main()
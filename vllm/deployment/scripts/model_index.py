@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Model Directory Integrity Index
+Usage: python model_index.py build <model_path> [--workers 8]
+       python model_index.py verify <model_path> [--full]
+       python model_index.py update <model_path>
+       python model_index.py check <model_path>
+
+A corrupted or partially copied shard only shows up at load time, as a slow
+and confusing failure. This keeps an index of a model directory - every
+file's size, mtime and per-chunk hashes - so the directory can be checked in
+seconds before a launch:
+
+  build   hash every file (chunks hashed in parallel with large reads) and
+          store the index under ~/.cache/vllm-deploy/model_index
+  verify  compare against the index: missing, new and resized files are
+          reported without hashing; only files whose mtime changed are
+          re-hashed, and the differing chunks are named. --full re-hashes
+          everything (bit rot, silent overwrites that kept the mtime).
+  update  verify, list every changed file, then accept the current state
+          as the new index
+  check   structural checks only, no index needed: every *.safetensors file
+          is as long as its header says and every shard named in
+          model.safetensors.index.json exists
+
+deployment_script.py runs verify (or check, when there is no index yet) as a
+preflight before launching.
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vllm-deploy", "model_index")
+CHUNK_SIZE = 256 * 1024**2   # unit of comparison: a mismatch is reported per chunk
+READ_SIZE = 16 * 1024**2     # one read; hashlib releases the GIL on buffers this large
+DEFAULT_WORKERS = 8
+
+def index_path(model_path):
+    root = os.path.realpath(model_path)
+    name = hashlib.sha256(root.encode()).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{os.path.basename(root.rstrip('/')) or 'root'}-{name}.json")
+
+def scan(model_path):
+    """{relative path: os.stat_result} for every regular file, skipping hidden ones"""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(model_path):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for name in filenames:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(dirpath, name)
+            files[os.path.relpath(path, model_path)] = os.stat(path)
+    return files
+
+def hash_chunk(path, offset, length):
+    """blake2b of one chunk, read with os.preadv into a reused buffer"""
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(min(READ_SIZE, max(length, 1)))
+    view = memoryview(buffer)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        end = offset + length
+        while offset < end:
+            n = os.preadv(fd, [view[:min(len(buffer), end - offset)]], offset)
+            if n == 0:
+                raise OSError(f"{path} shrank while hashing")
+            digest.update(view[:n])
+            offset += n
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+def hash_files(model_path, relpaths, stats, workers=DEFAULT_WORKERS):
+    """{relpath: [chunk hashes]}, chunks of all files hashed in one thread pool"""
+    jobs = []
+    for rel in relpaths:
+        size = stats[rel].st_size
+        for offset in range(0, max(size, 1), CHUNK_SIZE):
+            jobs.append((rel, offset, min(CHUNK_SIZE, size - offset)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda job: hash_chunk(os.path.join(model_path, job[0]), job[1], job[2]),
+                                jobs))
+    chunks = {rel: [] for rel in relpaths}
+    for (rel, _, _), digest in zip(jobs, digests):
+        chunks[rel].append(digest)
+    return chunks
+
+def file_entry(stat, chunks):
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': chunks}
+
+def load_index(model_path):
+    try:
+        with open(index_path(model_path)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('chunk_size') == CHUNK_SIZE else None
+
+def save_index(model_path, files):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    path = index_path(model_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'root': os.path.realpath(model_path), 'created': time.time(),
+                   'chunk_size': CHUNK_SIZE, 'files': files}, f)
+    os.replace(tmp, path)
+    return path
+
+def build(model_path, workers=DEFAULT_WORKERS):
+    stats = scan(model_path)
+    chunks = hash_files(model_path, sorted(stats), stats, workers)
+    files = {rel: file_entry(stats[rel], chunks[rel]) for rel in sorted(stats)}
+    return files, save_index(model_path, files)
+
+def verify(model_path, index, full=False, workers=DEFAULT_WORKERS, for_update=False):
+    """Compare the directory with its index.
+
+    Returns a report dict: missing, added, resized, corrupted ({file: [chunk
+    numbers]}), rehashed (files whose content was re-checked) and files (the
+    current entries; new and resized files are only hashed with for_update).
+    """
+    stats = scan(model_path)
+    indexed = index['files']
+    report = {
+        'missing': sorted(set(indexed) - set(stats)),
+        'added': sorted(set(stats) - set(indexed)),
+        'resized': sorted(rel for rel in stats if rel in indexed
+                          and stats[rel].st_size != indexed[rel]['size']),
+        'corrupted': {},
+        'rehashed': [],
+    }
+    # Same size: only re-read files whose mtime moved, unless asked for everything
+    suspect = sorted(rel for rel in stats if rel in indexed and rel not in report['resized']
+                     and (full or stats[rel].st_mtime_ns != indexed[rel]['mtime_ns']))
+    to_hash = suspect + (report['resized'] + report['added'] if for_update else [])
+    chunks = hash_files(model_path, to_hash, stats, workers) if to_hash else {}
+    for rel in suspect:
+        bad = [i for i, (old, new) in enumerate(zip(indexed[rel]['chunks'], chunks[rel])) if old != new]
+        if bad:
+            report['corrupted'][rel] = bad
+    report['rehashed'] = to_hash
+    report['files'] = {rel: (file_entry(stats[rel], chunks[rel]) if rel in chunks else indexed[rel])
+                       for rel in sorted(stats) if rel in chunks or rel in indexed}
+    return report
+
+def report_ok(report):
+    return not (report['missing'] or report['resized'] or report['corrupted'])
+
+def safetensors_length(path):
+    """Expected file size from the safetensors header, or None if the header is unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            header_len = struct.unpack('<Q', f.read(8))[0]
+            if header_len > 100 * 1024**2:
+                return None
+            header = json.loads(f.read(header_len))
+    except (OSError, ValueError, struct.error):
+        return None
+    data_end = max((t['data_offsets'][1] for name, t in header.items() if name != '__metadata__'),
+                   default=0)
+    return 8 + header_len + data_end
+
+def check_structure(model_path):
+    """Problems detectable without an index; returns a list of messages"""
+    problems = []
+    names = set(os.listdir(model_path))
+    for name in sorted(n for n in names if n.endswith('.safetensors')):
+        path = os.path.join(model_path, name)
+        expected = safetensors_length(path)
+        actual = os.path.getsize(path)
+        if expected is None:
+            problems.append(f"{name}: unreadable safetensors header")
+        elif expected != actual:
+            problems.append(f"{name}: {actual} bytes, header expects {expected} (truncated copy?)")
+    for index_name in sorted(n for n in names if n.endswith('.safetensors.index.json')):
+        try:
+            with open(os.path.join(model_path, index_name)) as f:
+                shards = set(json.load(f).get('weight_map', {}).values())
+        except (OSError, ValueError) as e:
+            problems.append(f"{index_name}: unreadable ({e})")
+            continue
+        for shard in sorted(shards - names):
+            problems.append(f"{index_name}: shard {shard} is missing")
+    if 'config.json' not in names and 'params.json' not in names:  # params.json: Mistral format
+        problems.append("config.json is missing")
+    return problems
+
+def preflight(model_path, workers=DEFAULT_WORKERS):
+    """Fast launch check: verify against the index if there is one, else structural checks.
+
+    Returns True when the directory looks intact.
+    """
+    start = time.perf_counter()
+    problems = check_structure(model_path)
+    index = load_index(model_path)
+    report = verify(model_path, index, workers=workers) if index else None
+    elapsed = time.perf_counter() - start
+    for problem in problems:
+        print(f"❌ {problem}")
+    if report:
+        print_report(report)
+        if report_ok(report) and not problems:
+            print(f"✓ Model files match the integrity index ({len(report['files'])} files, "
+                  f"{len(report['rehashed'])} re-hashed, {elapsed:.1f}s)")
+    elif not problems:
+        print(f"✓ Model shards are complete ({elapsed:.1f}s); run `model_index.py build {model_path}` "
+              "to also detect corruption")
+    return not problems and (report is None or report_ok(report))
+
+def print_report(report):
+    for rel in report['missing']:
+        print(f"❌ Missing: {rel}")
+    for rel in report['resized']:
+        print(f"❌ Size changed: {rel}")
+    for rel, chunks in report['corrupted'].items():
+        ranges = ", ".join(f"{c * CHUNK_SIZE // 1024**2}-{(c + 1) * CHUNK_SIZE // 1024**2}MB" for c in chunks)
+        print(f"❌ Content changed: {rel} (at {ranges})")
+    for rel in report['added']:
+        print(f"⚠ Not in index: {rel}")
+
+def print_changes(report):
+    """List what `update` is about to accept into the index; returns the number of files"""
+    changes = ([('new file', rel) for rel in report['added']]
+               + [('removed file', rel) for rel in report['missing']]
+               + [('size change', rel) for rel in report['resized']]
+               + [('content change', rel) for rel in report['corrupted']])
+    for kind, rel in changes:
+        print(f"⚠ Accepting {kind}: {rel}")
+    return len(changes)
+
+def format_bytes(size):
+    return f"{size / 1024**3:.2f}GB" if size >= 1024**3 else f"{size / 1024**2:.1f}MB"
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and verify a model directory integrity index')
+    parser.add_argument('command', choices=['build', 'verify', 'update', 'check'])
+    parser.add_argument('model_path')
+    parser.add_argument('--full', action='store_true', help='verify: re-hash every file')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Parallel hashing threads')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.model_path):
+        print(f"❌ Not a directory: {args.model_path}")
+        sys.exit(1)
+
+    if args.command == 'check':
+        problems = check_structure(args.model_path)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✓ Model shards are complete")
+        return
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        files, path = build(args.model_path, args.workers)
+        total = sum(f['size'] for f in files.values())
+        elapsed = time.perf_counter() - start
+        print(f"✓ Indexed {len(files)} files, {format_bytes(total)} in {elapsed:.1f}s "
+              f"({total / 1024**2 / max(elapsed, 1e-9):.0f}MB/s)")
+        print(f"  Index: {path}")
+        return
+
+    index = load_index(args.model_path)
+    if index is None:
+        print(f"❌ No index for {args.model_path} (run: python model_index.py build {args.model_path})")
+        sys.exit(1)
+    report = verify(args.model_path, index, args.full, args.workers, for_update=(args.command == 'update'))
+    elapsed = time.perf_counter() - start
+    if args.command == 'update':
+        changed = print_changes(report)
+        save_index(args.model_path, report['files'])
+        print(f"✓ Index updated: {changed} files changed ({len(report['files'])} files, "
+              f"{len(report['rehashed'])} re-hashed)")
+        return
+    print_report(report)
+    if report_ok(report):
+        print(f"✓ {len(report['files'])} files match the index "
+              f"({len(report['rehashed'])} re-hashed, {elapsed:.1f}s)")
+    else:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,49 @@
 # =============================================================================
 """
 Model Memory Calculator
-Usage: python model_memory_calc.py <model_size_in_billions>
+Usage: python model_memory_calc.py <model_size_in_billions> [context_length] [batch_size] [precision]
+       python model_memory_calc.py --grid [--models 7 70] [--weight-quant fp16 int4] [--csv plan.csv] ...
 Calculates memory needed for model weights and typical KV cache
+
+--grid evaluates every combination of model size x weight quantization x
+KV-cache dtype x context length x concurrency x TP x PP x GPU size in one
+NumPy pass and lists the feasible configurations, cheapest (fewest GPUs)
+first and then by the number of concurrent sequences the KV cache can hold.
+Each configuration is listed once, with the highest requested concurrency
+that fits.
 """
+import argparse
+import csv
 import sys
 
+BYTES_PER_PARAM = {
+    "full": 4, "fp32": 4,
+    "half": 2, "fp16": 2, "bf16": 2,
+    "fp8": 1, "int8": 1,
+    "int4": 0.5,
+}
+KV_CACHE_BYTES = {"fp16": 2, "bf16": 2, "fp8": 1}
+
+# (layers, kv_heads, head_dim) of common dense models, keyed by size in billions.
+# Sizes without an entry use the nearest one.
+MODEL_SHAPES = {
+    1.5: (28, 2, 128),   # Qwen2.5-1.5B
+    3: (36, 2, 128),     # Qwen2.5-3B
+    7: (28, 4, 128),     # Qwen2.5-7B
+    8: (32, 8, 128),     # Llama-3-8B
+    13: (40, 40, 128),   # Llama-2-13B (no GQA)
+    14: (48, 8, 128),    # Qwen2.5-14B
+    32: (64, 8, 128),    # Qwen2.5-32B
+    70: (80, 8, 128),    # Llama-3-70B
+}
+
 def calculate_memory(model_size_b, precision="half", context_length=4096, batch_size=1):
+    if precision not in BYTES_PER_PARAM:
+        raise ValueError(f"Unknown precision '{precision}' (choose from {', '.join(BYTES_PER_PARAM)})")
     print(f"=== Memory Requirements for {model_size_b}B Model ===")
     
     # Model weights
-    bytes_per_param = 2 if precision == "half" else 4
+    bytes_per_param = BYTES_PER_PARAM[precision]
     model_memory_gb = (model_size_b * 1e9 * bytes_per_param) / (1024**3)
     print(f"Model weights ({precision}): {model_memory_gb:.1f}GB")
     
@@ -52,20 +85,178 @@ def calculate_memory(model_size_b, precision="half", context_length=4096, batch_
     
     return total_gb
 
+def model_shape(model_size_b):
+    """(layers, kv_heads, head_dim) of the closest known model size"""
+    closest = min(MODEL_SHAPES, key=lambda size: abs(size - model_size_b) / size)
+    return MODEL_SHAPES[closest]
+
+def plan_grid(model_sizes, weight_quants, kv_dtypes, context_lengths, concurrencies,
+              tp_sizes, pp_sizes, gpu_mems, gpu_memory_utilization=0.9, max_gpus=8):
+    """Evaluate the full configuration grid at once.
+
+    Returns a dict of flat NumPy arrays (one entry per grid point) with the
+    inputs plus weights_gb, kv_needed_gb and kv_budget_gb per GPU, gpus,
+    max_concurrency and a boolean feasible mask.
+    """
+    import numpy as np
+
+    shapes = np.array([model_shape(size) for size in model_sizes], dtype=float)
+    axes = np.meshgrid(
+        np.arange(len(model_sizes)),
+        np.arange(len(weight_quants)),
+        np.arange(len(kv_dtypes)),
+        np.asarray(context_lengths, dtype=float),
+        np.asarray(concurrencies, dtype=float),
+        np.asarray(tp_sizes, dtype=float),
+        np.asarray(pp_sizes, dtype=float),
+        np.asarray(gpu_mems, dtype=float),
+        indexing="ij",
+    )
+    model_idx, wq_idx, kv_idx, context, concurrency, tp, pp, gpu_mem = (a.ravel() for a in axes)
+
+    params = np.asarray(model_sizes, dtype=float)[model_idx] * 1e9
+    weight_bytes = np.array([BYTES_PER_PARAM[q] for q in weight_quants])[wq_idx]
+    kv_bytes = np.array([KV_CACHE_BYTES[d] for d in kv_dtypes])[kv_idx]
+    layers, kv_heads, head_dim = shapes[model_idx].T
+
+    gpus = tp * pp
+    weights_gb = params * weight_bytes / gpus / 1024**3
+    # Same rough framework overhead as calculate_memory, with a 1GB floor
+    overhead_gb = np.maximum(weights_gb * 0.2, 1.0)
+
+    # KV heads are sharded across TP ranks (replicated when TP > kv_heads),
+    # layers across PP stages
+    kv_heads_per_gpu = np.maximum(kv_heads / tp, 1.0)
+    layers_per_gpu = np.ceil(layers / pp)
+    kv_per_token_gb = 2 * layers_per_gpu * kv_heads_per_gpu * head_dim * kv_bytes / 1024**3
+
+    kv_budget_gb = gpu_mem * gpu_memory_utilization - weights_gb - overhead_gb
+    kv_needed_gb = kv_per_token_gb * context * concurrency
+    max_concurrency = np.floor(np.maximum(kv_budget_gb, 0) / (kv_per_token_gb * context))
+
+    feasible = (kv_budget_gb > 0) & (kv_needed_gb <= kv_budget_gb) & (gpus <= max_gpus)
+    # TP must divide the attention heads; the KV head count is a good proxy
+    feasible &= (kv_heads % tp == 0) | (tp % kv_heads == 0)
+
+    return {
+        "model_b": np.asarray(model_sizes, dtype=float)[model_idx],
+        "weight_quant": np.asarray(weight_quants)[wq_idx],
+        "kv_dtype": np.asarray(kv_dtypes)[kv_idx],
+        "context": context.astype(int),
+        "concurrency": concurrency.astype(int),
+        "tp": tp.astype(int),
+        "pp": pp.astype(int),
+        "gpu_mem_gb": gpu_mem,
+        "gpus": gpus.astype(int),
+        "weights_gb": weights_gb,
+        "kv_needed_gb": kv_needed_gb,
+        "kv_budget_gb": kv_budget_gb,
+        "max_concurrency": max_concurrency.astype(int),
+        "feasible": feasible,
+    }
+
+CONFIG_COLUMNS = ["model_b", "weight_quant", "kv_dtype", "context", "tp", "pp", "gpu_mem_gb"]
+
+def rank_feasible(grid):
+    """Indices of feasible rows: fewest GPUs first, then most concurrent sequences.
+
+    Rows that differ only in the requested concurrency describe the same
+    deployment; only the one with the highest feasible concurrency is kept.
+    """
+    import numpy as np
+
+    rows = np.nonzero(grid["feasible"])[0]
+    rows = rows[np.argsort(-grid["concurrency"][rows], kind="stable")]
+    codes = np.stack([np.unique(grid[col][rows], return_inverse=True)[1].ravel()
+                      for col in CONFIG_COLUMNS], axis=1)
+    _, first = np.unique(codes, axis=0, return_index=True)
+    rows = rows[np.sort(first)]
+    order = np.lexsort((-grid["max_concurrency"][rows], grid["gpus"][rows]))
+    return rows[order]
+
+GRID_COLUMNS = ["model_b", "weight_quant", "kv_dtype", "context", "concurrency", "tp", "pp",
+                "gpu_mem_gb", "gpus", "weights_gb", "kv_needed_gb", "kv_budget_gb",
+                "max_concurrency"]
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+def print_grid(grid, rows, limit=50):
+    total = len(grid["feasible"])
+    print(f"=== Capacity Plan: {len(rows)} feasible deployments ({total} grid points evaluated) ===")
+    if len(rows) == 0:
+        print("❌ No configuration fits - try more GPUs, lower precision or shorter context")
+        return
+    shown = rows[:limit]
+    table = [[format_value(grid[col][i].item()) for col in GRID_COLUMNS] for i in shown]
+    widths = [max(len(col), *(len(r[c]) for r in table)) for c, col in enumerate(GRID_COLUMNS)]
+    print("  ".join(col.rjust(w) for col, w in zip(GRID_COLUMNS, widths)))
+    for r in table:
+        print("  ".join(v.rjust(w) for v, w in zip(r, widths)))
+    if len(rows) > limit:
+        print(f"... {len(rows) - limit} more (use --limit or --csv)")
+
+def write_grid_csv(grid, rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(GRID_COLUMNS)
+        for i in rows:
+            writer.writerow([format_value(grid[col][i].item()) for col in GRID_COLUMNS])
+    print(f"✓ Wrote {len(rows)} feasible configurations to {path}")
+
+def grid_main(argv):
+    parser = argparse.ArgumentParser(description="Capacity-planning grid for vLLM deployments")
+    parser.add_argument("--grid", action="store_true")
+    parser.add_argument("--models", type=float, nargs="+", default=[7, 8, 14, 32, 70],
+                        help="Model sizes in billions of parameters")
+    parser.add_argument("--weight-quant", nargs="+", default=["fp16", "bf16", "fp8", "int8", "int4"],
+                        choices=list(BYTES_PER_PARAM))
+    parser.add_argument("--kv-dtype", nargs="+", default=["fp16", "fp8"], choices=list(KV_CACHE_BYTES))
+    parser.add_argument("--contexts", type=int, nargs="+", default=[2048, 4096, 8192])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--tp", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pp", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--gpu-mem", type=float, nargs="+", default=[80], help="GPU memory in GB")
+    parser.add_argument("--gpu-memory-utilization", type=float, default=0.9)
+    parser.add_argument("--max-gpus", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=50, help="Rows to print")
+    parser.add_argument("--csv", help="Write all feasible configurations to this CSV file")
+    args = parser.parse_args(argv)
+
+    grid = plan_grid(args.models, args.weight_quant, args.kv_dtype, args.contexts,
+                     args.concurrency, args.tp, args.pp, args.gpu_mem,
+                     args.gpu_memory_utilization, args.max_gpus)
+    rows = rank_feasible(grid)
+    print_grid(grid, rows, args.limit)
+    if args.csv:
+        write_grid_csv(grid, rows, args.csv)
+
 def main():
+    if "--grid" in sys.argv[1:]:
+        grid_main(sys.argv[1:])
+        return
+    
     if len(sys.argv) < 2:
-        print("Usage: python model_memory_calc.py <model_size_in_billions> [context_length] [batch_size]")
+        print("Usage: python model_memory_calc.py <model_size_in_billions> [context_length] [batch_size] [precision]")
+        print("       python model_memory_calc.py --grid [options]  (see --grid --help)")
         print("Examples:")
         print("  python model_memory_calc.py 7")
         print("  python model_memory_calc.py 8 4096 1")
-        print("  python model_memory_calc.py 13 2048 4")
+        print("  python model_memory_calc.py 13 2048 4 int4")
+        print("  python model_memory_calc.py --grid --models 8 70 --contexts 8192 --csv plan.csv")
         sys.exit(1)
     
     model_size = float(sys.argv[1])
     context_length = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
     batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    precision = sys.argv[4] if len(sys.argv) > 4 else "half"
+    if precision not in BYTES_PER_PARAM:
+        print(f"❌ Unknown precision '{precision}' (choose from {', '.join(BYTES_PER_PARAM)})")
+        sys.exit(1)
     
-    calculate_memory(model_size, "half", context_length, batch_size)
+    calculate_memory(model_size, precision, context_length, batch_size)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+vLLM Prometheus Metrics Reader
+Usage: python server_metrics.py [base_url] [--file metrics.txt] [--grep spec_decode]
+
+Fetches and parses the server's /metrics endpoint (Prometheus text format).
+Counters are summed across label sets so values compare across scrapes;
+delta() gives the change between two scrapes. --file parses a saved scrape
+instead of a live server.
+"""
+import argparse
+import re
+import sys
+import time
+
+SAMPLE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+([^\s]+)')
+
+def parse_prometheus(text):
+    """Returns {metric_name: value} with samples of the same name summed over labels"""
+    metrics = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if not match:
+            continue
+        try:
+            value = float(match.group(3))
+        except ValueError:
+            continue
+        name = match.group(1)
+        metrics[name] = metrics.get(name, 0.0) + value
+    return metrics
+
+def fetch_metrics(base_url, timeout=10):
+    import requests
+    response = requests.get(f"{base_url}/metrics", timeout=timeout)
+    response.raise_for_status()
+    return parse_prometheus(response.text)
+
+def delta(before, after):
+    """after - before for every metric present in after"""
+    return {name: value - before.get(name, 0.0) for name, value in after.items()}
+
+def first_metric(metrics, *names, default=0.0):
+    """Value of the first name present (metric names differ across vLLM versions)"""
+    for name in names:
+        if name in metrics:
+            return metrics[name]
+    return default
+
+def wait_for_health(base_url, timeout=600, interval=5):
+    """Poll /health until the server answers 200; returns True on success"""
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=5).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Read vLLM Prometheus metrics')
+    parser.add_argument('base_url', nargs='?', default='http://localhost:6789')
+    parser.add_argument('--file', help='Parse a saved /metrics scrape instead')
+    parser.add_argument('--grep', default='vllm:', help='Only show metrics containing this')
+    args = parser.parse_args()
+
+    try:
+        if args.file:
+            with open(args.file) as f:
+                metrics = parse_prometheus(f.read())
+        else:
+            metrics = fetch_metrics(args.base_url)
+    except Exception as e:
+        print(f"❌ Cannot read metrics: {e}")
+        sys.exit(1)
+
+    for name in sorted(metrics):
+        if args.grep in name:
+            print(f"{name}: {metrics[name]:g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Simulated vLLM Server for CPU-Only Development
+Usage: python sim_vllm_server.py [--config <config.yaml> --profile <name>] [--port 6789] [--api-key KEY]
+                                 [--prefill-ms-per-token 0.1] [--decode-ms 12] [--decode-ms-per-seq 0.3]
+                                 [--kv-capacity-seqs 4] [--max-num-seqs 64]
+
+Stands in for `vllm serve` so the client scripts (get_model_name.py,
+vllm_api_test.py, test_working_deployment.py, test_tool_calls.py) and the
+load-testing tools can be run without a GPU. Serves /health, /v1/models,
+/v1/completions, /v1/chat/completions (plain, streaming and tool calls),
+/tokenize and a Prometheus /metrics with vLLM's metric names.
+
+Token timing follows a continuous-batching model:
+  - a scheduler step admits waiting requests first come, first served while
+    KV blocks, max_num_seqs and the batched-token budget allow;
+  - the step takes prefill_ms_per_token for every newly admitted prompt token
+    plus decode_ms + decode_ms_per_seq x running sequences;
+  - every running sequence emits one token per step;
+  - KV capacity is kv_capacity_seqs full-length (max_model_len) sequences,
+    in block_size blocks. When a sequence needs a new block and none is free,
+    the newest running sequence is preempted (recompute) and re-queued.
+
+The server logs stats and preemption lines in vLLM's format, so
+vllm_log_analyzer.py works on its output. Prompt tokens are estimated as
+characters / 4; generated tokens are whole words.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+import uuid
+from collections import deque
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+WORDS = ("the model is running on a simulated GPU and every word here counts as one "
+         "generated token so timing can be measured without real hardware").split()
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+def log(level, source, message):
+    """vLLM's log line layout: 'LEVEL MM-DD HH:MM:SS file.py:line] message'"""
+    print(f"{level} {time.strftime('%m-%d %H:%M:%S')} {source}] {message}", flush=True)
+
+class Sequence:
+    _ids = itertools.count()
+
+    def __init__(self, prompt_tokens, pieces, out, index=0):
+        self.id = next(self._ids)
+        self.prompt_tokens = prompt_tokens
+        self.pieces = pieces          # output token texts, emitted one per step
+        self.out = out                # asyncio.Queue shared by the request's choices
+        self.index = index
+        self.generated = 0
+        self.blocks = 0
+        self.prefill_tokens = prompt_tokens  # tokens to (re)compute on admission
+        self.arrival = time.perf_counter()
+        self.aborted = False
+
+    @property
+    def context(self):
+        return self.prompt_tokens + self.generated
+
+    @property
+    def finished(self):
+        return self.generated >= len(self.pieces)
+
+class BatchScheduler:
+    """Continuous-batching timing model; step() plans one engine iteration"""
+
+    def __init__(self, max_model_len, block_size, kv_capacity_seqs=4, max_num_seqs=64,
+                 max_num_batched_tokens=None, prefill_ms_per_token=0.1, decode_ms=12.0,
+                 decode_ms_per_seq=0.3):
+        self.block_size = block_size
+        self.total_blocks = int(math.ceil(max_model_len / block_size) * kv_capacity_seqs)
+        self.free_blocks = self.total_blocks
+        self.max_num_seqs = max_num_seqs
+        self.max_num_batched_tokens = max_num_batched_tokens or max(max_model_len, 8192)
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms = decode_ms
+        self.decode_ms_per_seq = decode_ms_per_seq
+        self.waiting = deque()
+        self.running = []
+        self.preemptions = 0
+        self.prompt_tokens_total = 0
+        self.generation_tokens_total = 0
+
+    def blocks_for(self, tokens):
+        return math.ceil(tokens / self.block_size)
+
+    def add(self, seq):
+        self.waiting.append(seq)
+
+    def _free(self, seq):
+        self.free_blocks += seq.blocks
+        seq.blocks = 0
+
+    def _preempt(self, seq):
+        """Recompute preemption: drop its KV cache and put it back at the queue head"""
+        self.running.remove(seq)
+        self._free(seq)
+        seq.prefill_tokens = seq.context
+        self.waiting.appendleft(seq)
+        self.preemptions += 1
+        log("WARNING", "scheduler.py:1", f"Sequence group {seq.id} is preempted by "
+            "PreemptionMode.RECOMPUTE mode because there is not enough KV cache space.")
+
+    def step(self):
+        """Plan one iteration. Returns (duration_s, sequences that emit a token)."""
+        for seq in [s for s in self.running if s.aborted]:
+            self.running.remove(seq)
+            self._free(seq)
+        self.waiting = deque(s for s in self.waiting if not s.aborted)
+
+        # Running sequences reserve a block for their next token, oldest first
+        for seq in list(self.running):
+            if seq not in self.running:
+                continue  # preempted below on behalf of an older sequence
+            while self.blocks_for(seq.context + 1) > seq.blocks:
+                if self.free_blocks:
+                    self.free_blocks -= 1
+                    seq.blocks += 1
+                else:
+                    self._preempt(self.running[-1])
+                    if seq not in self.running:
+                        break
+        decoding = list(self.running)
+
+        # Admit waiting sequences while there is room
+        prefill, budget = [], self.max_num_batched_tokens
+        while self.waiting and len(self.running) < self.max_num_seqs:
+            seq = self.waiting[0]
+            needed = self.blocks_for(seq.context + 1)
+            if needed > self.free_blocks or (prefill and seq.prefill_tokens > budget):
+                break
+            self.waiting.popleft()
+            self.free_blocks -= needed
+            seq.blocks = needed
+            budget -= seq.prefill_tokens
+            self.running.append(seq)
+            prefill.append(seq)
+
+        prefill_tokens = sum(s.prefill_tokens for s in prefill)
+        self.prompt_tokens_total += prefill_tokens
+        duration = (prefill_tokens * self.prefill_ms_per_token +
+                    (self.decode_ms + self.decode_ms_per_seq * len(self.running)
+                     if self.running else 0.0)) / 1000
+        return duration, decoding + prefill
+
+    def emit(self, seqs):
+        """Deliver one token to each sequence after the step has elapsed"""
+        for seq in seqs:
+            if seq not in self.running:
+                continue
+            seq.out.put_nowait((seq.index, seq.pieces[seq.generated]))
+            seq.generated += 1
+            self.generation_tokens_total += 1
+            if seq.finished:
+                seq.out.put_nowait((seq.index, None))
+                self.running.remove(seq)
+                self._free(seq)
+
+    def kv_usage(self):
+        return 1 - self.free_blocks / self.total_blocks if self.total_blocks else 0.0
+
+    def metrics_text(self):
+        metrics = {
+            'vllm:num_requests_running': len(self.running),
+            'vllm:num_requests_waiting': len(self.waiting),
+            'vllm:num_requests_swapped': 0,
+            'vllm:gpu_cache_usage_perc': self.kv_usage(),
+            'vllm:kv_cache_usage_perc': self.kv_usage(),
+            'vllm:num_preemptions_total': self.preemptions,
+            'vllm:prompt_tokens_total': self.prompt_tokens_total,
+            'vllm:generation_tokens_total': self.generation_tokens_total,
+        }
+        return "".join(f'{name}{{model_name="sim"}} {value}\n' for name, value in metrics.items())
+
+async def engine_loop(scheduler, wakeup, stats_interval=10.0):
+    last_stats = time.perf_counter()
+    last_prompt = last_gen = 0
+    while True:
+        if not scheduler.running and not scheduler.waiting:
+            wakeup.clear()
+            await wakeup.wait()
+        duration, seqs = scheduler.step()
+        await asyncio.sleep(duration)
+        scheduler.emit(seqs)
+
+        now = time.perf_counter()
+        if now - last_stats >= stats_interval:
+            elapsed = now - last_stats
+            log("INFO", "metrics.py:1",
+                f"Avg prompt throughput: {(scheduler.prompt_tokens_total - last_prompt) / elapsed:.1f} tokens/s, "
+                f"Avg generation throughput: {(scheduler.generation_tokens_total - last_gen) / elapsed:.1f} tokens/s, "
+                f"Running: {len(scheduler.running)} reqs, Swapped: 0 reqs, "
+                f"Pending: {len(scheduler.waiting)} reqs, GPU KV cache usage: {scheduler.kv_usage() * 100:.1f}%, "
+                f"CPU KV cache usage: 0.0%.")
+            last_stats, last_prompt, last_gen = now, scheduler.prompt_tokens_total, scheduler.generation_tokens_total
+
+def text_pieces(count, offset=0):
+    return [(" " if i else "") + WORDS[(offset + i) % len(WORDS)] for i in range(count)]
+
+def example_arguments(tool):
+    """Arguments for a tool call, filled from the tool's JSON schema"""
+    samples = {'string': 'example', 'number': 1, 'integer': 1, 'boolean': True,
+               'array': [], 'object': {}}
+    properties = tool.get('function', {}).get('parameters', {}).get('properties', {})
+    return {name: samples.get(schema.get('type'), 'example') for name, schema in properties.items()}
+
+def argument_pieces(arguments, size=4):
+    """Split serialized arguments into token-sized fragments"""
+    text = json.dumps(arguments)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def output_length(body, default_tokens):
+    max_tokens = body.get('max_tokens') or body.get('max_completion_tokens')
+    if body.get('ignore_eos') and max_tokens:
+        return max_tokens
+    return max(1, min(max_tokens, default_tokens) if max_tokens else default_tokens)
+
+def create_app(args):
+    scheduler = BatchScheduler(args.max_model_len, args.block_size, args.kv_capacity_seqs,
+                               args.max_num_seqs, args.max_num_batched_tokens,
+                               args.prefill_ms_per_token, args.decode_ms, args.decode_ms_per_seq)
+    wakeup = asyncio.Event()
+    adapters = dict(args.adapters)
+
+    def error(message, status=400):
+        return web.json_response({'object': 'error', 'message': message, 'code': status}, status=status)
+
+    @web.middleware
+    async def auth(request, handler):
+        if args.api_key and request.path.startswith('/v1'):
+            if request.headers.get('Authorization') != f"Bearer {args.api_key}":
+                return web.json_response({'error': 'Unauthorized'}, status=401)
+        return await handler(request)
+
+    def submit(prompt_tokens, pieces_list):
+        out = asyncio.Queue()
+        seqs = [Sequence(prompt_tokens[i], pieces, out, i) for i, pieces in enumerate(pieces_list)]
+        for seq in seqs:
+            scheduler.add(seq)
+        wakeup.set()
+        return seqs, out
+
+    async def drain(seqs, out):
+        """Yield (index, piece) until every sequence finishes"""
+        remaining = len(seqs)
+        try:
+            while remaining:
+                index, piece = await out.get()
+                if piece is None:
+                    remaining -= 1
+                else:
+                    yield index, piece
+        finally:
+            for seq in seqs:
+                seq.aborted = not seq.finished
+
+    def check_context(body, prompt_tokens, lengths):
+        for tokens, length in zip(prompt_tokens, lengths):
+            if tokens + length > args.max_model_len:
+                return error(f"This model's maximum context length is {args.max_model_len} tokens. "
+                             f"However, you requested {tokens + length} tokens ({tokens} in the messages, "
+                             f"{length} in the completion). Please reduce the length of the messages or completion.")
+        if body.get('model') and body['model'] != args.served_model_name and body['model'] not in adapters:
+            return error(f"The model `{body['model']}` does not exist.", 404)
+        return None
+
+    async def stream_response(request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                               'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        return response
+
+    async def send_event(response, data):
+        await response.write(b"data: " + json.dumps(data).encode() + b"\n\n")
+
+    def usage(prompt_tokens, completion_tokens):
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    async def completions(request):
+        body = await request.json()
+        prompts = body.get('prompt', '')
+        # One prompt: a string or a flat list of token ids; several: a list of either
+        if not isinstance(prompts, list) or (prompts and all(isinstance(t, int) for t in prompts)):
+            prompts = [prompts]
+        if not prompts:
+            return error("prompt must not be empty")
+        prompt_tokens = [len(p) if isinstance(p, list) else estimate_tokens(p) for p in prompts]
+        length = output_length(body, args.output_tokens)
+        rejected = check_context(body, prompt_tokens, [length] * len(prompts))
+        if rejected:
+            return rejected
+        seqs, out = submit(prompt_tokens, [text_pieces(length, i) for i in range(len(prompts))])
+        request_id, created = f"cmpl-{uuid.uuid4().hex}", int(time.time())
+        model = body.get('model') or args.served_model_name
+
+        def chunk(choices):
+            return {'id': request_id, 'object': 'text_completion', 'created': created,
+                    'model': model, 'choices': choices}
+
+        if not body.get('stream'):
+            texts = [''] * len(prompts)
+            async for index, piece in drain(seqs, out):
+                texts[index] += piece
+            result = chunk([{'index': i, 'text': t, 'finish_reason': 'length', 'logprobs': None}
+                            for i, t in enumerate(texts)])
+            result['usage'] = usage(sum(prompt_tokens), length * len(prompts))
+            return web.json_response(result)
+
+        response = await stream_response(request)
+        # The engine may already have queued later tokens, so finish the choice by
+        # position in the stream rather than by its live generation state
+        sent = [0] * len(seqs)
+        async for index, piece in drain(seqs, out):
+            sent[index] += 1
+            finished = sent[index] == len(seqs[index].pieces)
+            await send_event(response, chunk([{'index': index, 'text': piece, 'logprobs': None,
+                                               'finish_reason': 'length' if finished else None}]))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            await send_event(response, dict(chunk([]), usage=usage(sum(prompt_tokens), length * len(prompts))))
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def chat_completions(request):
+        body = await request.json()
+        messages = body.get('messages', [])
+        prompt_text = "".join(str(m.get('content') or '') for m in messages)
+        prompt_tokens = estimate_tokens(prompt_text) + 4 * len(messages)
+        tools = body.get('tools') or []
+        tool = tools[0] if tools and body.get('tool_choice') != 'none' else None
+        if tool:
+            arguments = example_arguments(tool)
+            pieces = argument_pieces(arguments)
+        else:
+            pieces = text_pieces(output_length(body, args.output_tokens))
+        rejected = check_context(body, [prompt_tokens], [len(pieces)])
+        if rejected:
+            return rejected
+        seqs, out = submit([prompt_tokens], [pieces])
+        request_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+        model = body.get('model') or args.served_model_name
+        call_id = f"chatcmpl-tool-{uuid.uuid4().hex[:16]}"
+        finish_reason = 'tool_calls' if tool else 'length'
+
+        def chunk(delta, finish=None):
+            return {'id': request_id, 'object': 'chat.completion.chunk', 'created': created,
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'logprobs': None,
+                                                 'finish_reason': finish}]}
+
+        if not body.get('stream'):
+            text = "".join([piece async for _, piece in drain(seqs, out)])
+            message = {'role': 'assistant', 'content': None if tool else text}
+            if tool:
+                message['tool_calls'] = [{'id': call_id, 'type': 'function',
+                                          'function': {'name': tool['function']['name'],
+                                                       'arguments': text}}]
+            return web.json_response({
+                'id': request_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+                'usage': usage(prompt_tokens, len(pieces)),
+            })
+
+        response = await stream_response(request)
+        await send_event(response, chunk({'role': 'assistant', 'content': ''}))
+        first = True
+        sent = 0
+        async for _, piece in drain(seqs, out):
+            sent += 1
+            finish = finish_reason if sent == len(pieces) else None
+            if tool:
+                call = {'index': 0, 'function': {'arguments': piece}}
+                if first:
+                    call.update(id=call_id, type='function')
+                    call['function']['name'] = tool['function']['name']
+                delta = {'tool_calls': [call]}
+            else:
+                delta = {'content': piece}
+            first = False
+            await send_event(response, chunk(delta, finish))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            final = chunk({})
+            final.update(choices=[], usage=usage(prompt_tokens, len(pieces)))
+            await send_event(response, final)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def models(request):
+        data = [{'id': args.served_model_name, 'object': 'model', 'owned_by': 'vllm',
+                 'root': args.served_model_name, 'parent': None, 'max_model_len': args.max_model_len}]
+        data += [{'id': name, 'object': 'model', 'owned_by': 'vllm', 'root': path,
+                  'parent': args.served_model_name} for name, path in adapters.items()]
+        return web.json_response({'object': 'list', 'data': data})
+
+    async def load_lora_adapter(request):
+        body = await request.json()
+        adapters[body['lora_name']] = body['lora_path']
+        return web.Response(text=f"Success: LoRA adapter '{body['lora_name']}' added successfully.")
+
+    async def tokenize(request):
+        body = await request.json()
+        count = (estimate_tokens(body['prompt']) if 'prompt' in body else
+                 estimate_tokens("".join(str(m.get('content') or '') for m in body.get('messages', []))))
+        return web.json_response({'count': count, 'max_model_len': args.max_model_len,
+                                  'tokens': list(range(count))})
+
+    async def health(request):
+        return web.Response(status=200)
+
+    async def metrics(request):
+        return web.Response(text=scheduler.metrics_text(), content_type='text/plain')
+
+    async def start_engine(app):
+        app['engine'] = asyncio.create_task(engine_loop(scheduler, wakeup))
+
+    async def stop_engine(app):
+        app['engine'].cancel()
+
+    app = web.Application(middlewares=[auth], client_max_size=64 * 1024**2)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/v1/models', models)
+    app.router.add_post('/v1/completions', completions)
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    app.router.add_post('/v1/load_lora_adapter', load_lora_adapter)
+    app.router.add_post('/tokenize', tokenize)
+    app.on_startup.append(start_engine)
+    app.on_cleanup.append(stop_engine)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulated vLLM OpenAI-compatible server (no GPU)')
+    parser.add_argument('--config', help='YAML config to take model, port, key and KV settings from')
+    parser.add_argument('--profile', help='Profile name in --config')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--api-key')
+    parser.add_argument('--served-model-name', help='Model ID to report (default: the profile model path)')
+    parser.add_argument('--max-model-len', type=int)
+    parser.add_argument('--block-size', type=int)
+    parser.add_argument('--kv-capacity-seqs', type=float, default=4,
+                        help='KV cache size in full-length (max_model_len) sequences')
+    parser.add_argument('--max-num-seqs', type=int, default=64)
+    parser.add_argument('--max-num-batched-tokens', type=int)
+    parser.add_argument('--prefill-ms-per-token', type=float, default=0.1)
+    parser.add_argument('--decode-ms', type=float, default=12.0, help='Fixed cost of a decode step')
+    parser.add_argument('--decode-ms-per-seq', type=float, default=0.3,
+                        help='Added step time per running sequence')
+    parser.add_argument('--output-tokens', type=int, default=64,
+                        help='Generated length when max_tokens is unset or ignore_eos is off')
+    args = parser.parse_args()
+
+    if args.kv_capacity_seqs < 1:
+        parser.error("--kv-capacity-seqs must be at least 1, or no full-length sequence can be admitted")
+    if web is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    args.adapters = {}
+    if args.config and args.profile:
+        from deployment_script import load_config
+        config = load_config(args.config, args.profile)
+        if not config:
+            sys.exit(1)
+        args.port = args.port or config['deployment']['port']
+        args.api_key = args.api_key or config['deployment'].get('api_key')
+        args.served_model_name = args.served_model_name or config['model']['path']
+        args.max_model_len = args.max_model_len or config['performance']['max_model_len']
+        args.block_size = args.block_size or config['performance']['block_size']
+        args.adapters = dict((config.get('lora') or {}).get('adapters', {}))
+    args.port = args.port or 6789
+    args.served_model_name = args.served_model_name or 'sim-model'
+    args.max_model_len = args.max_model_len or 4096
+    args.block_size = args.block_size or 16
+
+    blocks = math.ceil(args.max_model_len / args.block_size) * args.kv_capacity_seqs
+    print(f"✓ Simulated vLLM server: {args.served_model_name} on {args.host}:{args.port}")
+    print(f"  KV cache: {blocks:.0f} blocks of {args.block_size} tokens, max_model_len={args.max_model_len}")
+    print(f"  Timing: prefill {args.prefill_ms_per_token}ms/token, decode step "
+          f"{args.decode_ms}ms + {args.decode_ms_per_seq}ms/seq")
+    web.run_app(create_app(args), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
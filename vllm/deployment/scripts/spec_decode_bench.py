@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Speculative Decoding Benchmark
+Usage: python spec_decode_bench.py --config <config.yaml> --profile <name> [--launch] [--requests 20]
+       python spec_decode_bench.py --baseline-url http://host:6789 --spec-url http://host:6792 [--api-key KEY]
+       python spec_decode_bench.py --config <config.yaml> --profile <name> --dry-run
+       python spec_decode_bench.py --metrics-file before.txt --metrics-file after.txt
+
+Runs the same single-stream workload against a server without and with
+speculative decoding and reports per-token latency, TTFT, speedup and the
+draft acceptance rate read from the speculative server's /metrics.
+
+--launch starts each server in turn from the profile (the speculative section
+removed for the baseline), waits for /health, runs the workload and stops it.
+Without --launch, point --baseline-url/--spec-url at servers that are already
+running. --dry-run prints both generated commands; --metrics-file parses two
+saved /metrics scrapes (before and after) so neither step needs a GPU.
+"""
+import argparse
+import asyncio
+import copy
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+from async_load_client import aiohttp, make_session, percentile, stream_request
+from deployment_script import build_speculative_config, build_vllm_command, load_config
+from server_metrics import delta, fetch_metrics, first_metric, parse_prometheus, wait_for_health
+
+# Mix of prompts that copy from their input (where n-gram drafts shine) and free-form ones
+DEFAULT_PROMPTS = [
+    "Repeat the following list exactly, one item per line: apples, bananas, cherries, dates, elderberries, figs, grapes.",
+    "Rewrite this Python function with type hints:\ndef add(a, b):\n    total = a + b\n    return total\n",
+    "Summarize in three sentences why the sky is blue.",
+    "Write a short story about a robot learning to paint.",
+    "Translate to French: The quick brown fox jumps over the lazy dog.",
+]
+
+def spec_decode_stats(before, after):
+    """Acceptance statistics from two /metrics scrapes of a speculative server"""
+    d = delta(before, after)
+    drafts = first_metric(d, 'vllm:spec_decode_num_drafts_total')
+    draft_tokens = first_metric(d, 'vllm:spec_decode_num_draft_tokens_total')
+    accepted = first_metric(d, 'vllm:spec_decode_num_accepted_tokens_total')
+    stats = {
+        'drafts': drafts,
+        'draft_tokens': draft_tokens,
+        'accepted_tokens': accepted,
+        'acceptance_rate': accepted / draft_tokens if draft_tokens else None,
+        # Tokens emitted per verification step: accepted drafts plus the bonus token
+        'mean_acceptance_length': 1 + accepted / drafts if drafts else None,
+    }
+    # Older engines export the rate directly as a gauge
+    if stats['acceptance_rate'] is None and 'vllm:spec_decode_draft_acceptance_rate' in after:
+        stats['acceptance_rate'] = after['vllm:spec_decode_draft_acceptance_rate']
+    return stats
+
+def token_latency(result):
+    """Mean decode time per output token after the first"""
+    if result['latency'] is None or result['ttft'] is None or result['output_tokens'] < 2:
+        return None
+    return (result['latency'] - result['ttft']) / (result['output_tokens'] - 1)
+
+async def run_workload(base_url, api_key, model, prompts, requests, max_tokens):
+    """Single-stream: one request at a time, as an interactive user would"""
+    results = []
+    async with make_session(api_key) as session:
+        if not model:
+            async with session.get(f"{base_url}/v1/models") as response:
+                model = (await response.json())['data'][0]['id']
+        for i in range(requests):
+            payload = {"model": model, "max_tokens": max_tokens, "temperature": 0,
+                       "messages": [{"role": "user", "content": prompts[i % len(prompts)]}]}
+            results.append(await stream_request(session, base_url, "/v1/chat/completions", payload))
+    return results
+
+def summarize_run(results):
+    ok = [r for r in results if not r['error']]
+    per_token = [t for t in (token_latency(r) for r in ok) if t is not None]
+    return {
+        'succeeded': len(ok),
+        'requests': len(results),
+        'token_latency': percentile(per_token, 50),
+        'token_latency_p90': percentile(per_token, 90),
+        'ttft': percentile([r['ttft'] for r in ok if r['ttft'] is not None], 50),
+        'tokens_per_s': (sum(r['output_tokens'] for r in ok) / sum(r['latency'] for r in ok)
+                         if ok else 0.0),
+    }
+
+def benchmark_endpoint(base_url, args, scrape_metrics=False):
+    before = fetch_metrics(base_url) if scrape_metrics else None
+    results = asyncio.run(run_workload(base_url, args.api_key, args.model, DEFAULT_PROMPTS,
+                                       args.requests, args.max_tokens))
+    summary = summarize_run(results)
+    if scrape_metrics:
+        summary['spec'] = spec_decode_stats(before, fetch_metrics(base_url))
+    errors = [r['error'] for r in results if r['error']]
+    if errors:
+        print(f"❌ {len(errors)} requests failed, first: {errors[0]}")
+    return summary
+
+def launch_server(config):
+    cmd = build_vllm_command(config)
+    env = dict(os.environ)
+    if 'visible_devices' in config['gpu']:
+        env['CUDA_VISIBLE_DEVICES'] = str(config['gpu']['visible_devices'])
+    print(f"🚀 Starting: {' '.join(cmd[:3])} ... (port {config['deployment']['port']})")
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    time.sleep(5)  # let the GPU memory be released before the next launch
+
+def without_speculation(config):
+    baseline = copy.deepcopy(config)
+    baseline.pop('speculative', None)
+    return baseline
+
+def print_comparison(baseline, spec):
+    print("\n=== Speculative Decoding Results ===")
+    print(f"{'':<22}{'baseline':>12}{'speculative':>14}")
+    print(f"{'Per-token latency p50':<22}{baseline['token_latency'] * 1000:>10.1f}ms"
+          f"{spec['token_latency'] * 1000:>12.1f}ms")
+    print(f"{'Per-token latency p90':<22}{baseline['token_latency_p90'] * 1000:>10.1f}ms"
+          f"{spec['token_latency_p90'] * 1000:>12.1f}ms")
+    print(f"{'TTFT p50':<22}{baseline['ttft'] * 1000:>10.1f}ms{spec['ttft'] * 1000:>12.1f}ms")
+    print(f"{'Tokens/s per stream':<22}{baseline['tokens_per_s']:>12.1f}{spec['tokens_per_s']:>14.1f}")
+    if spec['token_latency']:
+        speedup = baseline['token_latency'] / spec['token_latency']
+        icon = "✓" if speedup > 1.05 else "⚠"
+        print(f"{icon} Decode speedup: {speedup:.2f}x")
+    print_spec_stats(spec.get('spec'))
+
+def print_spec_stats(stats):
+    if not stats:
+        return
+    if stats['acceptance_rate'] is None:
+        print("⚠ No speculative decoding metrics found - is speculation enabled on this server?")
+        return
+    print(f"Draft acceptance rate: {stats['acceptance_rate']:.1%} "
+          f"({stats['accepted_tokens']:.0f}/{stats['draft_tokens']:.0f} draft tokens)")
+    if stats['mean_acceptance_length']:
+        print(f"Mean tokens per verification step: {stats['mean_acceptance_length']:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark speculative decoding against a baseline')
+    parser.add_argument('--config', help='YAML config file')
+    parser.add_argument('--profile', help='Profile with a speculative section')
+    parser.add_argument('--launch', action='store_true', help='Start both servers from the profile')
+    parser.add_argument('--dry-run', action='store_true', help='Print both commands and exit')
+    parser.add_argument('--baseline-url', help='Running server without speculation')
+    parser.add_argument('--spec-url', help='Running server with speculation')
+    parser.add_argument('--api-key', help='API key (default: from the profile)')
+    parser.add_argument('--model', help='Model ID (default: first from /v1/models)')
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--max-tokens', type=int, default=256)
+    parser.add_argument('--metrics-file', action='append',
+                        help='Two saved /metrics scrapes (before, after) to parse offline')
+    args = parser.parse_args()
+
+    if args.metrics_file:
+        if len(args.metrics_file) != 2:
+            parser.error("--metrics-file needs exactly two files: before and after")
+        scrapes = []
+        for path in args.metrics_file:
+            with open(path) as f:
+                scrapes.append(parse_prometheus(f.read()))
+        print_spec_stats(spec_decode_stats(*scrapes))
+        return
+
+    config = None
+    if args.config and args.profile:
+        config = load_config(args.config, args.profile)
+        if not config:
+            sys.exit(1)
+        if not build_speculative_config(config):
+            print(f"❌ Profile '{args.profile}' has no speculative section")
+            sys.exit(1)
+        args.api_key = args.api_key or config['deployment'].get('api_key')
+
+    if args.dry_run:
+        if not config:
+            parser.error("--dry-run needs --config and --profile")
+        print("Baseline:\n  " + shlex.join(build_vllm_command(without_speculation(config))))
+        print("Speculative:\n  " + shlex.join(build_vllm_command(config)))
+        return
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    if args.launch:
+        if not config:
+            parser.error("--launch needs --config and --profile")
+        base_url = f"http://localhost:{config['deployment']['port']}"
+        summaries = {}
+        for name, run_config in (('baseline', without_speculation(config)), ('spec', config)):
+            process = launch_server(run_config)
+            try:
+                if not wait_for_health(base_url):
+                    print(f"❌ {name} server did not become healthy")
+                    sys.exit(1)
+                print(f"✓ {name} server ready, running {args.requests} requests")
+                summaries[name] = benchmark_endpoint(base_url, args, scrape_metrics=(name == 'spec'))
+            finally:
+                stop_server(process)
+    elif args.baseline_url and args.spec_url:
+        summaries = {'baseline': benchmark_endpoint(args.baseline_url, args),
+                     'spec': benchmark_endpoint(args.spec_url, args, scrape_metrics=True)}
+    else:
+        parser.error("use --launch, --dry-run, --metrics-file or --baseline-url with --spec-url")
+
+    print_comparison(summaries['baseline'], summaries['spec'])
+
+if __name__ == "__main__":
+    main()
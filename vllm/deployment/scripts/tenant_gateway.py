@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Multi-Tenant API Gateway with Rate Limits and Priority Queues
+Usage: python tenant_gateway.py --config <config.yaml> --profile production [--listen-port 8200]
+       python tenant_gateway.py --backend http://localhost:6789 --tenants tenants.yaml [--api-key KEY]
+
+The server only knows one --api-key, so every client shares it and one FIFO
+queue. This gateway sits in front and gives each tenant its own key:
+  - per-tenant token buckets for requests/minute and tokens/minute
+    (prompt estimate + max_tokens, corrected from usage when the backend
+    reports it); over-limit requests get 429 with Retry-After;
+  - a priority per tenant (0 = most urgent). At most max_inflight requests
+    go to the backend at once; the rest wait in per-priority FIFO queues and
+    a free slot always goes to the most urgent waiting request, so a bulk
+    job cannot push interactive requests behind it;
+  - per-tenant stats (requests, throttled, queue wait, latency, tokens) at
+    GET /gateway/stats.
+
+Tenants come from the profile's gateway section (see
+model_config_templates.yaml) or a --tenants YAML file with the same layout:
+    gateway:
+      max_inflight: 32
+      tenants:
+        chat-ui: {key: "...", priority: 0, requests_per_minute: 600, tokens_per_minute: 400000}
+        batch:   {key: "...", priority: 2, requests_per_minute: 60, tokens_per_minute: 100000}
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+from async_load_client import aiohttp, make_headers, percentile
+
+DEFAULT_MAX_TOKENS = 256
+STATS_WINDOW = 1000  # latency samples kept per tenant
+
+class TokenBucket:
+    """Refills at rate per second up to capacity; may go negative to record debt"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self, amount):
+        """Take amount if available; returns seconds to wait otherwise (0 on success)"""
+        self._refill()
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        if amount > self.capacity:
+            return float('inf')
+        return (amount - self.level) / self.rate
+
+    def adjust(self, amount):
+        """Correct an earlier charge (positive refunds, negative charges more)"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+class PriorityLimiter:
+    """At most max_inflight holders; waiters are served by priority, then arrival"""
+
+    def __init__(self, max_inflight):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.queues = {}  # priority -> deque of futures
+
+    def waiting(self, priority=None):
+        if priority is not None:
+            return len(self.queues.get(priority, ()))
+        return sum(len(q) for q in self.queues.values())
+
+    async def acquire(self, priority):
+        if self.inflight < self.max_inflight and not self.waiting():
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(priority, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # slot was granted as the client went away
+            elif future in self.queues[priority]:  # release() may already have dropped it
+                self.queues[priority].remove(future)
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    self.inflight += 1
+                    future.set_result(None)
+                    return
+
+class Tenant:
+    def __init__(self, name, key, priority=1, requests_per_minute=None, tokens_per_minute=None,
+                 max_queue=256):
+        self.name = name
+        self.key = key
+        self.priority = priority
+        self.max_queue = max_queue
+        # Buckets hold one minute's allowance, so a tenant can burst up to its per-minute limit
+        self.request_bucket = (TokenBucket(requests_per_minute / 60, requests_per_minute)
+                               if requests_per_minute else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+                             if tokens_per_minute else None)
+        self.stats = {'requests': 0, 'completed': 0, 'errors': 0, 'throttled_requests': 0,
+                      'throttled_tokens': 0, 'queue_full': 0, 'tokens_charged': 0}
+        self.queue_waits = deque(maxlen=STATS_WINDOW)
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.inflight = 0
+
+    def admit(self, tokens):
+        """Charge the buckets; returns (ok, reason, retry_after_seconds)"""
+        if self.request_bucket:
+            wait = self.request_bucket.try_consume(1)
+            if wait:
+                self.stats['throttled_requests'] += 1
+                return False, 'request rate limit exceeded', wait
+        if self.token_bucket:
+            wait = self.token_bucket.try_consume(tokens)
+            if wait:
+                if self.request_bucket:
+                    self.request_bucket.adjust(1)
+                self.stats['throttled_tokens'] += 1
+                return False, 'token rate limit exceeded', wait
+        self.stats['tokens_charged'] += tokens
+        return True, None, 0.0
+
+    def settle(self, charged, actual):
+        """Replace the up-front estimate with the backend's usage count"""
+        if self.token_bucket and actual is not None:
+            self.token_bucket.adjust(charged - actual)
+            self.stats['tokens_charged'] += actual - charged
+
+    def summary(self, limiter):
+        return dict(self.stats, priority=self.priority, inflight=self.inflight,
+                    queued=limiter.waiting(self.priority),
+                    queue_wait_p50=percentile(list(self.queue_waits), 50),
+                    queue_wait_p99=percentile(list(self.queue_waits), 99),
+                    latency_p50=percentile(list(self.latencies), 50),
+                    latency_p99=percentile(list(self.latencies), 99))
+
+def estimate_tokens(body):
+    """Up-front charge: prompt characters / 4 plus the requested output budget"""
+    if 'messages' in body:
+        text = "".join(str(m.get('content') or '') for m in body['messages'])
+    else:
+        prompt = body.get('prompt', '')
+        prompts = prompt if isinstance(prompt, list) else [prompt]
+        text = "".join(p if isinstance(p, str) else " " * 4 * len(p) for p in prompts)  # token-id lists
+    max_tokens = body.get('max_tokens') or body.get('max_completion_tokens') or DEFAULT_MAX_TOKENS
+    return len(text) // 4 + max_tokens
+
+def load_tenants(gateway_config):
+    tenants = {}
+    for name, spec in (gateway_config.get('tenants') or {}).items():
+        tenant = Tenant(name, spec['key'], spec.get('priority', 1), spec.get('requests_per_minute'),
+                        spec.get('tokens_per_minute'), spec.get('max_queue', 256))
+        if tenant.key in tenants:
+            raise ValueError(f"tenants '{tenants[tenant.key].name}' and '{name}' share a key")
+        tenants[tenant.key] = tenant
+    return tenants
+
+async def serve(args, tenants):
+    from aiohttp import web
+
+    limiter = PriorityLimiter(args.max_inflight)
+    session = aiohttp.ClientSession(headers=make_headers(args.api_key),
+                                    connector=aiohttp.TCPConnector(limit=0),
+                                    timeout=aiohttp.ClientTimeout(total=None))
+
+    def authenticate(request):
+        auth = request.headers.get('Authorization', '')
+        return tenants.get(auth[7:]) if auth.startswith('Bearer ') else None
+
+    async def forward(request, tenant, raw, charged):
+        """Proxy to the backend, streaming the body through; returns the response"""
+        async with session.request(request.method, f"{args.backend}{request.path_qs}", data=raw,
+                                   headers={'Content-Type': 'application/json'}) as upstream:
+            response = web.StreamResponse(status=upstream.status)
+            response.content_type = upstream.content_type
+            await response.prepare(request)
+            tail = b''
+            async for data in upstream.content.iter_any():
+                await response.write(data)
+                tail = (tail + data)[-4096:]
+            await response.write_eof()
+        if upstream.status >= 400:
+            tenant.stats['errors'] += 1
+            tenant.settle(charged, 0)
+        else:
+            tenant.settle(charged, usage_tokens(tail))
+        return response
+
+    async def handle(request):
+        tenant = authenticate(request)
+        if tenant is None:
+            return web.json_response({'error': 'invalid API key'}, status=401)
+        raw = await request.read()
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return web.json_response({'error': 'invalid JSON'}, status=400)
+
+        tenant.stats['requests'] += 1
+        if limiter.waiting(tenant.priority) >= tenant.max_queue:
+            tenant.stats['queue_full'] += 1
+            return web.json_response({'error': 'queue full', 'tenant': tenant.name}, status=429,
+                                     headers={'Retry-After': '1'})
+        charged = estimate_tokens(body) if request.method == 'POST' else 0
+        ok, reason, retry_after = tenant.admit(charged)
+        if not ok:
+            headers = {} if retry_after == float('inf') else {'Retry-After': str(max(1, round(retry_after)))}
+            return web.json_response({'error': reason, 'tenant': tenant.name}, status=429, headers=headers)
+
+        queued_at = time.perf_counter()
+        await limiter.acquire(tenant.priority)
+        started = time.perf_counter()
+        tenant.queue_waits.append(started - queued_at)
+        tenant.inflight += 1
+        try:
+            response = await forward(request, tenant, raw, charged)
+            tenant.stats['completed'] += 1
+            return response
+        except aiohttp.ClientError as e:
+            tenant.stats['errors'] += 1
+            return web.json_response({'error': f'backend failed: {e}'}, status=502)
+        finally:
+            tenant.inflight -= 1
+            tenant.latencies.append(time.perf_counter() - started)
+            limiter.release()
+
+    async def stats(request):
+        return web.json_response({
+            'inflight': limiter.inflight,
+            'max_inflight': limiter.max_inflight,
+            'queued': limiter.waiting(),
+            'tenants': {t.name: t.summary(limiter) for t in tenants.values()},
+        })
+
+    async def health(request):
+        try:
+            async with session.get(f"{args.backend}/health") as upstream:
+                return web.Response(status=upstream.status)
+        except aiohttp.ClientError:
+            return web.Response(status=503)
+
+    app = web.Application(client_max_size=64 * 1024**2)
+    app.router.add_get('/health', health)
+    app.router.add_get('/gateway/stats', stats)
+    app.router.add_route('*', '/v1/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.listen_host, args.listen_port).start()
+    print(f"✓ Gateway on {args.listen_host}:{args.listen_port} -> {args.backend} "
+          f"({len(tenants)} tenants, max {args.max_inflight} in flight)")
+    for tenant in sorted(tenants.values(), key=lambda t: t.priority):
+        limits = []
+        if tenant.request_bucket:
+            limits.append(f"{tenant.request_bucket.capacity:.0f} req/min")
+        if tenant.token_bucket:
+            limits.append(f"{tenant.token_bucket.capacity:.0f} tokens/min")
+        print(f"  {tenant.name}: priority {tenant.priority}, {', '.join(limits) or 'unlimited'}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await session.close()
+
+def usage_tokens(tail):
+    """total_tokens from the usage object at the end of a JSON or SSE response"""
+    text = tail.decode('utf-8', errors='ignore')
+    marker = text.rfind('"usage"')
+    if marker < 0:
+        return None
+    start = text.find('{', marker)
+    try:
+        usage, _ = json.JSONDecoder().raw_decode(text[start:])
+        return usage.get('total_tokens')
+    except (ValueError, AttributeError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-tenant rate limiting and priority queueing gateway')
+    parser.add_argument('--config', help='YAML config whose profile has a gateway section')
+    parser.add_argument('--profile', help='Profile name in --config')
+    parser.add_argument('--tenants', help='YAML file with a gateway section (instead of --config)')
+    parser.add_argument('--backend', help='Server URL (default: localhost on the profile port)')
+    parser.add_argument('--api-key', help='Backend API key (default: the profile api_key)')
+    parser.add_argument('--listen-host', default='0.0.0.0')
+    parser.add_argument('--listen-port', type=int, default=8200)
+    parser.add_argument('--max-inflight', type=int, help='Requests sent to the backend at once')
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    gateway = {}
+    if args.config and args.profile:
+        from deployment_script import load_config
+        config = load_config(args.config, args.profile)
+        if not config:
+            sys.exit(1)
+        gateway = config.get('gateway') or {}
+        args.backend = args.backend or f"http://localhost:{config['deployment']['port']}"
+        args.api_key = args.api_key or config['deployment'].get('api_key')
+    if args.tenants:
+        import yaml
+        with open(args.tenants) as f:
+            gateway = yaml.safe_load(f).get('gateway', {})
+    if not args.backend:
+        parser.error("give --config/--profile or --backend")
+
+    try:
+        tenants = load_tenants(gateway)
+    except (KeyError, ValueError) as e:
+        print(f"❌ Invalid gateway tenants: {e}")
+        sys.exit(1)
+    if not tenants:
+        print("❌ No tenants configured (gateway.tenants)")
+        sys.exit(1)
+    args.max_inflight = args.max_inflight or gateway.get('max_inflight', 32)
+
+    try:
+        asyncio.run(serve(args, tenants))
+    except KeyboardInterrupt:
+        print("\n⏹️  Gateway stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Streaming Tool-Call Parser and Time-to-First-Tool-Call Test
+Usage: python tool_call_stream.py [--url http://localhost:6789] [--api-key KEY] [--model ID]
+       python tool_call_stream.py --replay captured_stream.txt
+
+Streams a chat completion with tools and assembles the tool-call deltas
+(function name, then JSON argument fragments) as they arrive. Each tool call
+is emitted the moment its arguments form a complete JSON value - before the
+response finishes - so an agent can start executing it early. Reports time to
+first token, time to first complete tool call and argument streaming rate.
+
+--replay parses a captured SSE stream (the raw "data: {...}" lines) instead
+of calling a server, to check the parser without a GPU.
+
+Library use:
+    assembler = ToolCallAssembler()
+    for chunk in sse_chunks:
+        for call in assembler.feed(chunk):
+            run_tool(call["name"], call["arguments"])
+"""
+import argparse
+import json
+import sys
+import time
+
+class JsonCompletionScanner:
+    """Incrementally tracks whether streamed text is a complete JSON object/array.
+
+    Scans each fragment once, tracking bracket depth outside of strings, so
+    completeness is known without re-parsing the whole buffer per delta.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text):
+        """Returns True once the top-level value has closed"""
+        for ch in text:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+                self.started = True
+            elif ch in '}]':
+                self.depth -= 1
+        return self.started and self.depth == 0
+
+class ToolCallAssembler:
+    """Assemble streamed tool_call deltas and emit each call once complete"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.calls = {}      # index -> state
+        self.emitted = []
+
+    def _state(self, index):
+        if index not in self.calls:
+            self.calls[index] = {'index': index, 'id': None, 'name': '', 'arguments': '',
+                                 'scanner': JsonCompletionScanner(), 'done': False,
+                                 'first_delta_at': self.clock(), 'first_args_at': None}
+        return self.calls[index]
+
+    def feed(self, chunk):
+        """Process one parsed SSE chunk; returns the tool calls completed by it"""
+        completed = []
+        for choice in chunk.get('choices', []):
+            delta = choice.get('delta') or {}
+            for part in delta.get('tool_calls') or []:
+                index = part.get('index', 0)
+                # A new index means every earlier call has finished streaming
+                for other in sorted(self.calls):
+                    if other < index:
+                        completed.extend(self._complete(other, parse_partial=True))
+                state = self._state(index)
+                if part.get('id'):
+                    state['id'] = part['id']
+                function = part.get('function') or {}
+                state['name'] += function.get('name') or ''
+                fragment = function.get('arguments') or ''
+                if fragment:
+                    if state['first_args_at'] is None:
+                        state['first_args_at'] = self.clock()
+                    state['arguments'] += fragment
+                    if state['scanner'].feed(fragment):
+                        completed.extend(self._complete(index))
+            if choice.get('finish_reason'):
+                for index in sorted(self.calls):
+                    completed.extend(self._complete(index, parse_partial=True))
+        return completed
+
+    def finish(self):
+        """Flush calls left open when the stream ended"""
+        completed = []
+        for index in sorted(self.calls):
+            completed.extend(self._complete(index, parse_partial=True))
+        return completed
+
+    def _complete(self, index, parse_partial=False):
+        state = self.calls[index]
+        if state['done'] or not state['name']:
+            return []
+        try:
+            arguments = json.loads(state['arguments'] or '{}')
+            error = None
+        except json.JSONDecodeError as e:
+            if not parse_partial:
+                return []  # brackets balanced but not valid JSON yet; wait for more
+            arguments, error = None, f"invalid JSON arguments: {e}"
+        state['done'] = True
+        now = self.clock()
+        args_start = state['first_args_at'] or now
+        seconds = now - args_start
+        call = {
+            'index': index,
+            'id': state['id'],
+            'name': state['name'],
+            'arguments': arguments,
+            'raw_arguments': state['arguments'],
+            'error': error,
+            'completed_at': now,
+            'argument_seconds': seconds,
+            'argument_chars_per_s': len(state['arguments']) / seconds if seconds > 0 else None,
+        }
+        self.emitted.append(call)
+        return [call]
+
+def iter_sse_chunks(lines):
+    """Parsed JSON chunks from SSE lines (bytes or str), stopping at [DONE]"""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        yield json.loads(data)
+
+def run_stream(chunks, start):
+    """Drive the assembler over chunks, printing calls as they complete"""
+    assembler = ToolCallAssembler()
+    first_token_at = None
+    content = ''
+    for chunk in chunks:
+        if first_token_at is None and chunk.get('choices'):
+            first_token_at = time.perf_counter()
+        for choice in chunk.get('choices', []):
+            content += (choice.get('delta') or {}).get('content') or ''
+        for call in assembler.feed(chunk):
+            print_call(call, start)
+    for call in assembler.finish():
+        print_call(call, start)
+    end = time.perf_counter()
+    return assembler.emitted, first_token_at, end, content
+
+def print_call(call, start):
+    status = "✓" if not call['error'] else "✗"
+    print(f"{status} [{(call['completed_at'] - start) * 1000:.0f}ms] tool call {call['index']}: "
+          f"{call['name']}({json.dumps(call['arguments']) if not call['error'] else call['raw_arguments']})")
+    if call['error']:
+        print(f"   {call['error']}")
+
+def print_metrics(calls, start, first_token_at, end):
+    print("\n=== Streaming Tool-Call Metrics ===")
+    if first_token_at:
+        print(f"Time to first token: {(first_token_at - start) * 1000:.0f}ms")
+    if not calls:
+        print("❌ No tool calls in the response")
+        return
+    first = min(c['completed_at'] for c in calls)
+    print(f"Time to first tool call: {(first - start) * 1000:.0f}ms")
+    print(f"Total stream time: {(end - start) * 1000:.0f}ms "
+          f"(first call ready {(end - first) * 1000:.0f}ms before the stream ended)")
+    for call in calls:
+        rate = (f"{call['argument_chars_per_s']:.0f} chars/s"
+                if call['argument_chars_per_s'] else "single chunk")
+        print(f"  {call['name']}: {len(call['raw_arguments'])} argument chars in "
+              f"{call['argument_seconds'] * 1000:.0f}ms ({rate})")
+
+CALCULATOR_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "calculator",
+        "description": "Perform basic arithmetic",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "operation": {"type": "string"},
+                "a": {"type": "number"},
+                "b": {"type": "number"}
+            },
+            "required": ["operation", "a", "b"]
+        }
+    }
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream tool calls and measure time to first tool call')
+    parser.add_argument('--url', default='http://localhost:6789')
+    parser.add_argument('--api-key', default='some-key-there')
+    parser.add_argument('--model', help='Model ID (default: first from /v1/models)')
+    parser.add_argument('--prompt', default='Calculate 15 * 24 and then 7 + 8 using the calculator tool')
+    parser.add_argument('--replay', help='Parse a captured SSE stream file instead')
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay) as f:
+            start = time.perf_counter()
+            calls, first_token_at, end, _ = run_stream(iter_sse_chunks(f), start)
+        print_metrics(calls, start, first_token_at, end)
+        return
+
+    import requests
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {args.api_key}"}
+    model = args.model
+    try:
+        if not model:
+            response = requests.get(f"{args.url}/v1/models", headers=headers, timeout=10)
+            model = response.json()['data'][0]['id']
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": args.prompt}],
+            "tools": [CALCULATOR_TOOL],
+            "max_tokens": 200,
+            "stream": True,
+        }
+        start = time.perf_counter()
+        response = requests.post(f"{args.url}/v1/chat/completions", headers=headers,
+                                 json=payload, stream=True, timeout=60)
+        if response.status_code != 200:
+            print(f"✗ Error {response.status_code}: {response.text}")
+            sys.exit(1)
+        calls, first_token_at, end, content = run_stream(iter_sse_chunks(response.iter_lines()), start)
+    except Exception as e:
+        print(f"✗ Connection error: {e}")
+        sys.exit(1)
+
+    if content.strip():
+        print(f"Content: '{content.strip()}'")
+    print_metrics(calls, start, first_token_at, end)
+
+if __name__ == "__main__":
+    main()
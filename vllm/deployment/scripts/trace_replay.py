@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Open-Loop Traffic Trace Recorder and Replayer
+Usage: python trace_replay.py record --backend http://localhost:6789 [--listen-port 8000] [--out trace.jsonl]
+       python trace_replay.py replay trace.jsonl [--url http://localhost:6789] [--api-key KEY]
+                              [--time-scale 1.0] [--rate-multiplier 1.0] [--workers 4]
+                              [--slo-ttft 0.5] [--slo-itl 0.05] [--store bench.db --profile NAME]
+
+record runs a pass-through proxy in front of the server and appends one JSON
+line per request: arrival timestamp, endpoint, the request body (prompt or
+messages plus sampling parameters) and the output token count.
+
+replay sends the trace open-loop: each request fires at its original offset
+from the first arrival regardless of whether earlier requests have finished,
+so queueing delay shows up in TTFT instead of being hidden by the client.
+Gaps are multiplied by --time-scale and divided by --rate-multiplier.
+max_tokens is pinned to the recorded output length (with ignore_eos) so the
+server does the same amount of decode work as in production.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from async_load_client import (aiohttp, make_session, print_summary, store_metrics,
+                               stream_request, summarize)
+
+# Wake this long before a send time, then yield until it is due. asyncio.sleep
+# alone overshoots by ~1ms per call; spinning on sleep(0) keeps sends within
+# the budget while still letting in-flight responses make progress.
+SPIN_WINDOW = 0.002
+
+# =============================================================================
+# Recording proxy
+# =============================================================================
+
+def output_tokens_from_body(body):
+    usage = body.get("usage") or {}
+    return usage.get("completion_tokens")
+
+async def record_proxy(backend, listen_host, listen_port, out_path):
+    from aiohttp import web
+
+    out = open(out_path, "a", buffering=1)
+    session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None))
+
+    async def handle(request):
+        arrival = time.time()
+        raw = await request.read()
+        headers = {k: v for k, v in request.headers.items()
+                   if k.lower() in ("authorization", "content-type")}
+        entry = {"timestamp": arrival, "endpoint": request.path}
+        try:
+            entry["body"] = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            entry["body"] = None
+
+        async with session.request(request.method, f"{backend}{request.path_qs}",
+                                   data=raw, headers=headers) as upstream:
+            response = web.StreamResponse(status=upstream.status)
+            response.content_type = upstream.content_type
+            await response.prepare(request)
+            output_tokens = None
+            chunks = 0
+            tail = b""
+            async for data in upstream.content.iter_any():
+                await response.write(data)
+                if entry["body"] and entry["body"].get("stream"):
+                    # Count content chunks; keep a tail to read the usage chunk
+                    chunks += data.count(b"data: {")
+                    tail = (tail + data)[-4096:]
+                else:
+                    tail += data
+            await response.write_eof()
+
+        if entry["body"] and request.path.startswith("/v1/") and upstream.status == 200:
+            try:
+                if entry["body"].get("stream"):
+                    for line in tail.split(b"\n"):
+                        if line.startswith(b"data: {") and b'"usage"' in line:
+                            output_tokens = output_tokens_from_body(json.loads(line[6:])) or output_tokens
+                    entry["output_tokens"] = output_tokens or max(chunks - 1, 0)
+                else:
+                    entry["output_tokens"] = output_tokens_from_body(json.loads(tail))
+                entry["latency"] = time.time() - arrival
+                out.write(json.dumps(entry) + "\n")
+            except (ValueError, UnicodeDecodeError):
+                pass
+        return response
+
+    app = web.Application(client_max_size=64 * 1024**2)
+    app.router.add_route("*", "/{tail:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, listen_host, listen_port).start()
+    print(f"✓ Recording proxy on {listen_host}:{listen_port} -> {backend}, writing {out_path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await session.close()
+        out.close()
+
+# =============================================================================
+# Open-loop replay
+# =============================================================================
+
+def load_trace(path):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries = [e for e in entries if e.get("body") and e.get("endpoint", "").startswith("/v1/")
+               and "completions" in e["endpoint"]]
+    entries.sort(key=lambda e: e["timestamp"])
+    return entries
+
+def schedule_offsets(entries, time_scale=1.0, rate_multiplier=1.0):
+    """Send offsets in seconds from the start of the replay"""
+    if not entries:
+        return []
+    t0 = entries[0]["timestamp"]
+    factor = time_scale / rate_multiplier
+    return [(e["timestamp"] - t0) * factor for e in entries]
+
+def build_payload(entry, model=None, pin_output_length=True):
+    payload = dict(entry["body"])
+    if model:
+        payload["model"] = model
+    if pin_output_length and entry.get("output_tokens"):
+        payload["max_tokens"] = entry["output_tokens"]
+        payload["ignore_eos"] = True
+    return payload
+
+async def wait_until(target):
+    delay = target - time.perf_counter()
+    if delay > SPIN_WINDOW:
+        await asyncio.sleep(delay - SPIN_WINDOW)
+    while time.perf_counter() < target:
+        await asyncio.sleep(0)
+
+async def replay(entries, offsets, url, api_key=None, model=None, pin_output_length=True,
+                 start_at=None):
+    """Fire every request at its offset; returns (results, lags, duration).
+
+    start_at is a time.time() wall-clock start shared by worker processes.
+    """
+    payloads = [build_payload(e, model, pin_output_length) for e in entries]
+    lags = []
+    tasks = []
+
+    async with make_session(api_key) as session:
+        start = time.perf_counter()
+        if start_at is not None:
+            start += start_at - time.time()
+        i = 0
+        while i < len(entries):
+            await wait_until(start + offsets[i])
+            now = time.perf_counter()
+            # Launch everything that is due, so bursts are not serialized
+            while i < len(entries) and start + offsets[i] <= now:
+                lags.append(now - (start + offsets[i]))
+                tasks.append(asyncio.create_task(
+                    stream_request(session, url, entries[i]["endpoint"], payloads[i])))
+                i += 1
+        results = await asyncio.gather(*tasks)
+        duration = time.perf_counter() - start
+    return results, lags, duration
+
+def replay_worker(job):
+    """Run one shard of the trace in a separate process"""
+    entries, offsets, options, start_at = job
+    return asyncio.run(replay(entries, offsets, start_at=start_at, **options))
+
+def replay_parallel(entries, offsets, workers, **options):
+    """Split the trace round-robin across processes sharing one start time.
+
+    A single event loop tops out around a couple of thousand requests per
+    second of HTTP handling; beyond that the send schedule starts to slip.
+    """
+    import multiprocessing
+
+    start_at = time.time() + 1.0 + 0.1 * workers  # time for workers to spin up
+    jobs = [(entries[w::workers], offsets[w::workers], options, start_at) for w in range(workers)]
+    with multiprocessing.Pool(workers) as pool:
+        shards = pool.map(replay_worker, jobs)
+    results = [r for shard in shards for r in shard[0]]
+    lags = [lag for shard in shards for lag in shard[1]]
+    duration = max(shard[2] for shard in shards)
+    return results, lags, duration
+
+def print_replay_info(entries, offsets, lags):
+    span = offsets[-1] if offsets else 0
+    rate = len(entries) / span if span else float("inf")
+    print(f"Replayed {len(entries)} requests over {span:.1f}s (offered {rate:.1f} req/s)")
+    if lags:
+        ordered = sorted(lags)
+        print(f"Send-time lag p50/p99/max: {ordered[len(ordered) // 2] * 1000:.2f}/"
+              f"{ordered[int(len(ordered) * 0.99)] * 1000:.2f}/{ordered[-1] * 1000:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and open-loop replay request traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Run a recording proxy in front of the server")
+    rec.add_argument("--backend", default="http://localhost:6789")
+    rec.add_argument("--listen-host", default="0.0.0.0")
+    rec.add_argument("--listen-port", type=int, default=8000)
+    rec.add_argument("--out", default="trace.jsonl")
+
+    rep = sub.add_parser("replay", help="Replay a trace open-loop against an endpoint")
+    rep.add_argument("trace")
+    rep.add_argument("--url", default="http://localhost:6789")
+    rep.add_argument("--api-key")
+    rep.add_argument("--model", help="Override the model in every request")
+    rep.add_argument("--time-scale", type=float, default=1.0, help="Multiply inter-arrival gaps")
+    rep.add_argument("--rate-multiplier", type=float, default=1.0, help="Divide inter-arrival gaps")
+    rep.add_argument("--limit", type=int, help="Replay only the first N requests")
+    rep.add_argument("--no-pin-output", action="store_true",
+                     help="Keep the recorded max_tokens instead of the recorded output length")
+    rep.add_argument("--workers", type=int, default=1,
+                     help="Client processes (use >1 above ~1000 req/s)")
+    rep.add_argument("--slo-ttft", type=float, help="TTFT SLO in seconds for goodput")
+    rep.add_argument("--slo-itl", type=float, help="p99 inter-token latency SLO in seconds")
+    rep.add_argument("--store", help="Save results to this bench_store.py database")
+    rep.add_argument("--profile", help="Deployment profile name recorded with --store")
+    rep.add_argument("--workload", help="Workload name recorded with --store (default: trace file)")
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ aiohttp not installed (pip install aiohttp)")
+        sys.exit(1)
+
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    try:
+        if args.command == "record":
+            asyncio.run(record_proxy(args.backend, args.listen_host, args.listen_port, args.out))
+            return
+
+        entries = load_trace(args.trace)[:args.limit]
+        if not entries:
+            print(f"❌ No completion requests in {args.trace}")
+            sys.exit(1)
+        offsets = schedule_offsets(entries, args.time_scale, args.rate_multiplier)
+        options = {"url": args.url, "api_key": args.api_key, "model": args.model,
+                   "pin_output_length": not args.no_pin_output}
+        if args.workers > 1:
+            results, lags, duration = replay_parallel(entries, offsets, args.workers, **options)
+        else:
+            results, lags, duration = asyncio.run(replay(entries, offsets, **options))
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped by user")
+        return
+
+    print_replay_info(entries, offsets, lags)
+    summary = summarize(results, duration, args.slo_ttft, args.slo_itl)
+    print_summary(summary, "Trace Replay Summary")
+
+    if args.store:
+        from bench_store import save_run
+        run_id = save_run(args.store, store_metrics(results, summary), args.profile,
+                          args.workload or args.trace)
+        print(f"✓ Stored results as run:{run_id} in {args.store}")
+
+if __name__ == "__main__":
+    main()
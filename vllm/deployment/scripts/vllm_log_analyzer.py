@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+vLLM Server Log Analyzer
+Usage: python vllm_log_analyzer.py <log_file> [--state offsets.json] [--follow] [--csv series.csv]
+
+Parses vLLM's periodic stats lines (prompt/generation throughput, running,
+pending/waiting and swapped requests, GPU/CPU KV cache usage) and preemption
+warnings, and summarizes peak KV usage, time spent swapped and throughput
+percentiles. Reads the log as a stream, so multi-gigabyte logs need only a
+few bytes per stats sample. Both plain and process-prefixed lines are read:
+
+  INFO 10-19 12:00:00 [loggers.py:123] Engine 000: Avg prompt throughput: ...
+  (APIServer pid=1234) INFO 10-19 12:00:00 [loggers.py:123] Engine 000: Avg ...
+
+--state saves the file offset so the next run resumes where this one stopped
+(including the unread tail of a log that has since been rotated to <log>.1).
+--follow keeps tailing the log across rotations and prints a summary every
+--interval seconds.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from datetime import datetime
+
+# V1 engine lines are prefixed with the emitting process: "(APIServer pid=1234) INFO ..."
+PROCESS_PREFIX = rb"^(?:\(\w+ pid=\d+\) )?"
+STATS_PATTERN = re.compile(
+    PROCESS_PREFIX + rb"\w+ (?P<ts>\d\d-\d\d \d\d:\d\d:\d\d).*?"
+    rb"Avg prompt throughput: (?P<prompt>[\d.]+) tokens/s, "
+    rb"Avg generation throughput: (?P<gen>[\d.]+) tokens/s, "
+    rb"Running: (?P<running>\d+) reqs, "
+    rb"(?:Swapped: (?P<swapped>\d+) reqs, )?"
+    rb"(?:Pending|Waiting): (?P<pending>\d+) reqs, "
+    rb"GPU KV cache usage: (?P<gpu_kv>[\d.]+)%"
+    rb"(?:, CPU KV cache usage: (?P<cpu_kv>[\d.]+)%)?"
+)
+PREEMPT_PATTERN = re.compile(
+    PROCESS_PREFIX + rb"\w+ (?P<ts>\d\d-\d\d \d\d:\d\d:\d\d).*?is preempted by PreemptionMode\.(?P<mode>\w+)")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SERIES = ['time', 'prompt_tps', 'gen_tps', 'running', 'pending', 'swapped', 'gpu_kv', 'cpu_kv']
+
+def parse_timestamp(raw, year):
+    """vLLM logs 'MM-DD HH:MM:SS' without a year"""
+    return datetime.strptime(f"{year}-{raw.decode()}", TIMESTAMP_FORMAT).timestamp()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+class LogStats:
+    """Time series of vLLM stats lines plus preemption counters"""
+
+    def __init__(self, year=None):
+        self.year = year or datetime.now().year
+        # Compact typed arrays: 8 bytes per field per stats line
+        self.series = {name: array('d') for name in SERIES}
+        self.preemptions = {}
+        self.first_preemption = None
+        self.lines = 0
+
+    def feed(self, line):
+        self.lines += 1
+        # Cheap substring checks before running any regex
+        if b'throughput' in line:
+            match = STATS_PATTERN.match(line)
+            if match:
+                self._add_sample(match)
+        elif b'preempted' in line:
+            match = PREEMPT_PATTERN.match(line)
+            if match:
+                mode = match.group('mode').decode()
+                self.preemptions[mode] = self.preemptions.get(mode, 0) + 1
+                if self.first_preemption is None:
+                    self.first_preemption = parse_timestamp(match.group('ts'), self.year)
+
+    def _add_sample(self, match):
+        values = {
+            'time': parse_timestamp(match.group('ts'), self.year),
+            'prompt_tps': float(match.group('prompt')),
+            'gen_tps': float(match.group('gen')),
+            'running': int(match.group('running')),
+            'pending': int(match.group('pending')),
+            'swapped': int(match.group('swapped') or 0),
+            'gpu_kv': float(match.group('gpu_kv')),
+            'cpu_kv': float(match.group('cpu_kv') or 0),
+        }
+        for name in SERIES:
+            self.series[name].append(values[name])
+
+    def summary(self):
+        s = self.series
+        samples = len(s['time'])
+        if samples == 0:
+            return {'samples': 0, 'preemptions': dict(self.preemptions)}
+
+        # A sample's state is assumed to hold until the next sample
+        swapped_seconds = sum(s['time'][i + 1] - s['time'][i] for i in range(samples - 1)
+                              if s['swapped'][i] > 0)
+        peak = max(range(samples), key=lambda i: s['gpu_kv'][i])
+        busy_gen = [v for v in s['gen_tps'] if v > 0]
+        return {
+            'samples': samples,
+            'start': datetime.fromtimestamp(s['time'][0]).strftime(TIMESTAMP_FORMAT),
+            'end': datetime.fromtimestamp(s['time'][-1]).strftime(TIMESTAMP_FORMAT),
+            'peak_gpu_kv': s['gpu_kv'][peak],
+            'peak_gpu_kv_at': datetime.fromtimestamp(s['time'][peak]).strftime(TIMESTAMP_FORMAT),
+            'peak_cpu_kv': max(s['cpu_kv']),
+            'max_running': int(max(s['running'])),
+            'max_pending': int(max(s['pending'])),
+            'max_swapped': int(max(s['swapped'])),
+            'swapped_seconds': swapped_seconds,
+            'gen_tps': {p: percentile(busy_gen, p) for p in (50, 90, 99)},
+            'prompt_tps': {p: percentile([v for v in s['prompt_tps'] if v > 0], p)
+                           for p in (50, 90, 99)},
+            'preemptions': dict(self.preemptions),
+            'first_preemption': (datetime.fromtimestamp(self.first_preemption).strftime(TIMESTAMP_FORMAT)
+                                 if self.first_preemption else None),
+        }
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SERIES)
+            writer.writerows(zip(*(self.series[name] for name in SERIES)))
+        print(f"✓ Wrote {len(self.series['time'])} samples to {path}")
+
+def print_summary(summary):
+    print("\n=== vLLM Log Summary ===")
+    if summary['samples'] == 0:
+        print("○ No stats lines found (is log level INFO or lower?)")
+    else:
+        print(f"Samples: {summary['samples']} ({summary['start']} -> {summary['end']})")
+        print(f"Peak GPU KV cache usage: {summary['peak_gpu_kv']:.1f}% at {summary['peak_gpu_kv_at']}")
+        print(f"Peak CPU KV cache usage: {summary['peak_cpu_kv']:.1f}%")
+        print(f"Max running/pending/swapped: {summary['max_running']}/"
+              f"{summary['max_pending']}/{summary['max_swapped']} reqs")
+        print(f"Time with swapped requests: {summary['swapped_seconds']:.0f}s")
+        gen, prompt = summary['gen_tps'], summary['prompt_tps']
+        print(f"Generation tokens/s (busy) p50/p90/p99: {gen[50]:.1f}/{gen[90]:.1f}/{gen[99]:.1f}")
+        print(f"Prompt tokens/s (busy) p50/p90/p99: {prompt[50]:.1f}/{prompt[90]:.1f}/{prompt[99]:.1f}")
+
+    if summary['preemptions']:
+        counts = ", ".join(f"{mode}: {n}" for mode, n in summary['preemptions'].items())
+        print(f"⚠ Preemptions: {counts} (first at {summary['first_preemption']})")
+        print("   Increase gpu_memory_utilization / tensor_parallel_size or lower max_model_len")
+    else:
+        print("✓ No preemptions")
+
+# =============================================================================
+# Incremental reading with rotation handling
+# =============================================================================
+
+def load_state(state_file):
+    if state_file and os.path.exists(state_file):
+        with open(state_file) as f:
+            return json.load(f)
+    return {}
+
+def save_state(state_file, inode, offset):
+    if not state_file:
+        return
+    tmp = f"{state_file}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'inode': inode, 'offset': offset}, f)
+    os.replace(tmp, state_file)
+
+def read_lines(path, offset, stats, chunk_size=1024 * 1024):
+    """Feed complete lines from offset; return the offset after the last full line"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        pending = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                stats.feed(line)
+            offset += len(chunk)
+        # Leave a partial trailing line for the next read
+        return offset - len(pending)
+
+def resume_offset(path, state):
+    """Offset to start reading `path` from, finishing a rotated file first"""
+    inode = os.stat(path).st_ino
+    if state.get('inode') == inode:
+        offset = state.get('offset', 0)
+        return 0 if offset > os.path.getsize(path) else offset, None
+    rotated = f"{path}.1"
+    if state.get('inode') and os.path.exists(rotated) and os.stat(rotated).st_ino == state['inode']:
+        return 0, (rotated, state.get('offset', 0))
+    return 0, None
+
+def analyze(path, stats, state_file=None):
+    state = load_state(state_file)
+    offset, rotated = resume_offset(path, state)
+    if rotated:
+        rotated_path, rotated_offset = rotated
+        print(f"Log rotated - finishing {rotated_path} from byte {rotated_offset}")
+        read_lines(rotated_path, rotated_offset, stats)
+    if offset:
+        print(f"Resuming {path} from byte {offset}")
+    offset = read_lines(path, offset, stats)
+    save_state(state_file, os.stat(path).st_ino, offset)
+    return offset
+
+def follow(path, stats, state_file=None, interval=60, poll=1.0):
+    offset = analyze(path, stats, state_file)
+    inode = os.stat(path).st_ino
+    last_report = time.time()
+    while True:
+        time.sleep(poll)
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            continue  # mid-rotation
+        if current.st_ino != inode:
+            # Drain the old file (now renamed) before switching to the new one
+            rotated = f"{path}.1"
+            if os.path.exists(rotated) and os.stat(rotated).st_ino == inode:
+                read_lines(rotated, offset, stats)
+            inode, offset = current.st_ino, 0
+        elif current.st_size < offset:
+            offset = 0  # truncated in place
+        offset = read_lines(path, offset, stats)
+        save_state(state_file, inode, offset)
+        if time.time() - last_report >= interval:
+            print_summary(stats.summary())
+            last_report = time.time()
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze vLLM server logs')
+    parser.add_argument('log_file', help='vLLM server log (e.g. nohup.out)')
+    parser.add_argument('--state', help='JSON file storing the read offset between runs')
+    parser.add_argument('--follow', action='store_true', help='Keep tailing the log')
+    parser.add_argument('--interval', type=float, default=60, help='Summary interval in --follow mode')
+    parser.add_argument('--csv', help='Write the time series to this CSV file')
+    parser.add_argument('--year', type=int, help='Year of the log timestamps (default: current)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log_file):
+        print(f"❌ Log file not found: {args.log_file}")
+        sys.exit(1)
+
+    stats = LogStats(args.year)
+    try:
+        if args.follow:
+            follow(args.log_file, stats, args.state, args.interval)
+        else:
+            analyze(args.log_file, stats, args.state)
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+
+    print_summary(stats.summary())
+    if args.csv:
+        stats.write_csv(args.csv)
+
+if __name__ == "__main__":
+    main()